@@ -0,0 +1,131 @@
+import os
+import time
+import threading
+from collections import OrderedDict
+
+# ======================================================
+# 🔧 CONFIGURAÇÃO
+# ======================================================
+# Só renders novos (cache miss) consomem tokens; cache hits passam livres.
+CLIENT_RATE = float(os.environ.get("PANOCONFIG_CLIENT_RATE", "2"))
+CLIENT_BURST = float(os.environ.get("PANOCONFIG_CLIENT_BURST", "6"))
+ORIGIN_RATE = float(os.environ.get("PANOCONFIG_ORIGIN_RATE", "1"))
+ORIGIN_BURST = float(os.environ.get("PANOCONFIG_ORIGIN_BURST", "3"))
+
+# limite de chaves por conjunto de buckets (origens podem ser muitas)
+MAX_BUCKETS = 10000
+
+
+# ======================================================
+# 🪣 TOKEN BUCKETS
+# ======================================================
+
+class TokenBuckets:
+    """
+    Um token bucket por chave (`rate` tokens/s, até `burst`). Não é
+    thread-safe sozinho: o acesso é serializado por `RenderAdmission`.
+    Buckets ociosos mais antigos são descartados acima de `max_keys`
+    (um bucket descartado volta cheio, o que só favorece o cliente).
+    """
+
+    def __init__(self, rate: float, burst: float, max_keys: int = MAX_BUCKETS):
+        self.rate = rate
+        self.burst = burst
+        self.max_keys = max_keys
+        self._buckets = OrderedDict()
+
+    def _tokens(self, key: str, now: float) -> float:
+        tokens, last = self._buckets.get(key, (self.burst, now))
+        return min(self.burst, tokens + (now - last) * self.rate)
+
+    def wait_time(self, key: str, now: float) -> float:
+        """
+        Segundos até haver 1 token (0 se já há).
+        """
+        tokens = self._tokens(key, now)
+        if tokens >= 1:
+            return 0.0
+        if self.rate <= 0:
+            return float("inf")
+        return (1 - tokens) / self.rate
+
+    def take(self, key: str, now: float):
+        self._buckets[key] = (self._tokens(key, now) - 1, now)
+        self._buckets.move_to_end(key)
+        while len(self._buckets) > self.max_keys:
+            self._buckets.popitem(last=False)
+
+    def give_back(self, key: str, now: float):
+        if key in self._buckets:
+            self._buckets[key] = (min(self.burst, self._tokens(key, now) + 1), now)
+
+    def __len__(self):
+        return len(self._buckets)
+
+
+# ======================================================
+# 🚦 ADMISSÃO DE RENDERS
+# ======================================================
+
+class RenderAdmission:
+    """
+    Admite um render novo só se o bucket do cliente e o da origem têm
+    token; os dois são consumidos juntos ou nenhum é.
+    """
+
+    def __init__(self, client_rate: float, client_burst: float,
+                 origin_rate: float, origin_burst: float):
+        self._clients = TokenBuckets(client_rate, client_burst)
+        self._origins = TokenBuckets(origin_rate, origin_burst)
+        self._lock = threading.Lock()
+        self._counters = {
+            "admitted": 0,
+            "throttled_client": 0,
+            "throttled_origin": 0,
+        }
+
+    def admit(self, client_id: str, origin: str | None) -> float:
+        """
+        Retorna 0 se admitido, senão os segundos sugeridos para Retry-After.
+        """
+        origin = origin or "-"
+        now = time.monotonic()
+
+        with self._lock:
+            client_wait = self._clients.wait_time(client_id, now)
+            origin_wait = self._origins.wait_time(origin, now)
+
+            if client_wait > 0 or origin_wait > 0:
+                if client_wait >= origin_wait:
+                    self._counters["throttled_client"] += 1
+                else:
+                    self._counters["throttled_origin"] += 1
+                return max(client_wait, origin_wait)
+
+            self._clients.take(client_id, now)
+            self._origins.take(origin, now)
+            self._counters["admitted"] += 1
+            return 0.0
+
+    def refund(self, client_id: str, origin: str | None):
+        """
+        Devolve os tokens de um render admitido que não chegou a rodar
+        (ex.: fila cheia).
+        """
+        now = time.monotonic()
+        with self._lock:
+            self._clients.give_back(client_id, now)
+            self._origins.give_back(origin or "-", now)
+            self._counters["admitted"] -= 1
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                **self._counters,
+                "client_buckets": len(self._clients),
+                "origin_buckets": len(self._origins),
+            }
+
+
+render_admission = RenderAdmission(
+    CLIENT_RATE, CLIENT_BURST, ORIGIN_RATE, ORIGIN_BURST)
@@ -0,0 +1,148 @@
+import time
+import threading
+from collections import deque
+
+# ======================================================
+# 🔧 CONFIGURAÇÃO
+# ======================================================
+# latências guardadas por rota para os percentis
+LATENCY_WINDOW = 2048
+
+
+# ======================================================
+# 📈 MÉTRICAS POR ROTA
+# ======================================================
+
+class RouteStats:
+    """
+    Contadores e latências (janela móvel) por rota. A rota é o template
+    (`/api/jobs/{job_id}`), não o caminho pedido. Rotas que marcam
+    `request.state.cache` ("hit"/"miss") também têm a taxa de acerto.
+    """
+
+    def __init__(self, window: int = LATENCY_WINDOW):
+        self.window = window
+        self._routes = {}
+        self._lock = threading.Lock()
+
+    def record(self, route: str, status: int, seconds: float, cache: str | None):
+        with self._lock:
+            entry = self._routes.get(route)
+            if entry is None:
+                entry = {
+                    "requests": 0,
+                    "errors": 0,
+                    "not_modified": 0,
+                    "hits": 0,
+                    "misses": 0,
+                    "total_seconds": 0.0,
+                    "max_seconds": 0.0,
+                    "latencies": deque(maxlen=self.window),
+                }
+                self._routes[route] = entry
+
+            entry["requests"] += 1
+            entry["total_seconds"] += seconds
+            entry["max_seconds"] = max(entry["max_seconds"], seconds)
+            entry["latencies"].append(seconds)
+            if status >= 500:
+                entry["errors"] += 1
+            elif status == 304:
+                entry["not_modified"] += 1
+            if cache == "hit":
+                entry["hits"] += 1
+            elif cache == "miss":
+                entry["misses"] += 1
+
+    def stats(self) -> dict:
+        with self._lock:
+            routes = {
+                route: (entry, sorted(entry["latencies"]))
+                for route, entry in self._routes.items()
+            }
+
+        result = {}
+        for route, (entry, latencies) in routes.items():
+            lookups = entry["hits"] + entry["misses"]
+            result[route] = {
+                "requests": entry["requests"],
+                "errors": entry["errors"],
+                "not_modified": entry["not_modified"],
+                "hit_rate": round(entry["hits"] / lookups, 4) if lookups else None,
+                "avg_ms": round(entry["total_seconds"] / entry["requests"] * 1000, 3),
+                "p50_ms": _percentile_ms(latencies, 0.50),
+                "p95_ms": _percentile_ms(latencies, 0.95),
+                "max_ms": round(entry["max_seconds"] * 1000, 3),
+            }
+        return result
+
+
+def _percentile_ms(latencies: list, q: float) -> float:
+    if not latencies:
+        return 0.0
+    return round(latencies[min(len(latencies) - 1, int(q * len(latencies)))] * 1000, 3)
+
+
+# ======================================================
+# ⏱️ MIDDLEWARE ASGI
+# ======================================================
+
+class RouteMetricsMiddleware:
+    """
+    Mede cada request HTTP do início até o fim do corpo da resposta
+    (para SSE, a duração do stream). ASGI puro, sem o custo do
+    BaseHTTPMiddleware em cada tile.
+    """
+
+    def __init__(self, app, stats: RouteStats):
+        self.app = app
+        self.stats = stats
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        start = time.perf_counter()
+        status = 500
+        recorded = False
+
+        def record():
+            nonlocal recorded
+            if recorded:
+                return
+            recorded = True
+            cache = scope.get("state", {}).get("cache")
+            self.stats.record(route_label(scope), status,
+                              time.perf_counter() - start, cache)
+
+        async def send_wrapper(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+            if message["type"] == "http.response.pathsend" or (
+                message["type"] == "http.response.body"
+                and not message.get("more_body", False)
+            ):
+                record()
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            record()
+
+
+def route_label(scope: dict) -> str:
+    route = scope.get("route")
+    if route is not None and getattr(route, "path", None):
+        return route.path
+    # Mount de StaticFiles não registra `route`: usa o prefixo montado
+    app_root = scope.get("app_root_path", scope.get("root_path", ""))
+    root = scope.get("root_path", "")
+    if root and root != app_root:
+        return f"{root[len(app_root):]}/*"
+    return "(unmatched)"
+
+
+route_stats = RouteStats()
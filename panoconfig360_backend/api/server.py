@@ -1,25 +1,65 @@
 # api/server.py
 import os
 import json
+import math
+import asyncio
 import logging
-import shutil
 import time
 import tempfile
-import threading
 from contextlib import asynccontextmanager
 from fastapi import FastAPI, HTTPException, Request, Body
 from panoconfig360_backend.render.dynamic_stack import (
-    load_config,
     build_string_from_selection,
     encode_index,
 )
-from panoconfig360_backend.render.split_faces_cubemap import process_cubemap
+from panoconfig360_backend.render.cubemap_build import (
+    tile_root_key,
+    build_levels,
+)
 from panoconfig360_backend.render.stack_2d import render_stack_2d
 from panoconfig360_backend.models.render_2d import Render2DRequest
-from panoconfig360_backend.storage.storage_local import exists, upload_file
-from panoconfig360_backend.render.scene_context import resolve_scene_context
+from panoconfig360_backend.storage.storage_local import (
+    exists,
+    upload_file,
+    local_path,
+    get_bytes,
+    purge_stale_staging,
+)
+from panoconfig360_backend.storage.tile_store import (
+    resolve_tile,
+    read_tile,
+    load_pack,
+    object_digest,
+    tile_hash,
+)
+from panoconfig360_backend.storage.tile_pack import (
+    PACK_NAME,
+    PACK_MEDIA_TYPE,
+    encode_pack,
+    pack_digest,
+)
+from panoconfig360_backend.storage.tile_cache import hot_tiles
+from panoconfig360_backend.storage.tile_variants import tile_variants
+from panoconfig360_backend.render.tile_encoding import (
+    TileEncoding,
+    DEFAULT_ENCODING,
+    TILE_FORMATS,
+    EXT_FORMATS,
+)
+from panoconfig360_backend.render.client_config import client_configs
+from panoconfig360_backend.render.build_index import build_index
+from panoconfig360_backend.render.split_faces_cubemap import all_tile_keys
+from panoconfig360_backend.render.render_jobs import render_jobs, RenderQueueFull
+from panoconfig360_backend.render.render_pool import (
+    local_render_stats,
+    render_build,
+    render_pool,
+)
+from panoconfig360_backend.render.speculative import speculator
+from panoconfig360_backend.api.rate_limit import render_admission
+from panoconfig360_backend.api.route_metrics import RouteMetricsMiddleware, route_stats
 from fastapi.staticfiles import StaticFiles
-from fastapi.responses import FileResponse
+from fastapi.responses import FileResponse, JSONResponse, Response, StreamingResponse
 from pathlib import Path
 from panoconfig360_backend.utils.build_validation import validate_build_string
 import re
@@ -31,49 +71,116 @@ CLIENTS_ROOT = Path("panoconfig360_cache/clients")
 LOCAL_CACHE_DIR = ROOT_DIR / "panoconfig360_cache"
 FRONTEND_DIR = ROOT_DIR / "panoconfig360_frontend"
 os.makedirs(LOCAL_CACHE_DIR, exist_ok=True)
-TILE_RE = re.compile(r"^[0-9a-z]+_[tblr]_\d+_\d+_\d+\.jpg$")
+TILE_RE = re.compile(r"^[0-9a-z]+_[fbudlr]_\d+_\d+_\d+\.(jpg|webp|avif)$")
+SAFE_ID_RE = re.compile(r"^[0-9a-z][0-9a-z_-]*$")
 
 USE_MASK_STACK = True
 
+# o render usa o composite em array (o tiler só tira views dele)
 if USE_MASK_STACK:
-    from panoconfig360_backend.render.dynamic_stack_with_masks import stack_layers_image_only
+    from panoconfig360_backend.render.dynamic_stack_with_masks import stack_layers_array as stack_composite
 else:
-    from panoconfig360_backend.render.dynamic_stack import stack_layers_image_only
+    from panoconfig360_backend.render.dynamic_stack import stack_layers_image_only as stack_composite
 
 logging.basicConfig(level=logging.INFO, format="%(levelname)s: %(message)s")
 
-last_request_time = 0.0
-lock = threading.Lock()
-MIN_INTERVAL = 1.0
-
+JOB_EVENTS_POLL_SECONDS = 0.2
+STALE_STAGING_SECONDS = 3600
+JOB_EVENTS_KEEPALIVE_SECONDS = 15.0
+TILE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+
+
+def tiles_payload(tile_root: str, build_str: str, meta: dict, bundle: bool = True) -> dict:
+    """
+    Descrição dos tiles para o viewer. `levels` segue o formato do
+    Marzipano.CubeGeometry; o LOD {z} é o índice do nível (0 = menor).
+    `bundleUrl` (só em builds publicadas) devolve os tiles num único pack.
+    """
+    return {
+        "baseUrl": "/panoconfig360_cache",
+        "tileRoot": tile_root,
+        "pattern": f"{build_str}_{{f}}_{{z}}_{{x}}_{{y}}.jpg",
+        "build": build_str,
+        "levels": build_levels(meta),
+        "bundleUrl": f"/panoconfig360_cache/{tile_root}/bundle" if bundle else None,
+    }
+
+
+def etag_matches(if_none_match: str | None, etag: str) -> bool:
+    """
+    If-None-Match (lista ou `*`, comparação fraca como manda o RFC 9110).
+    """
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    for tag in if_none_match.split(","):
+        tag = tag.strip()
+        if tag.startswith("W/"):
+            tag = tag[2:]
+        if tag == etag:
+            return True
+    return False
+
+
+def tile_response(data: bytes, etag: str, media_type: str = "image/jpeg",
+                  headers: dict | None = None) -> Response:
+    return Response(
+        content=data,
+        media_type=media_type,
+        headers={"Cache-Control": TILE_CACHE_CONTROL, "ETag": etag, **(headers or {})},
+    )
 
-def load_client_config(client_id: str):
-    config_path = LOCAL_CACHE_DIR / "clients" / \
-        client_id / f"{client_id}_cfg.json"
 
-    if not config_path.exists():
-        raise FileNotFoundError(
-            f"Configuração do cliente '{client_id}' não encontrada em {config_path}.")
+def tile_not_modified(etag: str, headers: dict | None = None) -> Response:
+    return Response(
+        status_code=304,
+        headers={"Cache-Control": TILE_CACHE_CONTROL, "ETag": etag, **(headers or {})},
+    )
 
-    project, scenes, naming = load_config(config_path)
-    project["scenes"] = scenes
-    project["client_id"] = client_id
 
-    return project, naming
+def run_render_job(job, tile_root: str, build_str: str, render_kwargs: dict) -> dict:
+    """
+    Executa o render de um job: o preview (menor nível) fica em memória no
+    job e é servido pela rota de tiles até a build ser publicada.
+    """
+    def on_preview(level: dict, tiles: dict):
+        job.set_preview(tiles_payload(
+            tile_root, build_str, {"levels": [level]}, bundle=False), tiles)
+        logging.info(f"👁️ Preview pronto: {build_str} ({level['size']}px)")
+
+    meta = render_build(
+        stack_composite,
+        build=build_str,
+        on_progress=job.progress,
+        on_preview=on_preview,
+        **render_kwargs,
+    )
+    if meta.get("tiles_count", 0) > 0:
+        build_index.add(
+            render_kwargs["client_id"], render_kwargs["scene_id"],
+            build_str, build_levels(meta))
+    return tiles_payload(tile_root, build_str, meta)
 
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     logging.info("🚀 Iniciando backend STRATY")
     os.makedirs(LOCAL_CACHE_DIR, exist_ok=True)
+    purge_stale_staging(STALE_STAGING_SECONDS)
+    build_index.load()
+    build_index.start()
+    speculator.start(run_render_job)
     yield
     logging.info("🧹 Encerrando backend STRATY")
+    speculator.stop()
+    render_pool.shutdown()
+    build_index.stop()
 
 
 app = FastAPI(lifespan=lifespan)
+app.add_middleware(RouteMetricsMiddleware, stats=route_stats)
 
-app.mount("/panoconfig360_cache",
-          StaticFiles(directory=LOCAL_CACHE_DIR), name="panoconfig360_cache")
 app.mount("/static", StaticFiles(directory=FRONTEND_DIR), name="static")
 app.mount("/css", StaticFiles(directory=FRONTEND_DIR / "css"), name="css")
 app.mount("/js", StaticFiles(directory=FRONTEND_DIR / "js"), name="js")
@@ -87,19 +194,6 @@ def render_cubemap(
     origin = request.headers.get("origin") if request else None
     logging.info(f"🌐 Requisição recebida de origem: {origin}")
 
-    # ======================================================
-    # ⏱️ RATE LIMIT
-    # ======================================================
-    now = time.monotonic()
-    with lock:
-        global last_request_time
-        if now - last_request_time < MIN_INTERVAL:
-            raise HTTPException(
-                status_code=429,
-                detail="Muitas requisições — aguarde um instante."
-            )
-        last_request_time = now
-
     # ======================================================
     # ✅ VALIDAÇÕES
     # ======================================================
@@ -117,8 +211,9 @@ def render_cubemap(
     # ======================================================
     # 📦 CARREGA CONFIG
     # ======================================================
+    # compilada e em cache por cliente (relida quando o cfg muda)
     try:
-        project, _ = load_client_config(client_id)
+        config = client_configs.get(client_id)
     except Exception as e:
         logging.exception("❌ Falha ao carregar config")
         raise HTTPException(500, f"Erro ao carregar config: {e}")
@@ -127,7 +222,7 @@ def render_cubemap(
     # 🎬 RESOLVE CENA
     # ======================================================
     try:
-        ctx = resolve_scene_context(project, scene_id)
+        ctx = config.scene_context(scene_id)
     except Exception as e:
         logging.exception("❌ Cena inválida")
         raise HTTPException(400, f"Cena inválida: {e}")
@@ -148,21 +243,38 @@ def render_cubemap(
     # ======================================================
     # 🔍 VERIFICA CACHE
     # ======================================================
-    tile_root = f"clients/{client_id}/cubemap/{scene_id}/tiles/{build_str}"
-    metadata_key = f"{tile_root}/metadata.json"
-
-    cache_exists = exists(metadata_key)
-    logging.info(f"🔍 Cache check: {metadata_key} → exists={cache_exists}")
+    # índice em memória: cache hit não toca o storage
+    tile_root = tile_root_key(client_id, scene_id, build_str)
+    cached_levels = build_index.resolve(client_id, scene_id, build_str)
+    cache_exists = cached_levels is not None
+    logging.info(f"🔍 Cache check: {tile_root} → exists={cache_exists}")
+    if request is not None:
+        request.state.cache = "hit" if cache_exists else "miss"
+
+    viewer_cfg = config.viewer
+    render_kwargs = {
+        "client_id": client_id,
+        "scene_id": scene_id,
+        "layers": scene_layers,
+        "selection": selection,
+        "assets_root": assets_root,
+        "tile_size": viewer_cfg.get("tileSize", 512),
+        "lod_min_size": viewer_cfg.get("lodMinSize"),
+        "reuse_tiles": USE_MASK_STACK,
+        "tile_encoding": config.tile_encoding,
+    }
+
+    # seleção atual da sessão alimenta o pré-render dos vizinhos
+    limiter_origin = origin or (
+        request.client.host if request and request.client else None)
+    session_id = payload.get("session") or limiter_origin or "-"
+    speculator.observe(
+        session_id, scene_index, build_str, render_kwargs, cache_exists)
 
     if cache_exists:
         logging.info(f"✅ Cache hit: {build_str}")
 
-        tiles = {
-            "baseUrl": "/panoconfig360_cache",
-            "tileRoot": tile_root,
-            "pattern": f"{build_str}_{{f}}_{{z}}_{{x}}_{{y}}.jpg",
-            "build": build_str,
-        }
+        tiles = tiles_payload(tile_root, build_str, {"levels": cached_levels})
 
         return {
             "status": "cached",
@@ -175,94 +287,87 @@ def render_cubemap(
     # ======================================================
     logging.info("🏗️ Cache miss — iniciando processamento...")
 
-    start = time.monotonic()
-    tmp_dir = tempfile.mkdtemp(prefix=f"{build_str}_")
-    logging.info(f"📁 Temp dir: {tmp_dir}")
-
-    try:
-        # Gera stack de imagem
-        stack_img = stack_layers_image_only(
-            scene_id=scene_id,
-            layers=scene_layers,
-            selection=selection,
-            assets_root=assets_root,
-        )
-
-        # Gera tiles
-        logging.info("🧩 Gerando tiles...")
-        process_cubemap(
-            stack_img,
-            tmp_dir,
-            tile_size=512,
-            level=0,
-            build=build_str
-        )
-
-        del stack_img
-        logging.info("🧹 Memória liberada.")
-
-        # ======================================================
-        # 📤 UPLOAD TILES
-        # ======================================================
-        uploaded_count = 0
-
-        for filename in os.listdir(tmp_dir):
-            if not filename.lower().endswith(".jpg"):
-                continue
-
-            file_path = os.path.join(tmp_dir, filename)
-            key = f"{tile_root}/{filename}"
-            upload_file(file_path, key, "image/jpeg")
-            uploaded_count += 1
-
-        logging.info(f"📤 {uploaded_count} tiles salvos.")
-
-        # ======================================================
-        # 🧾 METADATA
-        # ======================================================
-        if uploaded_count > 0:
-            meta = {
-                "client": client_id,
-                "scene": scene_id,
-                "build": build_str,
-                "tileRoot": tile_root,
-                "tiles_count": uploaded_count,
-                "generated_at": int(time.time()),
-                "status": "ready",
-            }
-
-            meta_path = os.path.join(tmp_dir, "metadata.json")
-            with open(meta_path, "w", encoding="utf-8") as f:
-                json.dump(meta, f)
-
-            upload_file(meta_path, metadata_key, "application/json")
-            logging.info(f"📝 Metadata salvo: {metadata_key}")
-
-        elapsed = time.monotonic() - start
-        logging.info(f"✅ Render completo em {elapsed:.2f}s")
-
-        tiles = {
-            "baseUrl": "/panoconfig360_cache",
-            "tileRoot": tile_root,
-            "pattern": f"{build_str}_{{f}}_{{z}}_{{x}}_{{y}}.jpg",
-            "build": build_str,
-        }
+    # ======================================================
+    # ⏱️ RATE LIMIT (SÓ RENDERS NOVOS)
+    # ======================================================
+    # cache hits e pedidos que se juntam a um job em andamento não
+    # consomem tokens; renders novos passam pelos buckets do cliente e da
+    # origem (header Origin ou IP)
+    job_key = (client_id, scene_id, build_str)
+    admitted = False
+
+    if render_jobs.active(job_key) is None:
+        retry_after = render_admission.admit(client_id, limiter_origin)
+        if retry_after > 0:
+            raise HTTPException(
+                status_code=429,
+                detail="Muitas requisições — aguarde um instante.",
+                headers={"Retry-After": str(math.ceil(retry_after))},
+            )
+        admitted = True
 
-        return {
-            "status": "generated",
+    # ======================================================
+    # 🧵 JOB (SINGLE-FLIGHT POR CLIENT/SCENE/BUILD)
+    # ======================================================
+    # renders concorrentes da mesma build viram um único job: só o
+    # primeiro executa, os demais recebem o mesmo job/resultado
+    def submit_job():
+        nonlocal admitted
+        try:
+            job, created = render_jobs.submit(
+                job_key,
+                lambda job: run_render_job(job, tile_root, build_str, render_kwargs),
+            )
+        except RenderQueueFull as e:
+            if admitted:
+                render_admission.refund(client_id, limiter_origin)
+            logging.warning(f"🚧 Fila de render cheia, recusando {build_str}")
+            raise HTTPException(
+                status_code=503,
+                detail="Fila de render cheia — tente novamente em instantes.",
+                headers={"Retry-After": str(math.ceil(e.retry_after))},
+            )
+        admitted = False
+        logging.info(
+            f"🧵 Job {job.id} ({'novo' if created else 'compartilhado'}) para {build_str}")
+
+        # pedido interativo tem prioridade: cancela o render especulativo;
+        # juntou-se a um especulativo já cancelado: submete de novo
+        if not speculator.on_submit(job, created):
+            return submit_job()
+        return job
+
+    job = submit_job()
+
+    # modo job: responde na hora, render em background
+    if payload.get("async"):
+        return JSONResponse(status_code=202, content={
+            "status": job.status,
+            "job": job.id,
             "client": client_id,
             "scene": scene_id,
             "build": build_str,
-            "tiles": tiles,
-        }
+            "events": f"/api/jobs/{job.id}/events",
+        })
 
-    except Exception as e:
-        logging.exception("❌ Erro no render")
-        raise HTTPException(500, f"Erro interno: {e}")
+    # modo síncrono: espera o job (próprio ou de outro request)
+    job.wait()
 
-    finally:
-        shutil.rmtree(tmp_dir, ignore_errors=True)
-        logging.info(f"🧹 Temp removido: {tmp_dir}")
+    # especulativo cancelado logo depois do join: renderiza de novo
+    while job.cancelled:
+        job = submit_job()
+        job.wait()
+
+    if job.status != "ready":
+        raise HTTPException(500, f"Erro interno: {job.error}")
+
+    return {
+        "status": "generated",
+        "client": client_id,
+        "scene": scene_id,
+        "build": build_str,
+        "tiles": job.result,
+    }
 
 
 @app.post("/api/render2d")
@@ -276,8 +381,9 @@ def render_2d(payload: Render2DRequest):
     # ======================================================
     # 📦 CARREGA CONFIG
     # ======================================================
+    # compilada e em cache por cliente (relida quando o cfg muda)
     try:
-        project, _ = load_client_config(client_id)
+        config = client_configs.get(client_id)
     except Exception as e:
         logging.exception("❌ Falha ao carregar config")
         raise HTTPException(500, f"Erro ao carregar config: {e}")
@@ -286,7 +392,7 @@ def render_2d(payload: Render2DRequest):
     # 🎬 RESOLVE CENA
     # ======================================================
     try:
-        ctx = resolve_scene_context(project, scene_id)
+        ctx = config.scene_context(scene_id)
     except Exception as e:
         logging.exception("❌ Cena inválida")
         raise HTTPException(400, f"Cena inválida: {e}")
@@ -343,26 +449,21 @@ def render_2d(payload: Render2DRequest):
     logging.info(f"📷 Base 2D: {base_path}")
 
     # Monta lista de overlays
-    ordered_layers = sorted(
-        scene_layers, key=lambda l: l.get("build_order", 0))
     overlays = []
 
-    for layer in ordered_layers:
+    for layer in scene_layers.ordered:
         layer_id = layer["id"]
         item_id = selection.get(layer_id)
 
         if not item_id:
             continue
 
-        item = next(
-            (it for it in layer.get("items", []) if it["id"] == item_id),
-            None
-        )
+        item = scene_layers.item(layer_id, item_id)
 
         if not item:
             continue
 
-        if item.get("file") is None:
+        if item[1] is None:
             continue
 
         # Tenta overlay com prefixo 2d_
@@ -429,8 +530,153 @@ def health():
     return {"status": "ok", "service": "panoconfig360-backend", "version": "0.0.1"}
 
 
-@app.get("/panoconfig360_cache/cubemap/{client_id}/{scene_id}/tiles/{build}/{filename}")
-def get_tile(client_id: str, scene_id: str, build: str, filename: str):
+@app.post("/api/clients/{client_id}/config/reload")
+def reload_client_config(client_id: str):
+    if not SAFE_ID_RE.match(client_id):
+        raise HTTPException(400, "Cliente inválido")
+
+    try:
+        config = client_configs.reload(client_id)
+    except FileNotFoundError as e:
+        raise HTTPException(404, str(e))
+    except Exception as e:
+        logging.exception("❌ Falha ao recarregar config")
+        raise HTTPException(500, f"Erro ao carregar config: {e}")
+
+    return {
+        "status": "reloaded",
+        "client": client_id,
+        "scenes": list(config.project["scenes"]),
+    }
+
+
+@app.get("/api/metrics")
+def metrics():
+    # caches e encode: os do servidor somados aos dos workers de render
+    render = render_pool.render_stats(local_render_stats())
+    return {
+        **render,
+        "render_jobs": render_jobs.stats(),
+        "admission": render_admission.stats(),
+        "render_engine": render_pool.stats(),
+        "speculative": speculator.stats(),
+        "client_config": client_configs.stats(),
+        "build_index": build_index.stats(),
+        "hot_tiles": hot_tiles.stats(),
+        "tile_variants": tile_variants.stats(),
+        "routes": route_stats.stats(),
+    }
+
+
+@app.get("/api/jobs/{job_id}")
+def get_job(job_id: str):
+    job = render_jobs.get(job_id)
+    if job is None:
+        raise HTTPException(404, "Job não encontrado")
+    return job.snapshot()
+
+
+@app.get("/api/jobs/{job_id}/events")
+async def job_events(job_id: str):
+    job = render_jobs.get(job_id)
+    if job is None:
+        raise HTTPException(404, "Job não encontrado")
+
+    async def stream():
+        version = -1
+        preview_sent = False
+        last_sent = time.monotonic()
+
+        while True:
+            # fim pelo próprio snapshot: checar `job.finished` antes dele
+            # perderia o evento final se o job terminar entre os dois
+            snap = job.snapshot()
+            finished = snap["status"] in ("ready", "failed")
+
+            if snap["version"] != version:
+                version = snap["version"]
+                if finished:
+                    event = snap["status"]
+                elif snap["preview"] is not None and not preview_sent:
+                    event = "preview"
+                    preview_sent = True
+                else:
+                    event = "progress"
+                yield f"event: {event}\ndata: {json.dumps(snap)}\n\n"
+                last_sent = time.monotonic()
+            elif time.monotonic() - last_sent > JOB_EVENTS_KEEPALIVE_SECONDS:
+                yield ": keepalive\n\n"
+                last_sent = time.monotonic()
+
+            if finished:
+                break
+            await asyncio.sleep(JOB_EVENTS_POLL_SECONDS)
+
+    return StreamingResponse(
+        stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+@app.get("/panoconfig360_cache/clients/{client_id}/cubemap/{scene_id}/tiles/{build}/bundle")
+def get_tile_bundle(client_id: str, scene_id: str, build: str, request: Request,
+                    lod: int | None = None):
+    """
+    Todos os tiles da build (ou só do nível `lod`) numa resposta, no
+    formato de pack (ver storage/tile_pack.py).
+    """
+    if not SAFE_ID_RE.match(client_id) or not SAFE_ID_RE.match(scene_id):
+        raise HTTPException(400, "Build inválida")
+
+    build = validate_build_string(build)
+
+    levels = build_index.resolve(client_id, scene_id, build)
+    if levels is None:
+        raise HTTPException(404, "Build não encontrada")
+    if lod is not None and not 0 <= lod < len(levels):
+        raise HTTPException(400, "LOD inválido")
+
+    tile_root = tile_root_key(client_id, scene_id, build)
+    if_none_match = request.headers.get("if-none-match")
+    headers = {"Cache-Control": TILE_CACHE_CONTROL}
+
+    pack = load_pack(tile_root)
+    if pack is not None and lod is None:
+        # build inteira no modo pack: o próprio arquivo, por sendfile
+        headers["ETag"] = f'"{pack.digest}"'
+        if etag_matches(if_none_match, headers["ETag"]):
+            return Response(status_code=304, headers=headers)
+        return FileResponse(
+            local_path(f"{tile_root}/{PACK_NAME}"),
+            media_type=PACK_MEDIA_TYPE,
+            headers=headers,
+        )
+
+    if pack is not None:
+        body = pack.bundle(lod)
+    else:
+        wanted = [lod] if lod is not None else range(len(levels))
+        tiles = {}
+        for z in wanted:
+            for key in all_tile_keys(levels[z]["size"], levels[z]["tileSize"], z):
+                data = read_tile(client_id, tile_root, build, key)
+                if data is not None:
+                    tiles[key] = data
+        body = encode_pack(tiles)
+
+    headers["ETag"] = f'"{pack_digest(body)}"'
+    if etag_matches(if_none_match, headers["ETag"]):
+        return Response(status_code=304, headers=headers)
+    return Response(content=body, media_type=PACK_MEDIA_TYPE, headers=headers)
+
+
+@app.get("/panoconfig360_cache/clients/{client_id}/cubemap/{scene_id}/tiles/{build}/{filename}")
+def get_tile(client_id: str, scene_id: str, build: str, filename: str, request: Request):
+
+    # valida tenant e cena (viram caminho no storage)
+    if not SAFE_ID_RE.match(client_id) or not SAFE_ID_RE.match(scene_id):
+        raise HTTPException(400, "Tile inválido")
 
     # valida build
     build = validate_build_string(build)
@@ -443,23 +689,187 @@ def get_tile(client_id: str, scene_id: str, build: str, filename: str):
     if not filename.startswith(build + "_"):
         raise HTTPException(400, "Tile não pertence à build")
 
-    # caminho isolado por tenant e cena
-    tile_path = (
-        LOCAL_CACHE_DIR
-        / "clients"
-        / client_id
-        / "cubemap"
-        / scene_id
-        / "tiles"
-        / build
-        / filename
-    )
+    stem, ext = filename.rsplit(".", 1)
+    _, face, lod, x, y = stem.split("_")
+    key = (face, int(lod), int(x), int(y))
+    tile = (client_id, scene_id, build, key)
+
+    # ======================================================
+    # 🎛️ FORMATO: EXTENSÃO EXPLÍCITA OU NEGOCIADO NO .jpg
+    # ======================================================
+    encoding = client_tile_encoding(client_id)
+    fmt = EXT_FORMATS[ext]
+    headers = {}
+    if fmt == "jpeg" and encoding.variants:
+        fmt = encoding.negotiate(request.headers.get("accept"))
+        headers["Vary"] = "Accept"
+    elif fmt != "jpeg" and fmt not in encoding.variants:
+        raise HTTPException(404, "Formato não habilitado para o cliente")
+
+    if fmt == "jpeg":
+        return serve_jpeg_tile(request, tile, headers)
+    return serve_tile_variant(request, tile, encoding, fmt, headers)
+
+
+def client_tile_encoding(client_id: str) -> TileEncoding:
+    # tiles de um cliente sem cfg continuam servidos, só em JPEG
+    try:
+        return client_configs.get(client_id).tile_encoding
+    except Exception:
+        return DEFAULT_ENCODING
+
+
+def serve_jpeg_tile(request: Request, tile: tuple, headers: dict) -> Response:
+    client_id, scene_id, build, key = tile
+    if_none_match = request.headers.get("if-none-match")
 
-    if not tile_path.exists():
-        raise HTTPException(404, "Tile não encontrado")
+    # ======================================================
+    # 🔥 MEMÓRIA: 304 OU BYTES QUENTES, SEM TOCAR O STORAGE
+    # ======================================================
+    etag = hot_tiles.etag(tile)
+    if etag is not None and etag_matches(if_none_match, etag):
+        request.state.cache = "hit"
+        return tile_not_modified(etag, headers)
+
+    hot = hot_tiles.get(tile)
+    if hot is not None:
+        request.state.cache = "hit"
+        return tile_response(*hot, headers=headers)
+
+    request.state.cache = "miss"
+
+    # resolve direto no diretório da build ou via manifest (storage cas)
+    tile_root = tile_root_key(client_id, scene_id, build)
+    tile_key = resolve_tile(client_id, tile_root, build, key)
+
+    data = None
+    if tile_key is None:
+        data, published = read_unkeyed_tile(tile, tile_root)
+        if data is None:
+            raise HTTPException(404, "Tile não encontrado")
+        if not published:
+            # preview fica fora do cache: a build publicada pode trazer
+            # outro tile (reaproveitado) nessa posição
+            etag = f'"{tile_hash(data)}"'
+            if etag_matches(if_none_match, etag):
+                return tile_not_modified(etag, headers)
+            return tile_response(data, etag, headers=headers)
 
+    # ======================================================
+    # 💾 DISCO: ETAG DO CAS/MEMO OU DO CONTEÚDO
+    # ======================================================
+    if etag is None and tile_key is not None:
+        digest = object_digest(tile_key)
+        etag = f'"{digest}"' if digest else None
+
+    # segundo pedido do tile carrega na memória; sem ETag conhecido
+    # (modo files, primeiro pedido) os bytes são lidos para o hash
+    admit = hot_tiles.should_admit(tile)
+    if data is not None or etag is None or admit:
+        if data is None:
+            data = get_bytes(tile_key)
+        etag = etag or f'"{tile_hash(data)}"'
+        if admit:
+            hot_tiles.put(tile, data, etag)
+        else:
+            hot_tiles.remember(tile, etag)
+        if etag_matches(if_none_match, etag):
+            return tile_not_modified(etag, headers)
+        return tile_response(data, etag, headers=headers)
+
+    hot_tiles.remember(tile, etag)
+    if etag_matches(if_none_match, etag):
+        return tile_not_modified(etag, headers)
+
+    # frio: FileResponse usa sendfile (pathsend/zerocopy) se o servidor
+    # ASGI oferece, senão stream em chunks
     return FileResponse(
-        tile_path,
+        local_path(tile_key),
         media_type="image/jpeg",
-        headers={"Cache-Control": "public, max-age=31536000, immutable"},
+        headers={"Cache-Control": TILE_CACHE_CONTROL, "ETag": etag, **headers},
     )
+
+
+def read_unkeyed_tile(tile: tuple, tile_root: str) -> tuple[bytes | None, bool]:
+    """
+    Tile sem chave própria no storage: de um pack ou do preview em
+    memória de uma build ainda em render. Retorna (bytes, publicado).
+    """
+    client_id, scene_id, build, key = tile
+
+    # storage pack: o tile sai do mmap do tiles.pack da build
+    pack = load_pack(tile_root)
+    if pack is not None:
+        return pack.tile(key), True
+
+    # build ainda em render: tiles do preview ficam em memória no job
+    job = render_jobs.active((client_id, scene_id, build))
+    return (job.preview_tile(key) if job is not None else None), False
+
+
+def serve_tile_variant(request: Request, tile: tuple, encoding: TileEncoding,
+                       fmt: str, headers: dict) -> Response:
+    client_id, scene_id, build, key = tile
+    if_none_match = request.headers.get("if-none-match")
+    media_type = TILE_FORMATS[fmt]["media_type"]
+    variant = (*tile, fmt)
+
+    etag = hot_tiles.etag(variant)
+    if etag is not None and etag_matches(if_none_match, etag):
+        request.state.cache = "hit"
+        return tile_not_modified(etag, headers)
+
+    hot = hot_tiles.get(variant)
+    if hot is not None:
+        request.state.cache = "hit"
+        return tile_response(*hot, media_type=media_type, headers=headers)
+
+    request.state.cache = "miss"
+
+    # JPEG de origem (memória, storage, pack ou preview)
+    published = True
+    hot = hot_tiles.get(tile)
+    if hot is not None:
+        jpeg, jpeg_etag = hot
+    else:
+        tile_root = tile_root_key(client_id, scene_id, build)
+        tile_key = resolve_tile(client_id, tile_root, build, key)
+        if tile_key is not None:
+            jpeg = get_bytes(tile_key)
+        else:
+            jpeg, published = read_unkeyed_tile(tile, tile_root)
+        if jpeg is None:
+            raise HTTPException(404, "Tile não encontrado")
+        jpeg_etag = f'"{tile_hash(jpeg)}"'
+
+    data, etag = tile_variants.get(
+        client_id, jpeg_etag.strip('"'), jpeg, encoding, fmt,
+        TILE_FORMATS[fmt]["ext"], key[1])
+    if published:
+        hot_tiles.put(variant, data, etag)
+
+    if etag_matches(if_none_match, etag):
+        return tile_not_modified(etag, headers)
+    return tile_response(data, etag, media_type=media_type, headers=headers)
+
+
+class CacheStaticFiles(StaticFiles):
+    """
+    Cache local sem os tiles (só pela rota validada acima, com ETag e
+    memória) nem diretórios internos (.staging, .index). Configs e
+    renders 2D continuam servidos daqui.
+    """
+
+    async def get_response(self, path: str, scope):
+        parts = Path(path).parts
+        if any(part.startswith(".") for part in parts) or (
+            len(parts) >= 3 and parts[0] == "clients"
+            and parts[2] in ("cubemap", "tile_objects", "tile_variants")
+        ):
+            raise HTTPException(404, "Não encontrado")
+        return await super().get_response(path, scope)
+
+
+# Mount do cache por último: rotas acima (tiles) têm precedência
+app.mount("/panoconfig360_cache",
+          CacheStaticFiles(directory=LOCAL_CACHE_DIR), name="panoconfig360_cache")
@@ -0,0 +1,97 @@
+"""
+Compara as engines de composite de dynamic_stack_with_masks.
+
+    python -m panoconfig360_backend.benchmarks.bench_composite --cube-size 1024
+    python -m panoconfig360_backend.benchmarks.bench_composite --client monte-negro --scene kitchen
+"""
+import argparse
+import json
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+import numpy as np
+
+from panoconfig360_backend.benchmarks.synthetic import make_scene
+from panoconfig360_backend.render import dynamic_stack_with_masks as masks_stack
+from panoconfig360_backend.render.asset_cache import asset_cache
+
+CLIENTS_ROOT = Path(__file__).resolve().parents[2] / "panoconfig360_cache" / "clients"
+
+
+def _real_scene(client_id: str, scene_id: str):
+    cfg_path = CLIENTS_ROOT / client_id / f"{client_id}_cfg.json"
+    with open(cfg_path, "r", encoding="utf-8") as f:
+        config = json.load(f)
+
+    layers = config["scenes"][scene_id]["layers"]
+    selection = {}
+    for layer in layers:
+        item = next((it for it in layer["items"] if it.get("file")), None)
+        if item:
+            selection[layer["id"]] = item["id"]
+
+    return scene_id, layers, selection, CLIENTS_ROOT / client_id / "scenes" / scene_id
+
+
+def bench_engine(engine: str, scene, repeat: int) -> tuple[dict, np.ndarray]:
+    scene_id, layers, selection, assets_root = scene
+
+    # aquece o cache de assets: mede só o composite
+    masks_stack.stack_layers_array(
+        scene_id, layers, selection, assets_root, engine=engine)
+
+    timings = []
+    peak = 0
+    result = None
+    for _ in range(repeat):
+        tracemalloc.start()
+        start = time.perf_counter()
+        result = masks_stack.stack_layers_array(
+            scene_id, layers, selection, assets_root, engine=engine)
+        timings.append(time.perf_counter() - start)
+        peak = max(peak, tracemalloc.get_traced_memory()[1])
+        tracemalloc.stop()
+
+    return {
+        "engine": engine,
+        "best_s": round(min(timings), 4),
+        "mean_s": round(sum(timings) / len(timings), 4),
+        "peak_alloc_mb": round(peak / (1024 * 1024), 1),
+    }, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--client")
+    parser.add_argument("--scene")
+    parser.add_argument("--cube-size", type=int, default=1024)
+    parser.add_argument("--layers", type=int, default=3)
+    parser.add_argument("--coverage", type=float, default=0.05)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory(prefix="bench_composite_") as tmp:
+        if args.client and args.scene:
+            scene = _real_scene(args.client, args.scene)
+        else:
+            scene = make_scene(
+                Path(tmp), cube_size=args.cube_size, layers=args.layers, coverage=args.coverage)
+
+        reports = []
+        reference = None
+        for engine in masks_stack.COMPOSITE_ENGINES:
+            report, result = bench_engine(engine, scene, args.repeat)
+            if reference is None:
+                reference = result
+            report["max_abs_diff"] = int(
+                np.abs(result.astype(np.int16) - reference).max())
+            reports.append(report)
+
+        asset_cache.clear()
+
+    print(json.dumps(reports, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,389 @@
+"""
+Mede cada etapa do pipeline de render sobre uma cena sintética: carga
+do cfg, build string, os dois stacks (overlays PNG e masks), tiler,
+publicação e /api/render ponta a ponta (cliente ASGI no mesmo processo).
+Grava wall, CPU e pico de RSS por etapa num JSON; com --baseline, sai
+com erro se alguma etapa piorar além do limite. O pico de RSS é o do
+processo durante a etapa (inclui os caches das etapas anteriores):
+compare baselines medidos com o mesmo conjunto de etapas.
+Tudo (cena, builds, snapshot do índice de builds) é gravado numa raiz de
+assets temporária, apagada ao final (mantida com --keep).
+
+    python -m panoconfig360_backend.benchmarks.bench_pipeline --cube-size 1024 --save baseline.json
+    python -m panoconfig360_backend.benchmarks.bench_pipeline --cube-size 1024 --baseline baseline.json
+    python -m panoconfig360_backend.benchmarks.bench_pipeline --layers 5 --coverage 0.2 --stage stack_masks --stage render_e2e
+"""
+import os
+
+# tudo é medido neste processo (CPU e RSS): render em thread, sem
+# renders especulativos disputando a CPU e sem o rate limit barrar as
+# repetições de /api/render
+os.environ.setdefault("PANOCONFIG_RENDER_ENGINE", "thread")
+os.environ.setdefault("PANOCONFIG_SPECULATIVE", "0")
+os.environ.setdefault("PANOCONFIG_CLIENT_BURST", "1000")
+os.environ.setdefault("PANOCONFIG_ORIGIN_BURST", "1000")
+
+import sys
+import json
+import time
+import shutil
+import logging
+import argparse
+import itertools
+import platform
+import resource
+import tempfile
+import statistics
+from pathlib import Path
+
+from panoconfig360_backend.benchmarks.synthetic import make_scene, write_client_config
+from panoconfig360_backend.render import client_config
+from panoconfig360_backend.render import dynamic_stack
+from panoconfig360_backend.render import dynamic_stack_with_masks
+from panoconfig360_backend.render.client_config import CompiledConfig, config_path
+from panoconfig360_backend.render.cubemap_build import tile_root_key
+from panoconfig360_backend.render.split_faces_cubemap import (
+    as_cubemap_array,
+    process_cubemap,
+    pyramid_levels,
+)
+from panoconfig360_backend.storage import storage_local
+from panoconfig360_backend.storage.storage_local import (
+    stage_dir,
+    commit_dir,
+    delete_dir,
+    discard_dir,
+    put_json,
+)
+from panoconfig360_backend.storage.tile_store import TileWriter
+
+MB = 1024 * 1024
+
+BENCH_CLIENT = "bench-pipeline"
+BENCH_SCENE = "synthetic"
+
+STAGES = (
+    "config_load",
+    "build_string",
+    "stack_overlay",
+    "stack_masks",
+    "process_cubemap",
+    "publish",
+    "render_e2e",
+)
+
+# métrica -> unidade (o piso de ruído de cada comparação vem da unidade)
+COMPARED_METRICS = {"wall_ms": "ms", "cpu_ms": "ms", "peak_rss_mb": "MB"}
+
+
+# ======================================================
+# 📁 RAIZ DE ASSETS TEMPORÁRIA
+# ======================================================
+
+def use_assets_root(root: Path):
+    """
+    Aponta storage, cfgs e servidor para `root` (um panoconfig360_cache).
+    Antes de importar o servidor: ele e o scene_context resolvem
+    "panoconfig360_cache/clients" relativo ao diretório atual.
+    """
+    (root / "clients").mkdir(parents=True, exist_ok=True)
+    storage_local.ASSETS_ROOT = root
+    client_config.CONFIG_ROOT = root / "clients"
+    os.chdir(root.parent)
+
+
+# ======================================================
+# ⏱️ MEDIÇÃO
+# ======================================================
+
+def _reset_peak_rss() -> bool:
+    # zera o VmHWM do processo (Linux); sem isso o pico é o do processo inteiro
+    try:
+        with open("/proc/self/clear_refs", "w") as f:
+            f.write("5")
+        return True
+    except OSError:
+        return False
+
+
+def _peak_rss_bytes() -> int:
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak if sys.platform == "darwin" else peak * 1024
+
+
+def measure(fn, repeat: int, warmup: int, after=None) -> dict:
+    """
+    Mediana de wall e CPU e maior pico de RSS de `repeat` chamadas de
+    `fn`, depois de `warmup` chamadas descartadas (caches quentes).
+    `after` roda depois de cada chamada, fora da medição.
+    """
+    for _ in range(warmup):
+        fn()
+        if after is not None:
+            after()
+
+    walls, cpus, peaks = [], [], []
+    for _ in range(repeat):
+        _reset_peak_rss()
+        wall, cpu = time.perf_counter(), time.process_time()
+        fn()
+        walls.append(time.perf_counter() - wall)
+        cpus.append(time.process_time() - cpu)
+        peaks.append(_peak_rss_bytes())
+        if after is not None:
+            after()
+
+    return {
+        "wall_ms": round(statistics.median(walls) * 1000, 3),
+        "wall_min_ms": round(min(walls) * 1000, 3),
+        "cpu_ms": round(statistics.median(cpus) * 1000, 3),
+        "peak_rss_mb": round(max(peaks) / MB, 1),
+    }
+
+
+# ======================================================
+# 🧪 ETAPAS
+# ======================================================
+
+def run_stages(stages: list, selection: dict, repeat: int, warmup: int) -> dict:
+    client_id, scene_id = BENCH_CLIENT, BENCH_SCENE
+    cfg_path = config_path(client_id)
+
+    config = CompiledConfig(client_id, cfg_path, cfg_path.stat().st_mtime_ns)
+    ctx = config.scene_context(scene_id)
+    layers, assets_root = ctx["layers"], ctx["assets_root"]
+    viewer = config.viewer
+    build = dynamic_stack.build_string_from_selection(ctx["scene_index"], layers, selection)
+    tile_root = tile_root_key(client_id, scene_id, build)
+
+    results = {}
+
+    def run(name, fn, after=None):
+        if name not in stages:
+            return
+        print(f"⏱️ {name}", file=sys.stderr)
+        results[name] = measure(fn, repeat, warmup, after)
+
+    run("config_load", lambda: CompiledConfig(
+        client_id, cfg_path, cfg_path.stat().st_mtime_ns))
+
+    run("build_string", lambda: dynamic_stack.build_string_from_selection(
+        ctx["scene_index"], layers, selection))
+
+    # sem `build`: o cache de prefixos não encurta as repetições
+    run("stack_overlay", lambda: dynamic_stack.stack_layers_image_only(
+        scene_id, layers, selection, assets_root))
+
+    run("stack_masks", lambda: dynamic_stack_with_masks.stack_layers_image_only(
+        scene_id, layers, selection, assets_root))
+
+    stack = as_cubemap_array(dynamic_stack_with_masks.stack_layers_array(
+        scene_id, layers, selection, assets_root))
+    levels = pyramid_levels(stack.shape[0], viewer.get("tileSize", 512), viewer.get("lodMinSize"))
+
+    def tiles():
+        return process_cubemap(
+            stack, None, build=build, levels=levels, encoding=config.tile_encoding)
+
+    run("process_cubemap", tiles)
+
+    if "publish" in stages:
+        written = tiles()
+
+        def publish():
+            staging = stage_dir()
+            try:
+                writer = TileWriter(client_id, staging, build)
+                for tile in written:
+                    writer.put_bytes(tile["key"], tile["data"])
+                put_json(f"{staging}/metadata.json", {
+                    "build": build, "tiles_count": writer.close(), "levels": levels})
+                commit_dir(staging, tile_root)
+            finally:
+                discard_dir(staging)
+
+        run("publish", publish, after=lambda: delete_dir(tile_root))
+    del stack
+
+    if "render_e2e" in stages:
+        results["render_e2e"] = measure_render_e2e(
+            client_id, scene_id, layers, repeat, warmup)
+
+    return results
+
+
+def measure_render_e2e(client_id: str, scene_id: str, layers: list,
+                       repeat: int, warmup: int) -> dict:
+    """
+    POST /api/render de uma combinação diferente a cada repetição (jobs
+    prontos da mesma build são reaproveitados pelo servidor); a build
+    publicada é apagada em seguida, então nenhuma serve de doadora de
+    tiles. O aquecimento deixa prontos o cfg, os assets e os tiles
+    estáticos da cena: mede o render a frio de uma build num servidor
+    já quente.
+    """
+    from fastapi.testclient import TestClient
+    from panoconfig360_backend.api.server import app
+    from panoconfig360_backend.render.build_index import build_index
+
+    choices = [[(layer["id"], item["id"]) for item in layer["items"]] for layer in layers]
+    selections = [dict(combo) for combo in
+                  itertools.islice(itertools.product(*choices), warmup + repeat)]
+    if len(selections) < warmup + repeat:
+        raise ValueError(
+            f"A cena tem só {len(selections)} combinações para {warmup + repeat} "
+            f"renders (aumente --items ou --layers)")
+    pending = iter(selections)
+
+    with TestClient(app) as client:
+        def render():
+            selection = next(pending)
+            response = client.post("/api/render", json={
+                "client": client_id, "scene": scene_id, "selection": selection})
+            if response.status_code != 200 or response.json().get("status") != "generated":
+                raise RuntimeError(f"/api/render falhou: {response.status_code} {response.text[:200]}")
+            rendered.append(response.json()["build"])
+
+        def forget():
+            build = rendered.pop()
+            delete_dir(tile_root_key(client_id, scene_id, build))
+            build_index.discard(client_id, scene_id, build)
+
+        rendered = []
+        print("⏱️ render_e2e", file=sys.stderr)
+        return measure(render, repeat, warmup, after=forget)
+
+
+# ======================================================
+# 📊 BASELINE
+# ======================================================
+
+def compare(results: dict, baseline: dict, threshold: float,
+            min_delta_ms: float, min_delta_mb: float) -> list:
+    """
+    Regressões (etapa, métrica, antes, agora): acima de `threshold`
+    relativo e do piso absoluto da unidade (ruído de etapas curtas).
+    """
+    regressions = []
+    for stage, row in results.items():
+        base = baseline["stages"].get(stage)
+        if base is None:
+            continue
+        for metric, unit in COMPARED_METRICS.items():
+            old, new = base[metric], row[metric]
+            floor = min_delta_mb if unit == "MB" else min_delta_ms
+            if new > old * (1 + threshold) and new - old > floor:
+                regressions.append((stage, metric, old, new))
+    return regressions
+
+
+def print_table(results: dict, baseline: dict | None):
+    print(f"\n  {'etapa':<16} {'wall ms':>10} {'cpu ms':>10} {'rss MB':>8} {'vs base':>9}")
+    for stage, row in results.items():
+        base = baseline and baseline["stages"].get(stage)
+        delta = f"{row['wall_ms'] / base['wall_ms'] - 1:>+9.0%}" if base and base["wall_ms"] else ""
+        print(f"  {stage:<16} {row['wall_ms']:>10.2f} {row['cpu_ms']:>10.2f} "
+              f"{row['peak_rss_mb']:>8.1f} {delta}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--cube-size", type=int, default=1024)
+    parser.add_argument("--layers", type=int, default=3)
+    parser.add_argument("--items", type=int, default=2, help="itens por layer")
+    parser.add_argument("--coverage", type=float, default=0.05,
+                        help="fração do frame coberta por cada mask")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--warmup", type=int, default=1)
+    parser.add_argument("--stage", action="append", choices=STAGES,
+                        help="etapa a medir (repetível); padrão: todas")
+    parser.add_argument("--save", help="grava o resultado (novo baseline) neste arquivo")
+    parser.add_argument("--baseline", help="compara com este baseline e falha se regredir")
+    parser.add_argument("--threshold", type=float, default=0.2,
+                        help="piora relativa tolerada por métrica (0.2 = 20%%)")
+    parser.add_argument("--min-delta-ms", type=float, default=5.0,
+                        help="diferença mínima de tempo para contar como regressão")
+    parser.add_argument("--min-delta-mb", type=float, default=16.0,
+                        help="diferença mínima de RSS para contar como regressão")
+    parser.add_argument("--keep", action="store_true",
+                        help="não apaga a raiz de assets temporária ao final")
+    parser.add_argument("--verbose", action="store_true")
+    args = parser.parse_args()
+
+    logging.getLogger().setLevel(logging.INFO if args.verbose else logging.WARNING)
+
+    settings = {
+        "cube_size": args.cube_size,
+        "layers": args.layers,
+        "items": args.items,
+        "coverage": args.coverage,
+        "composite_engine": dynamic_stack_with_masks.COMPOSITE_ENGINE,
+        "render_engine": os.environ["PANOCONFIG_RENDER_ENGINE"],
+    }
+
+    baseline = None
+    if args.baseline:
+        with open(args.baseline, "r", encoding="utf-8") as f:
+            baseline = json.load(f)
+        if baseline["settings"] != settings:
+            parser.error(f"baseline medido com outra cena/config: {baseline['settings']}")
+
+    # nada do benchmark toca o cache real do repo
+    bench_dir = Path(tempfile.mkdtemp(prefix="panoconfig-bench-"))
+    assets_root = bench_dir / "panoconfig360_cache"
+    use_assets_root(assets_root)
+
+    try:
+        _, layers, selection, _ = make_scene(
+            assets_root, cube_size=args.cube_size, layers=args.layers,
+            items_per_layer=args.items, coverage=args.coverage,
+            client_id=BENCH_CLIENT, scene_id=BENCH_SCENE, overlays=True)
+        write_client_config(assets_root, BENCH_CLIENT, {BENCH_SCENE: layers},
+                            {"cubeSize": args.cube_size})
+
+        results = run_stages(
+            list(args.stage or STAGES), selection, max(1, args.repeat), max(0, args.warmup))
+    finally:
+        if args.keep:
+            print(f"📁 Raiz de assets do benchmark: {assets_root}", file=sys.stderr)
+        else:
+            shutil.rmtree(bench_dir, ignore_errors=True)
+
+    report = {
+        "settings": settings,
+        "machine": {
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpus": os.cpu_count(),
+        },
+        "repeat": args.repeat,
+        "generated_at": int(time.time()),
+        "stages": results,
+    }
+
+    print_table(results, baseline)
+
+    if args.save:
+        with open(args.save, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+
+    if baseline is not None:
+        regressions = compare(results, baseline, args.threshold,
+                              args.min_delta_ms, args.min_delta_mb)
+        for stage, metric, old, new in regressions:
+            print(f"❌ {stage}: {metric} {old} → {new} (+{new / old - 1:.0%})" if old
+                  else f"❌ {stage}: {metric} {old} → {new}")
+        if regressions:
+            sys.exit(1)
+        print("✅ sem regressões")
+
+
+if __name__ == "__main__":
+    main()
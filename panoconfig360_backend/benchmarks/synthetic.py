@@ -0,0 +1,120 @@
+import json
+from pathlib import Path
+from PIL import Image
+import numpy as np
+
+
+# ======================================================
+# 🧪 CENAS SINTÉTICAS PARA BENCHMARK
+# ======================================================
+
+def _soft_rect_mask(height: int, width: int, coverage: float, seed: int, feather: int = 8) -> np.ndarray:
+    """
+    Retângulo com borda suave cobrindo ~`coverage` do frame.
+    """
+    rng = np.random.default_rng(seed)
+    area = max(coverage, 0.0) * height * width
+    h = int(min(height, max(1, np.sqrt(area / 4))))
+    w = int(min(width, max(1, area / h)))
+    y0 = int(rng.integers(0, height - h + 1))
+    x0 = int(rng.integers(0, width - w + 1))
+
+    ys = np.arange(height)
+    xs = np.arange(width)
+    dy = np.minimum(ys - y0, y0 + h - 1 - ys)
+    dx = np.minimum(xs - x0, x0 + w - 1 - xs)
+    d = np.minimum(dy[:, None], dx[None, :]).astype(np.float32)
+
+    alpha = np.clip((d + 1) / feather, 0.0, 1.0)
+    return (alpha * 255).astype(np.uint8)
+
+
+def _texture(height: int, width: int, seed: int) -> np.ndarray:
+    rng = np.random.default_rng(seed)
+    color = rng.integers(0, 256, 3)
+    noise = rng.integers(-24, 24, (height, width // 8, 3))
+    noise = np.repeat(noise, 8, axis=1)[:, :width]
+    return np.clip(color + noise, 0, 255).astype(np.uint8)
+
+
+def make_scene(
+    root: Path,
+    cube_size: int = 1024,
+    layers: int = 3,
+    items_per_layer: int = 2,
+    coverage: float = 0.05,
+    client_id: str = "bench",
+    scene_id: str = "synthetic",
+    seed: int = 0,
+    overlays: bool = False,
+):
+    """
+    Gera uma cena no layout clients/{client}/scenes/{scene} com base,
+    masks e materials full-frame (strip horizontal 6 x cube_size).
+    Com `overlays`, grava também os assets do stack antigo
+    (dynamic_stack): base em JPEG e um PNG RGBA por item, com a mask no
+    alpha.
+    Retorna (scene_id, layers, selection, assets_root).
+    """
+    height, width = cube_size, cube_size * 6
+    assets_root = Path(root) / "clients" / client_id / "scenes" / scene_id
+    (assets_root / "masks").mkdir(parents=True, exist_ok=True)
+    (assets_root / "materials").mkdir(parents=True, exist_ok=True)
+
+    base = Image.fromarray(_texture(height, width, seed))
+    base.save(assets_root / f"base_{scene_id}.png")
+    if overlays:
+        base.save(assets_root / f"base_{scene_id}.jpg", quality=95)
+
+    scene_layers = []
+    selection = {}
+
+    for li in range(layers):
+        layer_id = f"layer{li}"
+        mask_file = f"layer_{scene_id}_{layer_id}_mask.png"
+        mask = _soft_rect_mask(height, width, coverage, seed + li + 1)
+        Image.fromarray(mask).save(assets_root / "masks" / mask_file)
+
+        items = []
+        for ii in range(items_per_layer):
+            item_id = f"mtl{li}-{ii}"
+            material_file = f"mtl_{item_id}.png"
+            material = _texture(height, width, seed + 100 * (li + 1) + ii)
+            Image.fromarray(material).save(assets_root / "materials" / material_file)
+            if overlays:
+                overlay_dir = assets_root / "layers" / layer_id
+                overlay_dir.mkdir(parents=True, exist_ok=True)
+                Image.fromarray(np.dstack([material, mask])).save(
+                    overlay_dir / f"{layer_id}_{item_id}.png")
+            items.append({"index": ii + 1, "id": item_id, "file": material_file})
+
+        scene_layers.append({
+            "id": layer_id,
+            "build_order": li,
+            "mask": mask_file,
+            "items": items,
+        })
+        selection[layer_id] = items[0]["id"]
+
+    return scene_id, scene_layers, selection, assets_root
+
+
+def write_client_config(root: Path, client_id: str, scenes: dict, viewer: dict | None = None) -> Path:
+    """
+    Grava clients/{client}/{client}_cfg.json no formato dos clientes reais,
+    com `scenes` = {scene_id: layers} (na ordem de scene_index).
+    """
+    config = {
+        "schemaVersion": "2.0",
+        "client": {"id": client_id, "label": client_id},
+        "viewer": {"type": "pano_cubic", "tileSize": 512, "lodMinSize": 256, **(viewer or {})},
+        "scenes": {
+            scene_id: {"id": scene_id, "scene_index": i, "layers": layers}
+            for i, (scene_id, layers) in enumerate(scenes.items())
+        },
+    }
+    path = Path(root) / "clients" / client_id / f"{client_id}_cfg.json"
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(config, f, indent=2)
+    return path
@@ -0,0 +1,254 @@
+import os
+import logging
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from PIL import Image
+import numpy as np
+from panoconfig360_backend.render.mask_index import MaskIndex, build_mask_index
+from panoconfig360_backend.render.asset_pack import PACKED_KINDS, asset_packs
+
+# ======================================================
+# 🔧 CONFIGURAÇÃO
+# ======================================================
+MB = 1024 * 1024
+
+ASSET_CACHE_MAX_BYTES = int(
+    os.environ.get("PANOCONFIG_ASSET_CACHE_MB", "1024")) * MB
+ASSET_CACHE_CLIENT_QUOTA_BYTES = int(
+    os.environ.get("PANOCONFIG_ASSET_CACHE_CLIENT_MB", "512")) * MB
+
+
+# ======================================================
+# 🧠 DECODIFICADORES
+# ======================================================
+
+def _decode_rgb(path: Path) -> np.ndarray:
+    with Image.open(path) as img:
+        return np.asarray(img.convert("RGB"), dtype=np.uint8)
+
+
+def _decode_mask(path: Path) -> np.ndarray:
+    with Image.open(path) as img:
+        return np.asarray(img.convert("L"), dtype=np.uint8)
+
+
+def _decode_mask_index(path: Path) -> MaskIndex:
+    mask = asset_packs.lookup(path, "mask", Path(path).stat().st_mtime_ns)
+    if mask is None:
+        mask = _decode_mask(path)
+    return build_mask_index(mask)
+
+
+DECODERS = {
+    "rgb": _decode_rgb,
+    "mask": _decode_mask,
+    "mask_index": _decode_mask_index,
+}
+
+
+# ======================================================
+# 🗃️ CACHE LRU DE ASSETS DECODIFICADOS
+# ======================================================
+
+class DecodedAssetCache:
+    """
+    Cache LRU (por processo) de assets já decodificados em uint8.
+    Limitado por bytes, com cota por cliente e invalidação por mtime.
+    Os valores devolvidos (arrays e índices de mask) são somente leitura
+    e compartilhados. Entradas "shared" (ver `put_shared`) apontam para
+    memória de outro dono (shared memory do render engine): não contam no
+    budget e não são despejadas. Assets presentes no pack da cena (ver
+    `asset_pack`) vêm direto do memmap, sem decode e sem ocupar o cache.
+    """
+
+    def __init__(self, max_bytes: int, client_quota_bytes: int):
+        self.max_bytes = max_bytes
+        self.client_quota_bytes = client_quota_bytes
+        self._entries = OrderedDict()
+        self._client_bytes = {}
+        self._total_bytes = 0
+        self._lock = threading.Lock()
+        self._counters = {
+            "hits": 0,
+            "misses": 0,
+            "evictions": 0,
+            "invalidations": 0,
+            "uncacheable": 0,
+            "packed": 0,
+        }
+        self._shared_entries = 0
+
+    def configure(self, max_bytes: int | None = None, client_quota_bytes: int | None = None):
+        with self._lock:
+            if max_bytes is not None:
+                self.max_bytes = max_bytes
+            if client_quota_bytes is not None:
+                self.client_quota_bytes = client_quota_bytes
+            for client_id in list(self._client_bytes):
+                self._evict_locked(client_id)
+
+    def get(self, path: Path, kind: str, client_id: str | None = None):
+        decoder = DECODERS.get(kind)
+        if decoder is None:
+            raise ValueError(f"Tipo de asset inválido: {kind}")
+
+        path = Path(path)
+        mtime_ns = path.stat().st_mtime_ns
+        key = (str(path), kind)
+
+        # pack da cena: o memmap já é a cópia compartilhada entre processos
+        if kind in PACKED_KINDS:
+            packed = asset_packs.lookup(path, kind, mtime_ns)
+            if packed is not None:
+                with self._lock:
+                    self._counters["packed"] += 1
+                return packed
+
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                if entry["mtime_ns"] == mtime_ns:
+                    self._entries.move_to_end(key)
+                    self._counters["hits"] += 1
+                    return entry["value"]
+
+                self._remove_locked(key)
+                self._counters["invalidations"] += 1
+
+            self._counters["misses"] += 1
+
+        # decodifica fora do lock para não serializar renders de outras cenas
+        value = decoder(path)
+        if isinstance(value, np.ndarray):
+            value.setflags(write=False)
+
+        self._put(key, value, mtime_ns, client_id or "_")
+        return value
+
+    def put_shared(self, path: Path, kind: str, value, mtime_ns: int, client_id: str | None = None):
+        """
+        Registra um valor já decodificado cuja memória pertence a outro
+        dono. Continua sujeito à invalidação por mtime em `get`.
+        """
+        key = (str(Path(path)), kind)
+        with self._lock:
+            if key in self._entries:
+                self._remove_locked(key)
+
+            self._entries[key] = {
+                "value": value,
+                "mtime_ns": mtime_ns,
+                "nbytes": 0,
+                "client": client_id or "_",
+                "shared": True,
+            }
+            self._shared_entries += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._client_bytes.clear()
+            self._total_bytes = 0
+            self._shared_entries = 0
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self._counters["hits"] + self._counters["misses"]
+            return {
+                **self._counters,
+                "hit_rate": round(self._counters["hits"] / lookups, 4) if lookups else 0.0,
+                "entries": len(self._entries),
+                "shared_entries": self._shared_entries,
+                "bytes": self._total_bytes,
+                "max_bytes": self.max_bytes,
+                "client_quota_bytes": self.client_quota_bytes,
+                "clients": dict(self._client_bytes),
+                "packs": asset_packs.stats(),
+            }
+
+    # --------------------------------------------------
+    # internos (chamados com o lock adquirido)
+    # --------------------------------------------------
+
+    def _put(self, key, value, mtime_ns: int, client_id: str):
+        nbytes = value.nbytes
+
+        with self._lock:
+            if nbytes > self.max_bytes or nbytes > self.client_quota_bytes:
+                self._counters["uncacheable"] += 1
+                return
+
+            if key in self._entries:
+                self._remove_locked(key)
+
+            self._entries[key] = {
+                "value": value,
+                "mtime_ns": mtime_ns,
+                "nbytes": nbytes,
+                "client": client_id,
+                "shared": False,
+            }
+            self._total_bytes += nbytes
+            self._client_bytes[client_id] = self._client_bytes.get(
+                client_id, 0) + nbytes
+
+            self._evict_locked(client_id)
+
+    def _remove_locked(self, key):
+        entry = self._entries.pop(key)
+        if entry["shared"]:
+            self._shared_entries -= 1
+            return
+        self._total_bytes -= entry["nbytes"]
+        client_id = entry["client"]
+        self._client_bytes[client_id] -= entry["nbytes"]
+        if self._client_bytes[client_id] <= 0:
+            del self._client_bytes[client_id]
+
+    def _evict_locked(self, client_id: str | None):
+        # cota do cliente: remove as entradas mais antigas dele
+        if client_id is not None:
+            while self._client_bytes.get(client_id, 0) > self.client_quota_bytes:
+                oldest = next(
+                    k for k, e in self._entries.items()
+                    if e["client"] == client_id and not e["shared"])
+                self._remove_locked(oldest)
+                self._counters["evictions"] += 1
+
+        # budget global: LRU puro
+        while self._total_bytes > self.max_bytes and self._entries:
+            oldest = next(
+                k for k, e in self._entries.items() if not e["shared"])
+            self._remove_locked(oldest)
+            self._counters["evictions"] += 1
+
+
+asset_cache = DecodedAssetCache(
+    ASSET_CACHE_MAX_BYTES, ASSET_CACHE_CLIENT_QUOTA_BYTES)
+
+logging.info(
+    f"🗃️ Asset cache: budget={ASSET_CACHE_MAX_BYTES // MB}MB, "
+    f"cota por cliente={ASSET_CACHE_CLIENT_QUOTA_BYTES // MB}MB")
+
+
+def client_from_assets_root(assets_root: Path) -> str | None:
+    """
+    assets_root segue o layout clients/{client}/scenes/{scene}.
+    """
+    parts = Path(assets_root).parts
+    if len(parts) >= 4 and parts[-2] == "scenes":
+        return parts[-3]
+    return None
+
+
+def load_rgb(path: Path, client_id: str | None = None) -> np.ndarray:
+    return asset_cache.get(path, "rgb", client_id)
+
+
+def load_mask(path: Path, client_id: str | None = None) -> np.ndarray:
+    return asset_cache.get(path, "mask", client_id)
+
+
+def load_mask_index(path: Path, client_id: str | None = None) -> MaskIndex:
+    return asset_cache.get(path, "mask_index", client_id)
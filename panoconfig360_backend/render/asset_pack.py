@@ -0,0 +1,269 @@
+import os
+import json
+import time
+import struct
+import hashlib
+import logging
+import threading
+from pathlib import Path
+import numpy as np
+
+# ======================================================
+# 📦 PACK DE ASSETS CRUS DA CENA
+# ======================================================
+# Um arquivo por cena (`scenes/{scene}/assets.pack`, gerado por
+# tools/compile_assets) com a base, os materiais e as masks já
+# decodificados em uint8, prontos para `np.memmap`: sem decode de PNG
+# no render, e todos os processos leem a mesma cópia no page cache.
+#
+# Formato (little-endian):
+#   [0, PACK_ALIGN)  magic "PAPK" | versão u16 (resto zerado)
+#   arrays uint8 crus, cada um começando num múltiplo de PACK_ALIGN
+#   índice JSON (utf-8)
+#   trailer: offset do índice u64 | tamanho do índice u32 | magic
+#
+# O índice lista cada asset pelo caminho relativo à cena
+# ("base_kitchen.png", "materials/mtl_x.png", "masks/layer_y.png"):
+# kind ("rgb" | "mask"), shape, offset, checksum blake2b-128 dos pixels e
+# mtime/tamanho/checksum do PNG de origem. Uma entrada cujo PNG mudou
+# depois da compilação é ignorada (o asset volta a ser decodificado).
+PACK_NAME = "assets.pack"
+PACK_MAGIC = b"PAPK"
+PACK_VERSION = 1
+PACK_ALIGN = 4096
+PACKED_KINDS = ("rgb", "mask")
+
+_HEAD = struct.Struct("<4sH")
+_TRAILER = struct.Struct("<QI4s")
+
+
+def checksum(data) -> str:
+    return hashlib.blake2b(data, digest_size=16).hexdigest()
+
+
+def file_checksum(path: Path) -> str:
+    h = hashlib.blake2b(digest_size=16)
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def _aligned(offset: int) -> int:
+    return -(-offset // PACK_ALIGN) * PACK_ALIGN
+
+
+# ======================================================
+# ✍️ ESCRITA
+# ======================================================
+
+class AssetPackWriter:
+    """
+    Escreve o pack num arquivo temporário ao lado do destino, um asset
+    por vez (sem todos em memória), e publica com um rename em `close`.
+    """
+
+    def __init__(self, path: Path, meta: dict | None = None):
+        self.path = Path(path)
+        self.meta = dict(meta or {})
+        self.entries = {}
+        self._tmp = self.path.with_name(f".{self.path.name}.{os.getpid()}.tmp")
+        self._file = open(self._tmp, "wb")
+        self._file.write(_HEAD.pack(PACK_MAGIC, PACK_VERSION).ljust(PACK_ALIGN, b"\0"))
+        self._offset = PACK_ALIGN
+
+    def add(self, name: str, kind: str, array: np.ndarray, source: dict) -> dict:
+        if kind not in PACKED_KINDS:
+            raise ValueError(f"Tipo de asset inválido para o pack: {kind}")
+        if name in self.entries:
+            raise ValueError(f"Asset repetido no pack: {name}")
+
+        data = np.ascontiguousarray(array, dtype=np.uint8)
+        self._file.write(b"\0" * (_aligned(self._offset) - self._offset))
+        self._offset = _aligned(self._offset)
+
+        entry = {
+            "kind": kind,
+            "shape": list(data.shape),
+            "offset": self._offset,
+            "checksum": checksum(data),
+            "source": source,
+        }
+        self._file.write(data.tobytes())
+        self._offset += data.nbytes
+        self.entries[name] = entry
+        return entry
+
+    def close(self) -> dict:
+        index = json.dumps({
+            **self.meta,
+            "version": PACK_VERSION,
+            "created_at": int(time.time()),
+            "assets": self.entries,
+        }, sort_keys=True).encode("utf-8")
+
+        self._file.write(index)
+        self._file.write(_TRAILER.pack(self._offset, len(index), PACK_MAGIC))
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        self._file.close()
+        os.replace(self._tmp, self.path)
+        return json.loads(index)
+
+    def discard(self):
+        self._file.close()
+        self._tmp.unlink(missing_ok=True)
+
+
+# ======================================================
+# 📖 LEITURA (MEMMAP)
+# ======================================================
+
+class AssetPack:
+    """
+    Pack aberto com um único `np.memmap` somente leitura; `array`
+    devolve views dele (nenhum byte é copiado nem decodificado).
+    """
+
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        self._data = np.memmap(self.path, dtype=np.uint8, mode="r")
+
+        size = self._data.size
+        if size < PACK_ALIGN + _TRAILER.size:
+            raise ValueError(f"Pack de assets truncado: {self.path}")
+        magic, version = _HEAD.unpack(bytes(self._data[:_HEAD.size]))
+        index_offset, index_size, tail = _TRAILER.unpack(bytes(self._data[size - _TRAILER.size:]))
+        if magic != PACK_MAGIC or tail != PACK_MAGIC or version != PACK_VERSION:
+            raise ValueError(f"Pack de assets inválido: {self.path}")
+        if index_offset + index_size + _TRAILER.size != size:
+            raise ValueError(f"Pack de assets truncado: {self.path}")
+
+        self.index = json.loads(bytes(self._data[index_offset:index_offset + index_size]))
+        self.entries = self.index["assets"]
+
+    def array(self, name: str) -> np.ndarray:
+        entry = self.entries[name]
+        shape = tuple(entry["shape"])
+        start = entry["offset"]
+        view = self._data[start:start + int(np.prod(shape))].reshape(shape)
+        # ndarray comum (não memmap) sobre o mesmo mapeamento
+        return np.asarray(view)
+
+    def verify(self, name: str) -> bool:
+        """
+        Confere o checksum dos pixels gravados.
+        """
+        return checksum(self.array(name)) == self.entries[name]["checksum"]
+
+    @property
+    def nbytes(self) -> int:
+        return int(self._data.size)
+
+
+# ======================================================
+# 🗂️ PACKS ABERTOS NESTE PROCESSO
+# ======================================================
+
+def scene_root(path: Path) -> Path:
+    """
+    Raiz da cena de um asset: a base fica na raiz, materiais e masks
+    em subpastas.
+    """
+    path = Path(path)
+    if path.parent.name in ("materials", "masks"):
+        return path.parent.parent
+    return path.parent
+
+
+class AssetPacks:
+    """
+    Um `AssetPack` por cena, reaberto quando o arquivo muda. `lookup`
+    devolve o array do pack para um asset, ou None se não há pack, o
+    asset não está nele ou o PNG mudou depois da compilação.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._packs = {}
+        self._warned = set()
+        self._counters = {"hits": 0, "stale": 0, "invalid": 0}
+
+    def open(self, root: Path) -> AssetPack | None:
+        pack_path = Path(root) / PACK_NAME
+        try:
+            mtime_ns = pack_path.stat().st_mtime_ns
+        except FileNotFoundError:
+            return None
+
+        key = str(pack_path)
+        with self._lock:
+            cached = self._packs.get(key)
+            if cached is not None and cached[0] == mtime_ns:
+                return cached[1]
+
+        try:
+            pack = AssetPack(pack_path)
+        except (ValueError, OSError, KeyError) as e:
+            logging.warning(f"⚠️ Pack de assets ignorado: {e}")
+            pack = None
+            with self._lock:
+                self._counters["invalid"] += 1
+
+        with self._lock:
+            self._packs[key] = (mtime_ns, pack)
+        if pack is not None:
+            logging.info(f"📦 Pack de assets aberto: {pack_path} ({len(pack.entries)} assets)")
+        return pack
+
+    def lookup(self, path: Path, kind: str, mtime_ns: int) -> np.ndarray | None:
+        path = Path(path)
+        root = scene_root(path)
+        pack = self.open(root)
+        if pack is None:
+            return None
+
+        name = path.relative_to(root).as_posix()
+        entry = pack.entries.get(name)
+        if entry is None or entry["kind"] != kind:
+            return None
+
+        if entry["source"]["mtime_ns"] != mtime_ns:
+            with self._lock:
+                self._counters["stale"] += 1
+                warn = (str(path), mtime_ns) not in self._warned
+                self._warned.add((str(path), mtime_ns))
+            if warn:
+                logging.warning(
+                    f"⚠️ {name} mudou depois do pack de {root.name}; decodificando o PNG "
+                    f"(recompile com tools.compile_assets)")
+            return None
+
+        with self._lock:
+            self._counters["hits"] += 1
+        return pack.array(name)
+
+    def covers(self, path: Path, kind: str) -> bool:
+        """
+        Se `lookup` serviria o asset do pack (sem contar o acesso).
+        """
+        path = Path(path)
+        root = scene_root(path)
+        pack = self.open(root)
+        if pack is None:
+            return False
+        entry = pack.entries.get(path.relative_to(root).as_posix())
+        return (entry is not None and entry["kind"] == kind
+                and entry["source"]["mtime_ns"] == path.stat().st_mtime_ns)
+
+    def stats(self) -> dict:
+        with self._lock:
+            open_packs = [p for _, p in self._packs.values() if p is not None]
+            return {
+                **self._counters,
+                "packs": len(open_packs),
+                "mapped_bytes": sum(p.nbytes for p in open_packs),
+            }
+
+
+asset_packs = AssetPacks()
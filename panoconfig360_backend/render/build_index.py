@@ -0,0 +1,405 @@
+import os
+import math
+import time
+import base64
+import hashlib
+import logging
+import threading
+
+from panoconfig360_backend.render.cubemap_build import (
+    scene_root_key,
+    tile_root_key,
+    build_levels,
+)
+from panoconfig360_backend.storage.storage_local import (
+    exists,
+    list_dirs,
+    get_json,
+    put_json,
+    mtime,
+)
+
+# ======================================================
+# 🔧 CONFIGURAÇÃO
+# ======================================================
+# "exact": dict em memória (hit e miss sem storage)
+# "bloom": Bloom filter para caches muito grandes (miss sem storage;
+#          positivo é confirmado com um exists, por causa dos falsos
+#          positivos e das builds removidas)
+BUILD_INDEX_MODES = ("exact", "bloom")
+BUILD_INDEX_MODE = os.environ.get("PANOCONFIG_BUILD_INDEX", "exact")
+BLOOM_CAPACITY = int(os.environ.get("PANOCONFIG_BUILD_INDEX_CAPACITY", "1000000"))
+BLOOM_FP_RATE = float(os.environ.get("PANOCONFIG_BUILD_INDEX_FP", "0.001"))
+
+SNAPSHOT_KEY = ".index/builds.json"
+SNAPSHOT_VERSION = 1
+SNAPSHOT_EVERY_SECONDS = 60.0
+
+
+# ======================================================
+# 🌸 BLOOM FILTER
+# ======================================================
+
+class BloomFilter:
+    """
+    Bits num bytearray; `k` posições por chave por double hashing de um
+    blake2b de 128 bits. Sem remoção.
+    """
+
+    def __init__(self, capacity: int, fp_rate: float):
+        self.capacity = max(1, capacity)
+        self.fp_rate = fp_rate
+        self.m = max(8, int(-self.capacity * math.log(fp_rate) / math.log(2) ** 2))
+        self.k = max(1, round(self.m / self.capacity * math.log(2)))
+        self.bits = bytearray((self.m + 7) // 8)
+        self.count = 0
+
+    def _positions(self, key: str):
+        digest = hashlib.blake2b(key.encode(), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], "little")
+        h2 = int.from_bytes(digest[8:], "little") | 1
+        return ((h1 + i * h2) % self.m for i in range(self.k))
+
+    def add(self, key: str):
+        for pos in self._positions(key):
+            self.bits[pos >> 3] |= 1 << (pos & 7)
+        self.count += 1
+
+    def __contains__(self, key: str) -> bool:
+        return all(self.bits[pos >> 3] & (1 << (pos & 7)) for pos in self._positions(key))
+
+    def to_dict(self) -> dict:
+        return {
+            "capacity": self.capacity,
+            "fp_rate": self.fp_rate,
+            "count": self.count,
+            "bits": base64.b64encode(bytes(self.bits)).decode("ascii"),
+        }
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "BloomFilter":
+        bloom = cls(data["capacity"], data["fp_rate"])
+        bits = base64.b64decode(data["bits"])
+        if len(bits) != len(bloom.bits):
+            raise ValueError("Bloom filter com tamanho inesperado")
+        bloom.bits = bytearray(bits)
+        bloom.count = data["count"]
+        return bloom
+
+
+# ======================================================
+# 📚 ÍNDICE DE BUILDS RENDERIZADAS
+# ======================================================
+
+class BuildIndex:
+    """
+    Builds publicadas por (client, scene), com os níveis de LOD de cada
+    uma (o que o payload de um cache hit precisa do metadata). Carregado
+    de um snapshot persistido (ou de um scan do storage, se não houver)
+    e mantido em dia pelo servidor a cada publish/remoção.
+
+    Builds publicadas fora do servidor (ex.: bake) entram na primeira
+    consulta que não as encontra: `resolve` confirma o miss no storage.
+    No modo exact, cenas cujo diretório de tiles mudou depois do snapshot
+    (builds removidas com o servidor parado) são varridas de novo na carga.
+    Os níveis são deduplicados numa tabela (quase sempre um por cena).
+    """
+
+    def __init__(self, mode: str, capacity: int, fp_rate: float):
+        if mode not in BUILD_INDEX_MODES:
+            raise ValueError(f"Modo de índice de builds inválido: {mode}")
+        self.mode = mode
+        self.capacity = capacity
+        self.fp_rate = fp_rate
+        self._lock = threading.Lock()
+        self._reset_locked()
+        self._dirty = False
+        self._stop = threading.Event()
+        self._thread = None
+        self._counters = {
+            "hits": 0,
+            "misses": 0,
+            "healed": 0,
+            "false_positives": 0,
+            "added": 0,
+            "discarded": 0,
+            "snapshots": 0,
+            "refreshed_scenes": 0,
+        }
+        self.loaded_from = None
+
+    # ---------- consulta ----------
+
+    def lookup(self, client_id: str, scene_id: str, build: str) -> list | None:
+        """
+        Níveis da build se publicada, senão None. No modo exact não toca
+        o storage.
+        """
+        with self._lock:
+            scene = (client_id, scene_id)
+            if self.mode == "exact":
+                level_id = self._builds.get(scene, {}).get(build)
+                if level_id is None:
+                    self._counters["misses"] += 1
+                    return None
+                self._counters["hits"] += 1
+                return self._levels[level_id]
+
+            if f"{client_id}/{scene_id}/{build}" not in self._bloom:
+                self._counters["misses"] += 1
+                return None
+            scene_levels = self._scene_levels.get(scene, [])
+
+        # bloom: positivo pode ser falso (ou build removida)
+        meta_key = f"{tile_root_key(client_id, scene_id, build)}/metadata.json"
+        if not exists(meta_key):
+            with self._lock:
+                self._counters["false_positives"] += 1
+            return None
+
+        with self._lock:
+            self._counters["hits"] += 1
+            if len(scene_levels) == 1:
+                return self._levels[scene_levels[0]]
+        return build_levels(get_json(meta_key))
+
+    def resolve(self, client_id: str, scene_id: str, build: str) -> list | None:
+        """
+        Como `lookup`, mas confirma o miss no storage e indexa a build se
+        ela existir (publicada por outro processo).
+        """
+        levels = self.lookup(client_id, scene_id, build)
+        if levels is not None:
+            return levels
+
+        meta_key = f"{tile_root_key(client_id, scene_id, build)}/metadata.json"
+        if not exists(meta_key):
+            return None
+
+        levels = build_levels(get_json(meta_key))
+        self.add(client_id, scene_id, build, levels)
+        with self._lock:
+            self._counters["healed"] += 1
+        logging.info(f"📚 Build fora do índice encontrada no storage: {build}")
+        return levels
+
+    # ---------- atualização ----------
+
+    def add(self, client_id: str, scene_id: str, build: str, levels: list):
+        with self._lock:
+            self._add_locked((client_id, scene_id), build, levels)
+            self._counters["added"] += 1
+            self._dirty = True
+
+    def discard(self, client_id: str, scene_id: str, build: str):
+        # no modo bloom não há remoção: o exists do lookup filtra
+        with self._lock:
+            if self.mode == "exact":
+                self._builds.get((client_id, scene_id), {}).pop(build, None)
+            self._counters["discarded"] += 1
+            self._dirty = True
+
+    # ---------- carga e snapshot ----------
+
+    def load(self):
+        """
+        Preenche o índice pelo snapshot; sem snapshot válido, varre o
+        storage (e grava um snapshot novo).
+        """
+        start = time.monotonic()
+        try:
+            data = get_json(SNAPSHOT_KEY) if exists(SNAPSHOT_KEY) else None
+            if data is not None and self._load_snapshot(data):
+                self.loaded_from = "snapshot"
+                if self.mode == "exact":
+                    self._refresh_stale_scenes(data["saved_at"])
+        except Exception as e:
+            logging.warning(f"⚠️ Snapshot do índice de builds inválido: {e}")
+
+        if self.loaded_from is None:
+            self._scan()
+            self.loaded_from = "scan"
+            self.save()
+
+        logging.info(
+            f"📚 Índice de builds ({self.mode}) carregado de {self.loaded_from}: "
+            f"{self._size()} builds em {time.monotonic() - start:.2f}s")
+
+    def save(self):
+        with self._lock:
+            data = self._snapshot_locked()
+            self._dirty = False
+        put_json(SNAPSHOT_KEY, data)
+        with self._lock:
+            self._counters["snapshots"] += 1
+
+    def start(self):
+        """
+        Grava o snapshot periodicamente (se mudou) até `stop`.
+        """
+        if self._thread is not None:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(
+            target=self._snapshot_loop, name="build-index", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+            self._thread = None
+        if self._dirty:
+            self.save()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                **self._counters,
+                "mode": self.mode,
+                "builds": self._size_locked(),
+                "scenes": len(self._scene_levels),
+                "level_sets": len(self._levels),
+                "loaded_from": self.loaded_from,
+            }
+
+    # ---------- internos ----------
+
+    def _reset_locked(self):
+        self._levels = []
+        self._level_ids = {}
+        self._scene_levels = {}
+        self._builds = {}
+        self._bloom = (BloomFilter(self.capacity, self.fp_rate)
+                       if self.mode == "bloom" else None)
+
+    def _add_locked(self, scene: tuple, build: str, levels: list):
+        levels_key = tuple((l["size"], l["tileSize"]) for l in levels)
+        level_id = self._level_ids.get(levels_key)
+        if level_id is None:
+            level_id = len(self._levels)
+            self._levels.append(levels)
+            self._level_ids[levels_key] = level_id
+
+        scene_levels = self._scene_levels.setdefault(scene, [])
+        if level_id not in scene_levels:
+            scene_levels.append(level_id)
+
+        if self.mode == "exact":
+            self._builds.setdefault(scene, {})[build] = level_id
+        else:
+            self._bloom.add(f"{scene[0]}/{scene[1]}/{build}")
+
+    def _scan(self):
+        with self._lock:
+            self._reset_locked()
+
+        for scene in self._stored_scenes():
+            self._scan_scene(scene)
+
+    def _stored_scenes(self) -> list:
+        return [(client_id, scene_id)
+                for client_id in list_dirs("clients")
+                for scene_id in list_dirs(f"clients/{client_id}/cubemap")]
+
+    def _scan_scene(self, scene: tuple):
+        tiles_key = f"{scene_root_key(*scene)}/tiles"
+        found = []
+        for build in list_dirs(tiles_key):
+            meta_key = f"{tiles_key}/{build}/metadata.json"
+            if exists(meta_key):
+                found.append((build, build_levels(get_json(meta_key))))
+
+        with self._lock:
+            if self.mode == "exact":
+                self._builds.pop(scene, None)
+            for build, levels in found:
+                self._add_locked(scene, build, levels)
+
+    def _refresh_stale_scenes(self, saved_at: float):
+        """
+        Varre de novo as cenas cujo diretório de tiles mudou desde o
+        snapshot (publish ou remoção de build muda o mtime do diretório)
+        e tira as que não existem mais. Builds novas também seriam
+        achadas por `resolve`; as removidas virariam hits com 404.
+        """
+        with self._lock:
+            scenes = set(self._builds)
+        scenes.update(self._stored_scenes())
+
+        refreshed = 0
+        for scene in scenes:
+            tiles_key = f"{scene_root_key(*scene)}/tiles"
+            if exists(tiles_key) and mtime(tiles_key) < saved_at:
+                continue
+            self._scan_scene(scene)
+            refreshed += 1
+
+        if refreshed:
+            with self._lock:
+                self._counters["refreshed_scenes"] += refreshed
+                self._dirty = True
+            logging.info(f"📚 {refreshed} cenas mudaram desde o snapshot e foram varridas")
+
+    def _snapshot_locked(self) -> dict:
+        data = {
+            "version": SNAPSHOT_VERSION,
+            "mode": self.mode,
+            "saved_at": time.time(),
+            "levels": self._levels,
+            "scene_levels": {f"{c}/{s}": ids for (c, s), ids in self._scene_levels.items()},
+        }
+        if self.mode == "exact":
+            data["builds"] = {f"{c}/{s}": builds for (c, s), builds in self._builds.items()}
+        else:
+            data["bloom"] = self._bloom.to_dict()
+        return data
+
+    def _load_snapshot(self, data: dict) -> bool:
+        if data.get("version") != SNAPSHOT_VERSION or data.get("mode") != self.mode:
+            return False
+
+        bloom = None
+        if self.mode == "bloom":
+            bloom = BloomFilter.from_dict(data["bloom"])
+            if (bloom.capacity, bloom.fp_rate) != (self.capacity, self.fp_rate):
+                return False
+
+        with self._lock:
+            self._reset_locked()
+            self._levels = data["levels"]
+            self._level_ids = {
+                tuple((l["size"], l["tileSize"]) for l in levels): i
+                for i, levels in enumerate(self._levels)
+            }
+            self._scene_levels = {
+                tuple(key.split("/", 1)): ids for key, ids in data["scene_levels"].items()
+            }
+            if bloom is not None:
+                self._bloom = bloom
+            else:
+                self._builds = {
+                    tuple(key.split("/", 1)): builds for key, builds in data["builds"].items()
+                }
+        return True
+
+    def _snapshot_loop(self):
+        while not self._stop.wait(SNAPSHOT_EVERY_SECONDS):
+            if not self._dirty:
+                continue
+            try:
+                self.save()
+            except Exception:
+                logging.exception("❌ Falha ao gravar snapshot do índice de builds")
+
+    def _size_locked(self) -> int:
+        if self.mode == "exact":
+            return sum(len(b) for b in self._builds.values())
+        return self._bloom.count
+
+    def _size(self) -> int:
+        with self._lock:
+            return self._size_locked()
+
+
+build_index = BuildIndex(BUILD_INDEX_MODE, BLOOM_CAPACITY, BLOOM_FP_RATE)
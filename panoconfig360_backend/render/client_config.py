@@ -0,0 +1,145 @@
+import os
+import time
+import logging
+import threading
+from pathlib import Path
+
+from panoconfig360_backend.render.dynamic_stack import load_config
+from panoconfig360_backend.render.layer_table import CompiledLayers
+from panoconfig360_backend.render.scene_context import resolve_scene_context
+from panoconfig360_backend.render.tile_encoding import resolve_tile_encoding
+
+# ======================================================
+# 🔧 CONFIGURAÇÃO
+# ======================================================
+CONFIG_ROOT = Path(__file__).resolve().parents[2] / "panoconfig360_cache" / "clients"
+
+# intervalo mínimo entre checagens de mtime do cfg (0 = toda chamada);
+# mudanças aparecem em até este tempo, ou na hora com `reload`
+CONFIG_CHECK_SECONDS = float(os.environ.get("PANOCONFIG_CONFIG_CHECK_SECONDS", "2"))
+
+
+def config_path(client_id: str) -> Path:
+    return CONFIG_ROOT / client_id / f"{client_id}_cfg.json"
+
+
+# ======================================================
+# 🧾 CONFIG COMPILADA
+# ======================================================
+
+class CompiledConfig:
+    """
+    Config de um cliente pronta para servir pedidos: `project` é o mesmo
+    dict de antes (com `scenes` e `client_id`), cada cena já tem o
+    contexto resolvido, com as layers em `CompiledLayers`, e
+    `tile_encoding` é o preset de encode dos tiles.
+    """
+
+    def __init__(self, client_id: str, path: Path, mtime_ns: int):
+        project, scenes, naming = load_config(path)
+        project["scenes"] = scenes
+        project["client_id"] = client_id
+
+        self.client_id = client_id
+        self.project = project
+        self.naming = naming
+        self.mtime_ns = mtime_ns
+        self.loaded_at = time.time()
+        self.tile_encoding = resolve_tile_encoding(project.get("viewer", {}))
+        self._scenes = {}
+
+        for scene_id in scenes:
+            ctx = resolve_scene_context(project, scene_id)
+            ctx["layers"] = CompiledLayers(ctx["layers"], ctx["assets_root"])
+            self._scenes[scene_id] = ctx
+
+    @property
+    def viewer(self) -> dict:
+        return self.project.get("viewer", {})
+
+    def scene_context(self, scene_id: str | None) -> dict:
+        """
+        Mesmo retorno de `resolve_scene_context`, sem recomputar.
+        """
+        if not scene_id:
+            scene_id = next(iter(self._scenes), None)
+        if scene_id not in self._scenes:
+            raise ValueError(f"Scene inválida: {scene_id}")
+        return self._scenes[scene_id]
+
+
+# ======================================================
+# 🗂️ CACHE POR CLIENTE
+# ======================================================
+
+class ClientConfigCache:
+    """
+    Uma CompiledConfig por cliente. O cfg é relido quando o mtime muda
+    (checado no máximo a cada `check_seconds`) ou com `reload`.
+    """
+
+    def __init__(self, check_seconds: float):
+        self.check_seconds = check_seconds
+        self._entries = {}
+        self._lock = threading.Lock()
+        self._counters = {"hits": 0, "loads": 0, "reloads": 0}
+
+    def get(self, client_id: str) -> CompiledConfig:
+        now = time.monotonic()
+
+        with self._lock:
+            entry = self._entries.get(client_id)
+            if entry is not None and now - entry["checked_at"] < self.check_seconds:
+                self._counters["hits"] += 1
+                return entry["config"]
+
+        path = config_path(client_id)
+        try:
+            mtime_ns = path.stat().st_mtime_ns
+        except FileNotFoundError:
+            with self._lock:
+                self._entries.pop(client_id, None)
+            raise FileNotFoundError(
+                f"Configuração do cliente '{client_id}' não encontrada em {path}.")
+
+        if entry is not None and entry["config"].mtime_ns == mtime_ns:
+            with self._lock:
+                entry["checked_at"] = now
+                self._counters["hits"] += 1
+            return entry["config"]
+
+        return self._load(client_id, path, mtime_ns, now)
+
+    def reload(self, client_id: str) -> CompiledConfig:
+        """
+        Relê o cfg agora, mesmo sem mudança de mtime.
+        """
+        path = config_path(client_id)
+        if not path.exists():
+            with self._lock:
+                self._entries.pop(client_id, None)
+            raise FileNotFoundError(
+                f"Configuração do cliente '{client_id}' não encontrada em {path}.")
+
+        with self._lock:
+            self._counters["reloads"] += 1
+        return self._load(client_id, path, path.stat().st_mtime_ns, time.monotonic())
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                **self._counters,
+                "clients": len(self._entries),
+                "check_seconds": self.check_seconds,
+            }
+
+    def _load(self, client_id: str, path: Path, mtime_ns: int, now: float) -> CompiledConfig:
+        config = CompiledConfig(client_id, path, mtime_ns)
+        with self._lock:
+            self._entries[client_id] = {"config": config, "checked_at": now}
+            self._counters["loads"] += 1
+        logging.info(f"🗂️ Config compilada: {client_id} ({len(config.project['scenes'])} cenas)")
+        return config
+
+
+client_configs = ClientConfigCache(CONFIG_CHECK_SECONDS)
@@ -0,0 +1,489 @@
+import os
+import time
+import hashlib
+import logging
+import threading
+from itertools import chain
+from pathlib import Path
+
+from panoconfig360_backend.render import split_faces_cubemap
+from panoconfig360_backend.render import dynamic_stack_with_masks
+from panoconfig360_backend.render.split_faces_cubemap import (
+    as_cubemap_array,
+    process_cubemap,
+    stream_cubemap,
+    pyramid_levels,
+    pyramid_tile_keys,
+)
+from panoconfig360_backend.render.tile_reuse import (
+    scene_tile_map,
+    static_tiles,
+    plan_tile_reuse,
+)
+from panoconfig360_backend.render.asset_cache import client_from_assets_root
+from panoconfig360_backend.render.tile_encoding import TileEncoding, DEFAULT_ENCODING
+from panoconfig360_backend.render.render_jobs import RenderCancelled
+from panoconfig360_backend.storage.storage_local import (
+    exists,
+    list_dirs,
+    get_json,
+    put_json,
+    mtime,
+    stage_dir,
+    commit_dir,
+    delete_dir,
+    discard_dir,
+)
+from panoconfig360_backend.storage.tile_store import TileWriter, forget_manifest, forget_pack
+
+SHARED_BUILD = "static"
+# uma geração de tiles estáticos por fingerprint: `{scene}/shared-{hash}`
+SHARED_DIR_PREFIX = "shared-"
+
+# Composite em streaming: tile a tile durante o tiling, com memória de
+# trabalho limitada (PANOCONFIG_STREAM_MAX_MB) em vez do frame inteiro.
+# "auto" liga a partir de STREAM_MIN_FACE_SIZE. Só o stack com masks
+# tem composite sob demanda. O teto só cobre o render inteiro com o pack
+# de assets da cena compilado (tools/compile_assets); sem ele os assets
+# ficam decodificados inteiros (ver CompositeSource e `streaming_stats`).
+COMPOSITE_STREAMING_MODES = ("auto", "on", "off")
+COMPOSITE_STREAMING = os.environ.get("PANOCONFIG_COMPOSITE_STREAMING", "auto")
+STREAM_MIN_FACE_SIZE = int(os.environ.get("PANOCONFIG_STREAM_MIN_FACE", "2048"))
+
+STREAMING_SOURCES = {
+    dynamic_stack_with_masks.stack_layers_array: dynamic_stack_with_masks.open_composite,
+    dynamic_stack_with_masks.stack_layers_image_only: dynamic_stack_with_masks.open_composite,
+}
+
+_streaming_lock = threading.Lock()
+_streaming_stats = {
+    # builds compostas em streaming
+    "builds": 0,
+    # com todos os assets no pack (memmap): o teto vale para o render todo
+    "packed_builds": 0,
+    # com assets decodificados inteiros: o teto vale só para o trabalho
+    "decoded_builds": 0,
+}
+
+
+# ======================================================
+# 🧭 CHAVES DE STORAGE
+# ======================================================
+
+def scene_root_key(client_id: str, scene_id: str) -> str:
+    return f"clients/{client_id}/cubemap/{scene_id}"
+
+
+def tile_root_key(client_id: str, scene_id: str, build: str) -> str:
+    return f"{scene_root_key(client_id, scene_id)}/tiles/{build}"
+
+
+def build_levels(meta: dict) -> list:
+    """
+    Níveis de LOD de uma build publicada. Builds anteriores à pirâmide
+    têm um único nível, do tamanho da face.
+    """
+    levels = meta.get("levels")
+    if levels:
+        return levels
+    face_size = meta.get("face_size", 1024)
+    return [{"size": face_size, "tileSize": meta.get("tile_size", 512)}]
+
+
+def build_encoding(meta: dict) -> str:
+    """
+    Fingerprint do preset de encode da build (builds anteriores aos
+    presets usam o encode padrão).
+    """
+    return meta.get("encoding", DEFAULT_ENCODING.fingerprint)
+
+
+# builds publicadas por cena: (client, scene) -> (mtime do diretório de
+# tiles, {build: (níveis, encoding)}); publish e remoção de build mudam o
+# mtime, inclusive os feitos por outros processos
+_scene_builds = {}
+_scene_builds_lock = threading.Lock()
+
+
+def _published_builds(client_id: str, scene_id: str) -> dict:
+    tiles_key = f"{scene_root_key(client_id, scene_id)}/tiles"
+    if not exists(tiles_key):
+        return {}
+
+    stamp = mtime(tiles_key)
+    with _scene_builds_lock:
+        cached = _scene_builds.get((client_id, scene_id))
+    if cached is not None and cached[0] == stamp:
+        return cached[1]
+
+    # diretório mudou: só o metadata das builds novas é lido
+    known = cached[1] if cached is not None else {}
+    builds = {}
+    for b in list_dirs(tiles_key):
+        if b in known:
+            builds[b] = known[b]
+            continue
+        meta_key = f"{tiles_key}/{b}/metadata.json"
+        if not exists(meta_key):
+            continue
+        meta = get_json(meta_key)
+        builds[b] = (build_levels(meta), build_encoding(meta))
+
+    with _scene_builds_lock:
+        _scene_builds[(client_id, scene_id)] = (stamp, builds)
+    return builds
+
+
+def rendered_builds(client_id: str, scene_id: str, levels: list | None = None,
+                    encoding: str | None = None) -> list:
+    """
+    Builds publicadas da cena. Com `levels`, só as que têm a mesma
+    pirâmide (as chaves (face, lod, x, y) só são comparáveis assim); com
+    `encoding` (fingerprint), só as codificadas com o mesmo preset.
+    A lista por cena fica em memória e só é relida quando o diretório de
+    tiles muda (um stat por chamada).
+    """
+    return [b for b, (b_levels, b_encoding) in _published_builds(client_id, scene_id).items()
+            if (levels is None or b_levels == levels)
+            and (encoding is None or b_encoding == encoding)]
+
+
+def streaming_stats() -> dict:
+    with _streaming_lock:
+        stats = dict(_streaming_stats)
+    stats["mode"] = COMPOSITE_STREAMING
+    stats["max_bytes"] = split_faces_cubemap.STREAM_MAX_BYTES
+    return stats
+
+
+def streaming_source(stack_fn, scene_id: str, assets_root: Path):
+    """
+    Função que abre o composite sob demanda do `stack_fn` (mesma
+    assinatura), se a build deve ser composta em streaming; senão None.
+    """
+    if COMPOSITE_STREAMING not in COMPOSITE_STREAMING_MODES:
+        raise ValueError(f"Modo de streaming do composite inválido: {COMPOSITE_STREAMING}")
+
+    open_fn = STREAMING_SOURCES.get(stack_fn)
+    if open_fn is None or COMPOSITE_STREAMING == "off":
+        return None
+    if (COMPOSITE_STREAMING == "auto" and dynamic_stack_with_masks.composite_face_size(
+            scene_id, Path(assets_root)) < STREAM_MIN_FACE_SIZE):
+        return None
+    return open_fn
+
+
+# ======================================================
+# 🧱 TILES ESTÁTICOS COMPARTILHADOS DA CENA
+# ======================================================
+
+def _static_fingerprint(layers: list, assets_root: Path, scene_id: str,
+                        width: int, levels: list, encoding: TileEncoding) -> str:
+    parts = [f"{width}:" + ",".join(f"{l['size']}/{l['tileSize']}" for l in levels)]
+    if encoding.fingerprint != DEFAULT_ENCODING.fingerprint:
+        parts.append(f"enc@{encoding.fingerprint}")
+    paths = [assets_root / f"base_{scene_id}.png"]
+    paths += [assets_root / "masks" / l["mask"] for l in layers if l.get("mask")]
+    for path in paths:
+        mtime = path.stat().st_mtime_ns if path.exists() else 0
+        parts.append(f"{path.name}@{mtime}")
+    return "|".join(parts)
+
+
+def shared_static_root(client_id: str, scene_id: str, fingerprint: str) -> str:
+    digest = hashlib.blake2b(fingerprint.encode(), digest_size=16).hexdigest()
+    return f"{scene_root_key(client_id, scene_id)}/{SHARED_DIR_PREFIX}{digest}"
+
+
+def _drop_old_shared(client_id: str, scene_id: str, shared_root: str):
+    # gerações antigas (e o `shared` sem versão de antes delas)
+    scene_root = scene_root_key(client_id, scene_id)
+    for name in list_dirs(scene_root):
+        old_root = f"{scene_root}/{name}"
+        if old_root == shared_root:
+            continue
+        if name == "shared" or name.startswith(SHARED_DIR_PREFIX):
+            delete_dir(old_root)
+            forget_manifest(old_root)
+            forget_pack(old_root)
+
+
+def _ensure_shared_static(render_tiles, client_id: str, scene_id: str, keys: set,
+                          fingerprint: str) -> tuple[str, set]:
+    """
+    Tiles que nenhuma mask toca são renderizados uma vez por cena e
+    reaproveitados por todas as builds.
+    `render_tiles(build, keys)` gera os registros de tile do composite.
+    Cada fingerprint (base, masks, pirâmide, encode) publica o seu próprio
+    diretório, nunca sobrescrito: manifests e packs em cache nos outros
+    workers (ver tile_store) não servem tiles de uma geração antiga.
+    Retorna (diretório compartilhado, chaves disponíveis nele).
+    """
+    shared_root = shared_static_root(client_id, scene_id, fingerprint)
+    meta_key = f"{shared_root}/metadata.json"
+
+    if exists(meta_key):
+        meta = get_json(meta_key)
+        if meta.get("fingerprint") == fingerprint:
+            return shared_root, {tuple(k) for k in meta.get("tiles", [])}
+
+    if not keys:
+        return shared_root, set()
+
+    staging = stage_dir()
+    written = 0
+    try:
+        # cada tile é gravado assim que sai do encoder: em streaming só a
+        # fila do encoder fica em memória
+        writer = TileWriter(client_id, staging, SHARED_BUILD)
+        for tile in render_tiles(SHARED_BUILD, keys):
+            writer.put_bytes(tile["key"], tile["data"])
+            tile["data"] = None
+            written += 1
+        writer.close()
+
+        put_json(f"{staging}/metadata.json", {
+            "fingerprint": fingerprint,
+            "tiles": sorted(list(k) for k in keys),
+            "generated_at": int(time.time()),
+        })
+        # outro render pode ter publicado a mesma geração: mesmo conteúdo
+        commit_dir(staging, shared_root)
+    except Exception:
+        discard_dir(staging)
+        raise
+
+    _drop_old_shared(client_id, scene_id, shared_root)
+    logging.info(f"🧱 {written} tiles estáticos compartilhados em {shared_root}")
+    return shared_root, set(keys)
+
+
+# ======================================================
+# 🏗️ RENDER DE UMA BUILD
+# ======================================================
+
+def render_cubemap_build(
+    stack_fn,
+    client_id: str,
+    scene_id: str,
+    layers: list,
+    selection: dict,
+    assets_root: Path,
+    build: str,
+    tile_size: int = 512,
+    lod_min_size: int | None = None,
+    reuse_tiles: bool = True,
+    on_progress=None,
+    on_preview=None,
+    should_cancel=None,
+    tile_encoding: TileEncoding | None = None,
+) -> dict:
+    """
+    Composite + pirâmide de tiles + upload + metadata de uma build.
+    Os níveis vão de `lod_min_size` (padrão LOD_MIN_FACE_SIZE) até a face
+    do composite, dobrando a cada nível (ver `pyramid_levels`).
+    Com `reuse_tiles`, só os tiles tocados pelas layers que mudaram em
+    relação à build já renderizada mais próxima são codificados; o resto é
+    reaproveitado dessa build (ou dos tiles estáticos da cena) por hardlink
+    ou por referência no manifest, conforme o modo de storage.
+    `on_progress(stage, done, total)` reporta as etapas "composite",
+    "tile" e "publish". Com `on_preview(level, {key: bytes})`, o menor nível
+    é codificado logo após o composite e entregue antes do resto (exceto
+    em streaming, ver `streaming_source`: sem o frame inteiro, o menor
+    nível só fica pronto junto com o resto).
+    `should_cancel()` é consultado entre as etapas; se verdadeiro, o
+    render levanta RenderCancelled sem publicar nada.
+    `tile_encoding` é o preset de encode do cliente (padrão: JPEG q95
+    4:4:4); só builds do mesmo preset doam tiles.
+    Retorna o metadata gravado.
+    """
+    progress = on_progress or (lambda stage, done, total: None)
+    encoding = tile_encoding or DEFAULT_ENCODING
+
+    def checkpoint():
+        if should_cancel is not None and should_cancel():
+            raise RenderCancelled(build)
+
+    tile_root = tile_root_key(client_id, scene_id, build)
+
+    start = time.monotonic()
+
+    # tudo é escrito num staging no mesmo filesystem e publicado com um
+    # único rename: leitores nunca veem uma build pela metade
+    staging = stage_dir()
+    logging.info(f"📁 Staging: {staging}")
+
+    try:
+        stack_kwargs = {
+            "scene_id": scene_id,
+            "layers": layers,
+            "selection": selection,
+            "assets_root": assets_root,
+            "build": build,
+        }
+        open_source = streaming_source(stack_fn, scene_id, assets_root)
+
+        progress("composite", 0, 1)
+        if open_source is not None:
+            # streaming: o composite é feito tile a tile pelo tiler
+            stack = None
+            source = open_source(**stack_kwargs)
+            face_size, width = source.face_size, source.width
+            with _streaming_lock:
+                _streaming_stats["builds"] += 1
+                _streaming_stats["packed_builds" if source.packed else "decoded_builds"] += 1
+            logging.info(
+                f"🌊 Composite em streaming (face {face_size}px, "
+                f"assets {'do pack' if source.packed else 'decodificados'})")
+        else:
+            # Gera stack de imagem: um único buffer uint8 do qual o tiler só
+            # tira views (stack em PIL é convertido aqui, uma vez)
+            source = None
+            stack = as_cubemap_array(stack_fn(**stack_kwargs))
+            face_size, width = stack.shape[:2]
+
+        progress("composite", 1, 1)
+        checkpoint()
+
+        levels = pyramid_levels(face_size, tile_size, lod_min_size)
+        keys = pyramid_tile_keys(levels)
+
+        def render_tiles(tile_build: str, only_tiles: set, on_tile=None):
+            if source is not None:
+                return stream_cubemap(
+                    source, tile_build, levels, only_tiles=only_tiles, encoding=encoding)
+            return process_cubemap(
+                stack, None, build=tile_build, only_tiles=only_tiles, levels=levels,
+                on_tile=on_tile, encoding=encoding)
+
+        # ======================================================
+        # 👁️ PREVIEW (MENOR NÍVEL)
+        # ======================================================
+        preview = {}
+        if on_preview is not None and source is None:
+            for tile in process_cubemap(
+                    stack, None, build=build,
+                    only_tiles=pyramid_tile_keys(levels[:1]), levels=levels,
+                    encoding=encoding):
+                preview[tile["key"]] = tile
+            on_preview(levels[0], {k: t["data"] for k, t in preview.items()})
+            checkpoint()
+        to_encode = set(keys)
+        writer = TileWriter(client_id, staging, build)
+        linked_count = 0
+        donor = None
+
+        if reuse_tiles:
+            mask_client = client_from_assets_root(assets_root)
+            tile_map = scene_tile_map(
+                layers, assets_root, mask_client, width, levels)
+
+            donor, dirty = plan_tile_reuse(
+                build, rendered_builds(client_id, scene_id, levels, encoding.fingerprint),
+                layers, tile_map)
+
+            if donor is not None:
+                src_root = tile_root_key(client_id, scene_id, donor)
+                src_build = donor
+                reusable = keys - dirty
+            else:
+                fingerprint = _static_fingerprint(
+                    layers, assets_root, scene_id, width, levels, encoding)
+                shared_root, shared_keys = _ensure_shared_static(
+                    render_tiles, client_id, scene_id,
+                    static_tiles(tile_map, levels), fingerprint)
+                src_root = shared_root
+                src_build = SHARED_BUILD
+                reusable = shared_keys & keys
+
+            for key in reusable:
+                try:
+                    writer.put_ref(key, src_root, src_build)
+                except FileNotFoundError:
+                    continue
+                to_encode.discard(key)
+                linked_count += 1
+
+            logging.info(
+                f"♻️ Reuso de tiles: donor={donor}, reaproveitados={linked_count}, "
+                f"a gerar={len(to_encode)}")
+
+        checkpoint()
+
+        # Gera tiles (em memória); os do preview já estão prontos
+        logging.info("🧩 Gerando tiles...")
+        ready = [preview[k] for k in sorted(to_encode & preview.keys())]
+        remaining = to_encode - preview.keys()
+        progress("tile", 0, len(remaining))
+        fresh = []
+        if remaining:
+            fresh = render_tiles(
+                build, remaining,
+                on_tile=lambda done, total: progress("tile", done, total))
+
+        if source is None:
+            del stack
+            logging.info("🧹 Memória liberada.")
+            checkpoint()
+
+        # ======================================================
+        # 📤 PUBLICA TILES
+        # ======================================================
+        # em streaming os tiles chegam aqui assim que saem do encoder
+        written = []
+        tiles_bytes = 0
+        for tile in chain(ready, fresh):
+            tiles_bytes += len(tile["data"])
+            writer.put_bytes(tile["key"], tile["data"])
+            tile["data"] = None
+            written.append(tile)
+            if source is not None and len(written) > len(ready):
+                progress("tile", len(written) - len(ready), len(remaining))
+                checkpoint()
+            progress("publish", len(written), len(to_encode))
+
+        tiles_count = writer.close()
+        logging.info(
+            f"📤 {tiles_count} tiles salvos ({len(written)} gerados, {linked_count} reaproveitados).")
+
+        # ======================================================
+        # 🧾 METADATA
+        # ======================================================
+        meta = {
+            "client": client_id,
+            "scene": scene_id,
+            "build": build,
+            "tileRoot": tile_root,
+            "tiles_count": tiles_count,
+            "tiles_encoded": len(written),
+            "tiles_reused": linked_count,
+            "tiles_bytes": tiles_bytes,
+            "reused_from": donor,
+            "storage": writer.mode,
+            "encoding": encoding.fingerprint,
+            "encoding_preset": encoding.name,
+            "tile_size": tile_size,
+            "face_size": face_size,
+            "levels": levels,
+            "encode_workers": split_faces_cubemap.TILE_ENCODE_WORKERS,
+            "composite_streaming": source is not None,
+            "tile_timings_ms": {t["filename"]: t["encode_ms"] for t in written},
+            "generated_at": int(time.time()),
+            "status": "ready",
+        }
+
+        if tiles_count > 0:
+            put_json(f"{staging}/metadata.json", meta)
+
+            if commit_dir(staging, tile_root):
+                logging.info(f"📝 Build publicada: {tile_root}")
+            else:
+                logging.info(f"↩️ Build já publicada por outro render: {tile_root}")
+
+        elapsed = time.monotonic() - start
+        logging.info(f"✅ Render completo em {elapsed:.2f}s")
+
+        return meta
+
+    finally:
+        discard_dir(staging)
@@ -3,6 +3,7 @@ import json
 import logging
 from pathlib import Path
 from PIL import Image
+from panoconfig360_backend.render.layer_table import compile_layers
 
 logging.basicConfig(level=logging.INFO, format="%(levelname)s: %(message)s")
 
@@ -106,31 +107,26 @@ def decode_index(s: str) -> int:
 # ======================================================
 
 def build_string_from_selection(scene_index: int, layers: list, selection: dict) -> str:
+    table = compile_layers(layers)
     parts = [base36_encode(scene_index, SCENE_CHARS)]
 
     layer_values = [0] * FIXED_LAYERS
 
-    for layer in layers:
-        build_order = layer.get("build_order", 0)
-
+    for layer_id, build_order in table.build_order.items():
         if build_order < 0 or build_order >= FIXED_LAYERS:
             continue
 
-        layer_id = layer["id"]
         selected_id = selection.get(layer_id)
 
         if not selected_id:
             continue
 
-        item = next(
-            (it for it in layer.get("items", []) if it["id"] == selected_id),
-            None
-        )
+        item = table.item(layer_id, selected_id)
 
         if not item:
             continue
 
-        layer_values[build_order] = item.get("index", 0)
+        layer_values[build_order] = item[0]
 
     for v in layer_values:
         parts.append(base36_encode(v, LAYER_CHARS))
@@ -147,10 +143,12 @@ def stack_layers_image_only(
     layers: list,
     selection: dict,
     assets_root: Path,
+    build: str | None = None,
 ) -> Image.Image:
     """
     Empilha base + overlays.
     Retorna APENAS a imagem PIL.
+    `build` é aceito só por compatibilidade com o stack com masks.
     """
     base_image_name = f"base_{scene_id}.jpg"
     base_path = assets_root / base_image_name
@@ -163,22 +161,20 @@ def stack_layers_image_only(
     # Abre e mantém referência fora do with
     base = Image.open(base_path).convert("RGBA")
 
-    for layer in sorted(layers, key=lambda x: x.get("build_order", 0)):
+    table = compile_layers(layers)
+    for layer in table.ordered:
         layer_id = layer["id"]
         item_id = selection.get(layer_id)
 
         if not item_id:
             continue
 
-        item = next(
-            (it for it in layer.get("items", []) if it["id"] == item_id),
-            None
-        )
+        item = table.item(layer_id, item_id)
 
         if not item:
             continue
 
-        if item.get("file") is None:
+        if item[1] is None:
             continue
 
         file_name = f"{layer_id}_{item_id}.png"
@@ -4,6 +4,18 @@ import logging
 from pathlib import Path
 from PIL import Image
 import numpy as np
+from panoconfig360_backend.render.mask_index import MaskIndex
+from panoconfig360_backend.render.prefix_cache import prefix_cache
+from panoconfig360_backend.render.layer_contrib import contribution_cache, fuse_contributions
+from panoconfig360_backend.render.layer_table import compile_layers
+from panoconfig360_backend.render.split_faces_cubemap import face_view, materialize
+from panoconfig360_backend.render.asset_cache import (
+    load_rgb,
+    load_mask,
+    load_mask_index,
+    client_from_assets_root,
+)
+from panoconfig360_backend.render.asset_pack import asset_packs
 
 logging.basicConfig(level=logging.INFO, format="%(levelname)s: %(message)s")
 
@@ -107,30 +119,24 @@ def decode_index(s: str) -> int:
 # ======================================================
 
 def build_string_from_selection(layers: list, selection: dict) -> str:
+    table = compile_layers(layers)
     config = [encode_index(0)] * FIXED_LAYERS
 
-    for layer in layers:
-        build_order = layer.get("build_order", 0)
-
+    for layer_id, build_order in table.build_order.items():
         if build_order < 0 or build_order >= FIXED_LAYERS:
             continue
 
-        layer_id = layer["id"]
         selected_id = selection.get(layer_id)
 
         if not selected_id:
             continue
 
-        item = next(
-            (it for it in layer.get("items", []) if it["id"] == selected_id),
-            None
-        )
+        item = table.item(layer_id, selected_id)
 
         if not item:
             continue
 
-        index = item.get("index", 0)
-        config[build_order] = encode_index(index)
+        config[build_order] = encode_index(item[0])
 
     return "".join(config)
 
@@ -139,12 +145,13 @@ def build_string_from_selection(layers: list, selection: dict) -> str:
 # 🧠 UTIL DE COMPOSITE COM MASK
 # ======================================================
 
-def _load_rgb_np(path: Path):
-    return np.asarray(Image.open(path).convert("RGB"), dtype=np.float32) / 255.0
+def _load_rgb_np(path: Path, client_id: str | None = None):
+    # decodificação vem do cache de assets; só a conversão para float é por render
+    return load_rgb(path, client_id).astype(np.float32) / 255.0
 
 
-def _load_mask_np(path: Path):
-    m = np.asarray(Image.open(path).convert("L"), dtype=np.float32) / 255.0
+def _load_mask_np(path: Path, client_id: str | None = None):
+    m = load_mask(path, client_id).astype(np.float32) / 255.0
     return m[..., None]
 
 
@@ -153,68 +160,455 @@ def _composite_np(base, material, mask):
 
 
 # ======================================================
-# 🧩 NOVO STACK COM MASKS (SUBSTITUI PNG OVERLAY)
+# ⚙️ ENGINE UINT8 (PONTO FIXO, IN-PLACE)
 # ======================================================
+# "float32": caminho original, frame inteiro em float32.
+# "uint8": lerp inteiro in-place num único buffer uint8 de saída,
+#          processado em blocos de linhas com acumuladores uint16.
+# "sparse": mesmo lerp uint8, mas só nos pixels cobertos pela mask
+#           (índice de cobertura pré-computado e cacheado por mask).
+# "fused":  contribuição pré-multiplicada de cada (layer, item) cacheada
+#           em forma esparsa; layers que não se sobrepõem são aplicadas
+#           numa única passada (ver layer_contrib). Bit a bit igual a
+#           uint8/sparse.
+COMPOSITE_ENGINES = ("float32", "uint8", "sparse", "fused")
+COMPOSITE_ENGINE = os.environ.get("PANOCONFIG_COMPOSITE_ENGINE", "fused")
+BLEND_BLOCK_ROWS = 64
+
+
+def _blend_u8_inplace(out: np.ndarray, material: np.ndarray, mask: np.ndarray, block_rows: int = BLEND_BLOCK_ROWS):
+    """
+    out = round((out * (255 - m) + material * m) / 255), escrito em `out`.
+    Temporários limitados a `block_rows` linhas.
+    """
+    height, width = mask.shape
+    rows = min(block_rows, height)
 
-def stack_layers_image_only(
-    scene_id: str,
-    layers: list,
-    selection: dict,
-    assets_root: Path,
-) -> Image.Image:
+    acc = np.empty((rows, width, 3), dtype=np.uint16)
+    tmp = np.empty((rows, width, 3), dtype=np.uint16)
+    inv = np.empty((rows, width), dtype=np.uint8)
+
+    for y0 in range(0, height, rows):
+        y1 = min(y0 + rows, height)
+        n = y1 - y0
+        a, t, i = acc[:n], tmp[:n], inv[:n]
+        m = mask[y0:y1]
+        o = out[y0:y1]
+
+        np.subtract(255, m, out=i)
+        np.multiply(o, i[..., None], out=a, dtype=np.uint16)
+        np.multiply(material[y0:y1], m[..., None], out=t, dtype=np.uint16)
+        a += t
+
+        # divisão exata por 255 com arredondamento: (x + 128 + ((x + 128) >> 8)) >> 8
+        a += 128
+        np.right_shift(a, 8, out=t)
+        a += t
+        a >>= 8
+
+        np.copyto(o, a, casting="unsafe")
+
+
+def _blend_u8_sparse_inplace(out: np.ndarray, material: np.ndarray, index: MaskIndex):
     """
-    Novo stack:
-    base + material full-frame * mask P&B por layer.
-    Mantém assinatura e retorno do método antigo.
+    Aplica a layer só onde a mask cobre: spans opacos viram cópia direta
+    do material, spans parciais recebem o mesmo lerp de `_blend_u8_inplace`.
     """
+    if index.is_empty:
+        return
 
-    base_image_name = f"base_{scene_id}.png"
-    base_path = assets_root / base_image_name
+    out_flat = out.reshape(-1, 3)
+    material_flat = material.reshape(-1, 3)
 
-    if not base_path.exists():
-        raise FileNotFoundError(f"Imagem base não encontrada: {base_path}")
+    if index.opaque_idx.size:
+        out_flat[index.opaque_idx] = material_flat[index.opaque_idx]
 
-    # base em NumPy float
-    result = _load_rgb_np(base_path)
+    if index.partial_idx.size:
+        idx = index.partial_idx
+        m = index.partial_alpha[:, None].astype(np.uint16)
+
+        a = out_flat[idx].astype(np.uint16)
+        a *= 255 - m
+        a += material_flat[idx] * m
+        a += 128
+        a += a >> 8
+        a >>= 8
+
+        out_flat[idx] = a
+
+
+# ======================================================
+# 🧩 NOVO STACK COM MASKS (SUBSTITUI PNG OVERLAY)
+# ======================================================
 
+def _resolve_layer_assets(layers: list, selection: dict, assets_root: Path):
+    """
+    Retorna [(layer_id, build_order, material_path, mask_path)] na ordem de build_order
+    e a lista de assets ausentes.
+    """
+    table = compile_layers(layers)
+    steps = []
     missing_assets = []
 
-    for layer in sorted(layers, key=lambda x: x.get("build_order", 0)):
+    for layer in table.ordered:
         layer_id = layer["id"]
         item_id = selection.get(layer_id)
 
         if not item_id:
             continue
 
-        item = next(
-            (it for it in layer.get("items", []) if it["id"] == item_id),
-            None
-        )
+        item = table.item(layer_id, item_id)
 
         if not item:
             continue
 
-        material_file = item.get("file")
-        mask_file = layer.get("mask")
+        material_file = item[1]
+        mask_file = table.masks[layer_id]
 
         if not material_file or not mask_file:
             continue
 
-        material_path = assets_root / "materials" / material_file
-        mask_path = assets_root / "masks" / mask_file
+        material_path = table.material_path(layer_id, item_id, assets_root)
+        mask_path = table.mask_path(layer_id, assets_root)
 
         if not material_path.exists() or not mask_path.exists():
             missing_assets.append((layer_id, material_file, mask_file))
             continue
 
-        material = _load_rgb_np(material_path)
-        mask = _load_mask_np(mask_path)
+        steps.append((layer_id, layer.get("build_order", 0),
+                      material_path, mask_path))
+
+    return steps, missing_assets
+
+
+def _stack_float32(base_path: Path, steps: list, client_id: str | None) -> np.ndarray:
+    # base em NumPy float
+    result = _load_rgb_np(base_path, client_id)
+
+    for _, _, material_path, mask_path in steps:
+        material = _load_rgb_np(material_path, client_id)
+        mask = _load_mask_np(mask_path, client_id)
 
         result = _composite_np(result, material, mask)
 
+    return (result * 255).astype("uint8")
+
+
+def _apply_uint8(result: np.ndarray, step: tuple, client_id: str | None):
+    _, _, material_path, mask_path = step
+    material = load_rgb(material_path, client_id)
+    mask = load_mask(mask_path, client_id)
+
+    _blend_u8_inplace(result, material, mask)
+
+
+def _apply_sparse(result: np.ndarray, step: tuple, client_id: str | None):
+    _, _, material_path, mask_path = step
+    index = load_mask_index(mask_path, client_id)
+    if index.is_empty:
+        return
+
+    if index.shape != result.shape[:2]:
+        raise ValueError(f"Mask com dimensões inválidas: {mask_path}")
+
+    material = load_rgb(material_path, client_id)
+    _blend_u8_sparse_inplace(result, material, index)
+
+
+LAYER_APPLIERS = {
+    "uint8": _apply_uint8,
+    "sparse": _apply_sparse,
+}
+
+
+def _prefix_keys(client_id: str | None, scene_id: str, build: str | None,
+                 layers: list, base_path: Path, steps: list) -> list | None:
+    """
+    Chave do composite após cada step: prefixo da build até o slot da layer
+    + fingerprint (mtime) dos assets já aplicados.
+    Só é seguro quando cada layer ocupa um slot próprio da build string.
+    """
+    if not build:
+        return None
+
+    orders = [layer.get("build_order", 0) for layer in layers]
+    if len(set(orders)) != len(orders):
+        return None
+    if any(o < 0 or o >= FIXED_LAYERS for o in orders):
+        return None
+
+    fingerprint = [(str(base_path), base_path.stat().st_mtime_ns)]
+    keys = []
+
+    for _, build_order, material_path, mask_path in steps:
+        fingerprint.append((
+            str(material_path), material_path.stat().st_mtime_ns,
+            str(mask_path), mask_path.stat().st_mtime_ns,
+        ))
+        prefix = build[:SCENE_CHARS + LAYER_CHARS * (build_order + 1)]
+        keys.append((client_id, scene_id, prefix, hash(tuple(fingerprint))))
+
+    return keys
+
+
+def _stack_fixed_point(engine: str, base_path: Path, steps: list,
+                       client_id: str | None, prefix_keys: list | None) -> np.ndarray:
+    apply_layer = LAYER_APPLIERS[engine]
+
+    depth, result = 0, None
+    if prefix_keys:
+        depth, result = prefix_cache.longest_prefix(prefix_keys)
+        if depth:
+            logging.info(
+                f"♻️ Prefixo em cache: {depth}/{len(steps)} layers reaproveitadas")
+
+    if result is None:
+        # único buffer de saída; base do cache é somente leitura
+        result = np.array(load_rgb(base_path, client_id), dtype=np.uint8)
+
+    for i in range(depth, len(steps)):
+        apply_layer(result, steps[i], client_id)
+
+        if prefix_keys:
+            prefix_cache.put(prefix_keys[i], result)
+
+    if prefix_keys:
+        prefix_cache.record_applied(len(steps) - depth)
+
+    return result
+
+
+# ======================================================
+# ➕ ENGINE FUSED (CONTRIBUIÇÕES PRÉ-MULTIPLICADAS)
+# ======================================================
+
+def _fused_runs(steps: list, client_id: str | None) -> list:
+    """
+    Divide os steps (em build_order) em sequências sem sobreposição de
+    mask: dentro de uma sequência a ordem não importa e tudo vai numa
+    passada; uma layer que cobre pixels de outra da sequência abre a
+    próxima, e as sequências são aplicadas em ordem.
+    """
+    def load_index(path):
+        return load_mask_index(path, client_id)
+
+    runs = []
+    for step in steps:
+        mask_path = step[3]
+        if runs and not any(
+                contribution_cache.overlap(mask_path, other[3], load_index)
+                for other in runs[-1]):
+            runs[-1].append(step)
+        else:
+            runs.append([step])
+    return runs
+
+
+def _stack_fused(base_path: Path, steps: list, client_id: str | None) -> np.ndarray:
+    def load_material(path):
+        return load_rgb(path, client_id)
+
+    def load_index(path):
+        index = load_mask_index(path, client_id)
+        if index.shape != result.shape[:2]:
+            raise ValueError(f"Mask com dimensões inválidas: {path}")
+        return index
+
+    result = np.array(load_rgb(base_path, client_id), dtype=np.uint8)
+
+    runs = _fused_runs(steps, client_id)
+    for run in runs:
+        fuse_contributions(result, [
+            contribution_cache.get(material_path, mask_path, load_material, load_index)
+            for _, _, material_path, mask_path in run
+        ])
+
+    if len(runs) > 1:
+        logging.info(
+            f"🔀 Masks sobrepostas: {len(steps)} layers em {len(runs)} passadas")
+    contribution_cache.record_runs(runs)
+    return result
+
+
+def stack_layers_array(
+    scene_id: str,
+    layers: list,
+    selection: dict,
+    assets_root: Path,
+    engine: str | None = None,
+    build: str | None = None,
+) -> np.ndarray:
+    """
+    Mesmo stack de `stack_layers_image_only`, devolvendo o array uint8 (H, W, 3).
+    Com `build`, engines uint8/sparse retomam do prefixo de layers em cache
+    (a fused compõe a build inteira numa passada e não usa prefixos).
+    """
+    engine = engine or COMPOSITE_ENGINE
+    if engine not in COMPOSITE_ENGINES:
+        raise ValueError(f"Engine de composite inválida: {engine}")
+
+    base_image_name = f"base_{scene_id}.png"
+    base_path = assets_root / base_image_name
+
+    if not base_path.exists():
+        raise FileNotFoundError(f"Imagem base não encontrada: {base_path}")
+
+    client_id = client_from_assets_root(assets_root)
+
+    steps, missing_assets = _resolve_layer_assets(
+        layers, selection, assets_root)
+
+    if engine == "float32":
+        result = _stack_float32(base_path, steps, client_id)
+    elif engine == "fused":
+        result = _stack_fused(base_path, steps, client_id)
+    else:
+        prefix_keys = _prefix_keys(
+            client_id, scene_id, build, layers, base_path, steps)
+        result = _stack_fixed_point(
+            engine, base_path, steps, client_id, prefix_keys)
+
     if missing_assets:
         logging.warning(f"⚠️ Assets ausentes (ignorados): {missing_assets}")
 
-    logging.info("✅ Stack com masks gerado")
+    logging.info(f"✅ Stack com masks gerado (engine={engine})")
+
+    return result
+
+
+# ======================================================
+# 🌊 COMPOSITE SOB DEMANDA (STREAMING POR TILE)
+# ======================================================
+
+class CompositeSource:
+    """
+    Composite de uma build sem o frame inteiro: `region` compõe só um
+    quadrado de uma face, direto das views (espelho/rotação do tiler, ver
+    `face_view`) da base e de cada material/mask. Nenhum buffer do
+    tamanho do frame é alocado por render; os assets vêm do cache e só a
+    região pedida de cada um é lida. Bit a bit igual ao stack completo
+    na mesma engine (uint8 e sparse fazem o mesmo lerp).
+    O teto do streaming (STREAM_MAX_BYTES) só limita a memória do render
+    inteiro com o pack da cena compilado (`packed`, ver asset_pack): os
+    assets são memmaps e só as páginas das regiões lidas ficam
+    residentes. Sem pack, base, materiais e masks ficam decodificados
+    inteiros (asset cache ou shared memory) enquanto a fonte existir, e o
+    teto vale só para a memória de trabalho.
+    """
+
+    def __init__(self, scene_id: str, layers: list, selection: dict,
+                 assets_root: Path, engine: str | None = None):
+        engine = engine or COMPOSITE_ENGINE
+        if engine not in COMPOSITE_ENGINES:
+            raise ValueError(f"Engine de composite inválida: {engine}")
+
+        base_path = assets_root / f"base_{scene_id}.png"
+        if not base_path.exists():
+            raise FileNotFoundError(f"Imagem base não encontrada: {base_path}")
+
+        client_id = client_from_assets_root(assets_root)
+        steps, missing_assets = _resolve_layer_assets(
+            layers, selection, assets_root)
+
+        self.engine = engine
+        self.base = load_rgb(base_path, client_id)
+        self.packed = asset_packs.covers(base_path, "rgb")
+        self.layers = []
+        for _, _, material_path, mask_path in steps:
+            self.packed = (self.packed and asset_packs.covers(material_path, "rgb")
+                           and asset_packs.covers(mask_path, "mask"))
+            material = load_rgb(material_path, client_id)
+            mask = load_mask(mask_path, client_id)
+            if material.shape != self.base.shape or mask.shape != self.base.shape[:2]:
+                raise ValueError(f"Asset com dimensões inválidas: {material_path} / {mask_path}")
+            self.layers.append((material, mask))
+
+        if missing_assets:
+            logging.warning(f"⚠️ Assets ausentes (ignorados): {missing_assets}")
+
+        self.face_size = self.base.shape[0]
+        self.width = self.base.shape[1]
+
+    def region_bytes(self, size: int) -> int:
+        """
+        Memória de trabalho de um `region(size)`: saída e temporários.
+        """
+        pixels = size * size * 3
+        if self.engine == "float32":
+            # resultado, material e lerp em float32, mais a mask
+            return pixels * 4 * 3 + size * size * 4 + pixels
+        rows = min(BLEND_BLOCK_ROWS, size)
+        return pixels + rows * size * (3 * 2 * 2 + 1)
+
+    def region(self, face_index: int, top: int, left: int, size: int) -> np.ndarray:
+        """
+        Quadrado (size, size, 3) uint8 da face `face_index` (ordem de
+        STRIP_FACES), a partir de (top, left) nas coordenadas da face.
+        """
+        def crop(arr):
+            return face_view(arr, face_index)[top:top + size, left:left + size]
+
+        if self.engine == "float32":
+            result = crop(self.base).astype(np.float32) / 255.0
+            for material, mask in self.layers:
+                m = crop(mask)
+                if not m.any():
+                    continue
+                result = _composite_np(
+                    result,
+                    crop(material).astype(np.float32) / 255.0,
+                    (m.astype(np.float32) / 255.0)[..., None])
+            return (result * 255).astype("uint8")
+
+        out = materialize(crop(self.base))
+        for material, mask in self.layers:
+            m = crop(mask)
+            # fora da mask o lerp devolve o próprio pixel: nada a fazer
+            if not m.any():
+                continue
+            _blend_u8_inplace(out, crop(material), m)
+        return out
+
+
+def composite_face_size(scene_id: str, assets_root: Path) -> int:
+    """
+    Lado da face do composite, só pelo cabeçalho da base (sem decodificar).
+    """
+    base_path = assets_root / f"base_{scene_id}.png"
+    if not base_path.exists():
+        raise FileNotFoundError(f"Imagem base não encontrada: {base_path}")
+    with Image.open(base_path) as img:
+        return img.size[1]
+
+
+def open_composite(
+    scene_id: str,
+    layers: list,
+    selection: dict,
+    assets_root: Path,
+    build: str | None = None,
+) -> CompositeSource:
+    """
+    Mesma assinatura de `stack_layers_array`, devolvendo o composite
+    sob demanda (ver `stream_cubemap`). `build` é aceito só por
+    compatibilidade: o streaming não usa o cache de prefixos (que guarda
+    frames inteiros).
+    """
+    return CompositeSource(scene_id, layers, selection, assets_root)
+
 
-    return Image.fromarray((result * 255).astype("uint8"))
+def stack_layers_image_only(
+    scene_id: str,
+    layers: list,
+    selection: dict,
+    assets_root: Path,
+    build: str | None = None,
+) -> Image.Image:
+    """
+    Novo stack:
+    base + material full-frame * mask P&B por layer.
+    Mantém assinatura e retorno do método antigo.
+    """
+    result = stack_layers_array(
+        scene_id, layers, selection, assets_root, build=build)
+    return Image.fromarray(result)
@@ -0,0 +1,217 @@
+import os
+import threading
+from collections import OrderedDict
+from pathlib import Path
+import numpy as np
+from panoconfig360_backend.render.mask_index import MaskIndex
+
+# ======================================================
+# 🔧 CONFIGURAÇÃO
+# ======================================================
+MB = 1024 * 1024
+
+# teto total: na engine "process" cada worker tem o seu cache, com
+# CONTRIB_CACHE_MAX_BYTES / PANOCONFIG_RENDER_PROCESSES (ver render_pool)
+CONTRIB_CACHE_MAX_BYTES = int(
+    os.environ.get("PANOCONFIG_CONTRIB_CACHE_MB", "512")) * MB
+
+# pares de masks com a sobreposição memorizada (LRU, ~200 bytes por par)
+CONTRIB_OVERLAP_MAX_PAIRS = int(
+    os.environ.get("PANOCONFIG_CONTRIB_OVERLAP_PAIRS", "65536"))
+
+
+# ======================================================
+# ➕ CONTRIBUIÇÃO PRÉ-MULTIPLICADA DE UM ITEM
+# ======================================================
+
+class LayerContribution:
+    """
+    O que um item (material) soma ao frame sob a mask da sua layer, só
+    nos pixels cobertos:
+    - opaque_idx / opaque_rgb: alpha 255, o pixel vira o material
+    - partial_idx / partial_premul: material * alpha (uint16)
+    - partial_inv: 255 - alpha, o fator que sobra da base
+    Num pixel coberto por uma única layer,
+    out = round((base * inv + premul) / 255), exatamente o lerp uint8.
+    """
+
+    def __init__(self, material: np.ndarray, index: MaskIndex):
+        if material.shape[:2] != index.shape:
+            raise ValueError("Material e mask com dimensões diferentes")
+
+        material_flat = material.reshape(-1, 3)
+        self.opaque_idx = index.opaque_idx
+        self.opaque_rgb = material_flat[index.opaque_idx]
+        self.partial_idx = index.partial_idx
+        self.partial_premul = np.multiply(
+            material_flat[index.partial_idx], index.partial_alpha[:, None], dtype=np.uint16)
+        self.partial_inv = 255 - index.partial_alpha
+
+        for arr in (self.opaque_rgb, self.partial_premul, self.partial_inv):
+            arr.setflags(write=False)
+
+    @property
+    def nbytes(self) -> int:
+        # índices são do MaskIndex (já contados no asset cache)
+        return int(self.opaque_rgb.nbytes + self.partial_premul.nbytes
+                   + self.partial_inv.nbytes)
+
+
+def fuse_contributions(out: np.ndarray, contributions: list):
+    """
+    Aplica em `out`, numa única passada, contribuições cujas masks não se
+    sobrepõem: out = base * (1 - ΣM) + Σ(material_i * M_i), com o mesmo
+    arredondamento do lerp sequencial (cada pixel tem no máximo uma layer).
+    """
+    contributions = [c for c in contributions
+                     if c.opaque_idx.size or c.partial_idx.size]
+    if not contributions:
+        return
+
+    def joined(name):
+        parts = [getattr(c, name) for c in contributions]
+        return parts[0] if len(parts) == 1 else np.concatenate(parts)
+
+    out_flat = out.reshape(-1, 3)
+
+    opaque_idx = joined("opaque_idx")
+    if opaque_idx.size:
+        out_flat[opaque_idx] = joined("opaque_rgb")
+
+    idx = joined("partial_idx")
+    if idx.size:
+        a = out_flat[idx].astype(np.uint16)
+        a *= joined("partial_inv")[:, None]
+        a += joined("partial_premul")
+        a += 128
+        a += a >> 8
+        a >>= 8
+        out_flat[idx] = a
+
+
+def masks_overlap(a: MaskIndex, b: MaskIndex) -> bool:
+    """
+    Se existe algum pixel com alpha > 0 nas duas masks.
+    """
+    if a.is_empty or b.is_empty:
+        return False
+
+    ay0, ay1, ax0, ax1 = a.bbox
+    by0, by1, bx0, bx1 = b.bbox
+    if ay1 <= by0 or by1 <= ay0 or ax1 <= bx0 or bx1 <= ax0:
+        return False
+
+    covered_a = np.concatenate([a.opaque_idx, a.partial_idx])
+    covered_b = np.concatenate([b.opaque_idx, b.partial_idx])
+    return np.intersect1d(covered_a, covered_b, assume_unique=True).size > 0
+
+
+# ======================================================
+# 🗃️ CACHE DE CONTRIBUIÇÕES E SOBREPOSIÇÕES
+# ======================================================
+
+class ContributionCache:
+    """
+    LRU limitado por bytes das contribuições por (material, mask),
+    montadas no primeiro render que usa o item. A chave inclui o mtime
+    dos dois assets: uma troca de PNG gera uma entrada nova e a antiga
+    sai pelo LRU. Guarda também, por par de masks, se elas se sobrepõem
+    (outro LRU, de até `max_overlap_pairs` pares).
+    """
+
+    def __init__(self, max_bytes: int, max_overlap_pairs: int = CONTRIB_OVERLAP_MAX_PAIRS):
+        self.max_bytes = max_bytes
+        self.max_overlap_pairs = max_overlap_pairs
+        self._entries = OrderedDict()
+        self._overlaps = OrderedDict()
+        self._total_bytes = 0
+        self._lock = threading.Lock()
+        self._counters = {
+            "hits": 0,
+            "misses": 0,
+            "evictions": 0,
+            "fused_passes": 0,
+            "fused_layers": 0,
+            "ordered_fallbacks": 0,
+        }
+
+    def configure(self, max_bytes: int):
+        with self._lock:
+            self.max_bytes = max_bytes
+            self._evict_locked()
+
+    def get(self, material_path: Path, mask_path: Path, load_material, load_index) -> LayerContribution:
+        key = (str(material_path), Path(material_path).stat().st_mtime_ns,
+               str(mask_path), Path(mask_path).stat().st_mtime_ns)
+
+        with self._lock:
+            contribution = self._entries.get(key)
+            if contribution is not None:
+                self._entries.move_to_end(key)
+                self._counters["hits"] += 1
+                return contribution
+            self._counters["misses"] += 1
+
+        # monta fora do lock (gather do material inteiro)
+        contribution = LayerContribution(load_material(material_path), load_index(mask_path))
+
+        with self._lock:
+            if contribution.nbytes <= self.max_bytes and key not in self._entries:
+                self._entries[key] = contribution
+                self._total_bytes += contribution.nbytes
+                self._evict_locked()
+        return contribution
+
+    def overlap(self, mask_a: Path, mask_b: Path, load_index) -> bool:
+        key = tuple(sorted((
+            (str(mask_a), Path(mask_a).stat().st_mtime_ns),
+            (str(mask_b), Path(mask_b).stat().st_mtime_ns),
+        )))
+
+        with self._lock:
+            cached = self._overlaps.get(key)
+            if cached is not None:
+                self._overlaps.move_to_end(key)
+                return cached
+
+        result = masks_overlap(load_index(mask_a), load_index(mask_b))
+        with self._lock:
+            self._overlaps[key] = result
+            while len(self._overlaps) > self.max_overlap_pairs:
+                self._overlaps.popitem(last=False)
+        return result
+
+    def record_runs(self, runs: list):
+        """
+        Uma build composta em `runs` passadas (len(runs) > 1 quando houve
+        sobreposição e as layers voltaram a ser aplicadas em ordem).
+        """
+        with self._lock:
+            self._counters["fused_passes"] += len(runs)
+            self._counters["fused_layers"] += sum(len(run) for run in runs)
+            self._counters["ordered_fallbacks"] += int(len(runs) > 1)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._overlaps.clear()
+            self._total_bytes = 0
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                **self._counters,
+                "entries": len(self._entries),
+                "overlap_pairs": len(self._overlaps),
+                "bytes": self._total_bytes,
+                "max_bytes": self.max_bytes,
+            }
+
+    def _evict_locked(self):
+        while self._total_bytes > self.max_bytes and self._entries:
+            _, contribution = self._entries.popitem(last=False)
+            self._total_bytes -= contribution.nbytes
+            self._counters["evictions"] += 1
+
+
+contribution_cache = ContributionCache(CONTRIB_CACHE_MAX_BYTES)
@@ -0,0 +1,77 @@
+from pathlib import Path
+
+
+# ======================================================
+# 📇 LAYERS COM LOOKUP PRÉ-COMPUTADO
+# ======================================================
+
+class CompiledLayers(list):
+    """
+    A lista de layers da cena (igual à do cfg, pode ser usada no lugar
+    dela) com as tabelas de lookup montadas uma vez:
+
+    - `ordered`: layers por build_order
+    - `items`: layer_id → item_id → (index, file)
+    - `build_order` / `masks`: layer_id → build_order / arquivo da mask
+
+    Com `assets_root`, também os caminhos resolvidos dos assets
+    (`material_paths`: layer_id → item_id → Path; `mask_paths`).
+    Sobrevive ao pickle (vai junto para os workers de render).
+    """
+
+    def __init__(self, layers: list, assets_root: Path | None = None):
+        super().__init__(layers)
+        self.ordered = sorted(self, key=lambda l: l.get("build_order", 0))
+        self.build_order = {l["id"]: l.get("build_order", 0) for l in self}
+        self.masks = {l["id"]: l.get("mask") for l in self}
+
+        self.items = {}
+        for layer in self:
+            table = self.items.setdefault(layer["id"], {})
+            for item in layer.get("items", []):
+                # primeiro item com o id vence (mesma regra do scan linear)
+                table.setdefault(item["id"], (item.get("index", 0), item.get("file")))
+
+        self.assets_root = Path(assets_root) if assets_root is not None else None
+        self.material_paths = {}
+        self.mask_paths = {}
+        if self.assets_root is not None:
+            for layer_id, table in self.items.items():
+                self.material_paths[layer_id] = {
+                    item_id: self.assets_root / "materials" / file
+                    for item_id, (_, file) in table.items() if file
+                }
+                if self.masks[layer_id]:
+                    self.mask_paths[layer_id] = self.assets_root / "masks" / self.masks[layer_id]
+
+    def item(self, layer_id: str, item_id: str) -> tuple | None:
+        """
+        (index, file) do item, ou None se a layer/item não existe.
+        """
+        return self.items.get(layer_id, {}).get(item_id)
+
+    def material_path(self, layer_id: str, item_id: str, assets_root: Path) -> Path | None:
+        entry = self.item(layer_id, item_id)
+        if entry is None or not entry[1]:
+            return None
+        if self.assets_root == assets_root:
+            return self.material_paths[layer_id][item_id]
+        return assets_root / "materials" / entry[1]
+
+    def mask_path(self, layer_id: str, assets_root: Path) -> Path | None:
+        mask = self.masks.get(layer_id)
+        if not mask:
+            return None
+        if self.assets_root == assets_root:
+            return self.mask_paths[layer_id]
+        return assets_root / "masks" / mask
+
+
+def compile_layers(layers: list) -> CompiledLayers:
+    """
+    `layers` já compiladas passam direto; uma lista crua do cfg é
+    compilada na hora (custo de um scan, como antes).
+    """
+    if isinstance(layers, CompiledLayers):
+        return layers
+    return CompiledLayers(layers)
@@ -0,0 +1,121 @@
+import numpy as np
+
+
+# ======================================================
+# 🗺️ ÍNDICE DE COBERTURA DE MASK
+# ======================================================
+
+def _row_spans(flags: np.ndarray, y_offset: int, x_offset: int) -> np.ndarray:
+    """
+    Converte uma matriz booleana em spans (row, x0, x1) por linha, x1 exclusivo.
+    """
+    rows = flags.shape[0]
+    padded = np.zeros((rows, flags.shape[1] + 2), dtype=np.int8)
+    padded[:, 1:-1] = flags
+    edges = np.diff(padded, axis=1)
+
+    start_y, start_x = np.nonzero(edges == 1)
+    _, end_x = np.nonzero(edges == -1)
+
+    spans = np.empty((start_y.size, 3), dtype=np.int32)
+    spans[:, 0] = start_y + y_offset
+    spans[:, 1] = start_x + x_offset
+    spans[:, 2] = end_x + x_offset
+    return spans
+
+
+def _spans_to_flat(spans: np.ndarray, width: int) -> np.ndarray:
+    if spans.size == 0:
+        return np.empty(0, dtype=np.int32)
+
+    lengths = spans[:, 2] - spans[:, 1]
+    starts = spans[:, 0].astype(np.int64) * width + spans[:, 1]
+    offsets = np.repeat(starts - np.cumsum(lengths) + lengths, lengths)
+    return (offsets + np.arange(lengths.sum())).astype(np.int32)
+
+
+class MaskIndex:
+    """
+    Índice pré-computado de uma mask (H, W) uint8:
+    - bbox: (y0, y1, x0, x1) apertado da área com alpha > 0, ou None
+    - opaque_spans / partial_spans: spans (row, x0, x1) com alpha 255 / parcial
+    - opaque_idx / partial_idx: índices planos derivados dos spans
+    - partial_alpha: alpha de cada pixel parcial
+    Fora dos spans a mask é totalmente transparente.
+    """
+
+    def __init__(self, mask: np.ndarray):
+        if mask.ndim != 2 or mask.dtype != np.uint8:
+            raise ValueError("Mask deve ser um array (H, W) uint8")
+
+        self.shape = mask.shape
+        height, width = mask.shape
+
+        rows = np.flatnonzero(mask.any(axis=1))
+        if rows.size == 0:
+            self.bbox = None
+            self.opaque_spans = np.empty((0, 3), dtype=np.int32)
+            self.partial_spans = np.empty((0, 3), dtype=np.int32)
+        else:
+            cols = np.flatnonzero(mask.any(axis=0))
+            y0, y1 = int(rows[0]), int(rows[-1]) + 1
+            x0, x1 = int(cols[0]), int(cols[-1]) + 1
+            self.bbox = (y0, y1, x0, x1)
+
+            crop = mask[y0:y1, x0:x1]
+            self.opaque_spans = _row_spans(crop == 255, y0, x0)
+            self.partial_spans = _row_spans((crop > 0) & (crop < 255), y0, x0)
+
+        self.opaque_idx = _spans_to_flat(self.opaque_spans, width)
+        self.partial_idx = _spans_to_flat(self.partial_spans, width)
+        self.partial_alpha = mask.reshape(-1)[self.partial_idx]
+
+        for arr in (self.opaque_spans, self.partial_spans, self.opaque_idx,
+                    self.partial_idx, self.partial_alpha):
+            arr.setflags(write=False)
+
+    PARTS = ("opaque_spans", "partial_spans", "opaque_idx",
+             "partial_idx", "partial_alpha")
+
+    def to_parts(self) -> tuple[dict, dict]:
+        """
+        (arrays, atributos) para reconstruir o índice em outro processo
+        (ex.: a partir de shared memory) sem recalcular.
+        """
+        arrays = {name: getattr(self, name) for name in self.PARTS}
+        return arrays, {"shape": list(self.shape), "bbox": self.bbox and list(self.bbox)}
+
+    @classmethod
+    def from_parts(cls, arrays: dict, attrs: dict) -> "MaskIndex":
+        index = cls.__new__(cls)
+        index.shape = tuple(attrs["shape"])
+        index.bbox = tuple(attrs["bbox"]) if attrs["bbox"] else None
+        for name in cls.PARTS:
+            arr = arrays[name]
+            arr.setflags(write=False)
+            setattr(index, name, arr)
+        return index
+
+    @property
+    def is_empty(self) -> bool:
+        return self.bbox is None
+
+    @property
+    def covered_pixels(self) -> int:
+        return int(self.opaque_idx.size + self.partial_idx.size)
+
+    @property
+    def coverage(self) -> float:
+        return self.covered_pixels / float(self.shape[0] * self.shape[1])
+
+    @property
+    def nbytes(self) -> int:
+        return int(
+            self.opaque_spans.nbytes + self.partial_spans.nbytes
+            + self.opaque_idx.nbytes + self.partial_idx.nbytes
+            + self.partial_alpha.nbytes
+        )
+
+
+def build_mask_index(mask: np.ndarray) -> MaskIndex:
+    return MaskIndex(mask)
@@ -0,0 +1,112 @@
+import os
+import threading
+from collections import OrderedDict
+import numpy as np
+
+# ======================================================
+# 🔧 CONFIGURAÇÃO
+# ======================================================
+MB = 1024 * 1024
+
+PREFIX_CACHE_MAX_BYTES = int(
+    os.environ.get("PANOCONFIG_PREFIX_CACHE_MB", "256")) * MB
+
+
+# ======================================================
+# 🧱 CACHE DE COMPOSITES INTERMEDIÁRIOS (PREFIXO DA BUILD)
+# ======================================================
+
+class PrefixCompositeCache:
+    """
+    LRU limitado por bytes de composites uint8 intermediários.
+    Chave: (client, scene, prefixo da build string, fingerprint dos assets).
+    Um render retoma do prefixo mais longo em cache e aplica só as
+    layers restantes.
+    """
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()
+        self._total_bytes = 0
+        self._lock = threading.Lock()
+        self._counters = {
+            "hits": 0,
+            "misses": 0,
+            "stores": 0,
+            "evictions": 0,
+            "layers_applied": 0,
+            "layers_saved": 0,
+        }
+
+    def configure(self, max_bytes: int):
+        with self._lock:
+            self.max_bytes = max_bytes
+            self._evict_locked()
+
+    def longest_prefix(self, keys: list) -> tuple[int, np.ndarray | None]:
+        """
+        `keys[i]` é a chave do composite após aplicar as i+1 primeiras layers.
+        Retorna (quantidade de layers já aplicadas, cópia gravável) do
+        prefixo mais profundo em cache, ou (0, None).
+        """
+        with self._lock:
+            for depth in range(len(keys), 0, -1):
+                array = self._entries.get(keys[depth - 1])
+                if array is None:
+                    continue
+
+                self._entries.move_to_end(keys[depth - 1])
+                self._counters["hits"] += 1
+                self._counters["layers_saved"] += depth
+                break
+            else:
+                if keys:
+                    self._counters["misses"] += 1
+                return 0, None
+
+        return depth, np.array(array)
+
+    def put(self, key, array: np.ndarray):
+        nbytes = array.nbytes
+        if nbytes > self.max_bytes:
+            return
+
+        snapshot = np.array(array)
+        snapshot.setflags(write=False)
+
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self._total_bytes -= old.nbytes
+
+            self._entries[key] = snapshot
+            self._total_bytes += nbytes
+            self._counters["stores"] += 1
+            self._evict_locked()
+
+    def record_applied(self, count: int):
+        with self._lock:
+            self._counters["layers_applied"] += count
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._total_bytes = 0
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                **self._counters,
+                "entries": len(self._entries),
+                "bytes": self._total_bytes,
+                "max_bytes": self.max_bytes,
+            }
+
+    def _evict_locked(self):
+        while self._total_bytes > self.max_bytes and self._entries:
+            _, array = self._entries.popitem(last=False)
+            self._total_bytes -= array.nbytes
+            self._counters["evictions"] += 1
+
+
+prefix_cache = PrefixCompositeCache(PREFIX_CACHE_MAX_BYTES)
@@ -0,0 +1,312 @@
+import os
+import time
+import uuid
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+# ======================================================
+# 🔧 CONFIGURAÇÃO
+# ======================================================
+# renders simultâneos (um processo do render engine por vaga); os demais
+# esperam na fila até RENDER_QUEUE_MAX
+RENDER_JOB_WORKERS = int(os.environ.get(
+    "PANOCONFIG_RENDER_WORKERS", str(os.cpu_count() or 1)))
+RENDER_QUEUE_MAX = int(os.environ.get("PANOCONFIG_RENDER_QUEUE_MAX", "16"))
+
+# jobs terminados continuam consultáveis por este tempo
+JOB_TTL_SECONDS = int(os.environ.get("PANOCONFIG_JOB_TTL", "300"))
+
+JOB_STAGES = ("composite", "tile", "publish")
+
+
+class RenderQueueFull(Exception):
+    """
+    Fila de renders cheia. `retry_after` é a estimativa, em segundos, até
+    abrir vaga.
+    """
+
+    def __init__(self, retry_after: float):
+        super().__init__("Fila de render cheia")
+        self.retry_after = retry_after
+
+
+class RenderCancelled(Exception):
+    """
+    Render especulativo interrompido para dar vez a um pedido interativo.
+    """
+
+
+# ======================================================
+# 🧾 JOB DE RENDER
+# ======================================================
+
+class RenderJob:
+    """
+    Estado de um render assíncrono de uma build. Atualizado pela thread do
+    render; leitores usam `snapshot()` e `version` (incrementado a cada
+    mudança) para polling e SSE.
+    """
+
+    def __init__(self, key: tuple, speculative: bool = False):
+        self.id = uuid.uuid4().hex
+        self.key = key
+        self.client, self.scene, self.build = key
+        self.speculative = speculative
+        self.status = "queued"
+        self.stage = None
+        self.stages = {name: {"done": 0, "total": 0} for name in JOB_STAGES}
+        self.preview = None
+        self.result = None
+        self.error = None
+        # especulativo interrompido (status "failed"): quem se juntou a ele
+        # deve submeter de novo
+        self.cancelled = False
+        self.created_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+        self.version = 0
+        self._preview_tiles = {}
+        self._lock = threading.Lock()
+        self._done = threading.Event()
+
+    # ---------- atualizações (thread do render) ----------
+
+    def start(self):
+        with self._lock:
+            self.started_at = time.time()
+            self.version += 1
+
+    def progress(self, stage: str, done: int, total: int):
+        with self._lock:
+            self.status = "running"
+            self.stage = stage
+            self.stages[stage] = {"done": done, "total": total}
+            self.version += 1
+
+    def set_preview(self, payload: dict, tiles: dict):
+        with self._lock:
+            self._preview_tiles = tiles
+            self.preview = payload
+            self.version += 1
+
+    def finish(self, result: dict):
+        with self._lock:
+            self.status = "ready"
+            self.result = result
+            self._preview_tiles = {}
+            self.finished_at = time.time()
+            self.version += 1
+        self._done.set()
+
+    def fail(self, error: str, cancelled: bool = False):
+        with self._lock:
+            self.status = "failed"
+            self.error = error
+            self.cancelled = cancelled
+            self._preview_tiles = {}
+            self.finished_at = time.time()
+            self.version += 1
+        self._done.set()
+
+    # ---------- leitura ----------
+
+    @property
+    def finished(self) -> bool:
+        return self._done.is_set()
+
+    def wait(self, timeout: float | None = None) -> bool:
+        return self._done.wait(timeout)
+
+    def preview_tile(self, key: tuple) -> bytes | None:
+        with self._lock:
+            return self._preview_tiles.get(key)
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {
+                "job": self.id,
+                "client": self.client,
+                "scene": self.scene,
+                "build": self.build,
+                "speculative": self.speculative,
+                "status": self.status,
+                "stage": self.stage,
+                "stages": {k: dict(v) for k, v in self.stages.items()},
+                "preview": self.preview,
+                "tiles": self.result,
+                "error": self.error,
+                "version": self.version,
+            }
+
+
+# ======================================================
+# 📋 REGISTRO DE JOBS
+# ======================================================
+
+class RenderJobRegistry:
+    """
+    Jobs por id e por (client, scene, build): pedidos para a mesma build
+    enquanto o job existe resolvem para o mesmo job (single-flight: só o
+    primeiro renderiza, os demais esperam o mesmo resultado). Ao terminar
+    o job sai do índice por build (um novo pedido vê a build publicada,
+    que pode ter sido removida depois, ou tenta de novo após uma falha);
+    por id continua consultável (polling, SSE) por JOB_TTL_SECONDS.
+    Jobs especulativos
+    (`speculative=True`) que levantam RenderCancelled contam como
+    cancelados, não como falha.
+    No máximo `workers` jobs rodam ao mesmo tempo e `max_pending` jobs
+    (rodando + na fila) existem; acima disso `submit` levanta
+    RenderQueueFull.
+    """
+
+    def __init__(self, workers: int, ttl_seconds: int, max_pending: int):
+        self.workers = workers
+        self.max_pending = max_pending
+        self.ttl_seconds = ttl_seconds
+        self._executor = ThreadPoolExecutor(
+            max_workers=workers, thread_name_prefix="render-job")
+        self._by_id = {}
+        self._by_key = {}
+        self._lock = threading.Lock()
+        self._counters = {
+            "submitted": 0,
+            "deduplicated": 0,
+            "completed": 0,
+            "failed": 0,
+            "cancelled": 0,
+            "rejected": 0,
+        }
+        self._pending = 0
+        self._running = 0
+        self._wait_ms_sum = 0.0
+        self._wait_ms_max = 0.0
+        self._run_ms_sum = 0.0
+        self._started = 0
+        self._idle_since = time.monotonic()
+
+    def submit(self, key: tuple, run, speculative: bool = False) -> tuple[RenderJob, bool]:
+        """
+        `run(job)` executa o render e retorna o payload final dos tiles.
+        Retorna (job, criado). Juntar-se a um job existente nunca é
+        rejeitado; um job novo com a fila cheia levanta RenderQueueFull.
+        """
+        with self._lock:
+            self._prune_locked()
+
+            job = self._by_key.get(key)
+            if job is not None:
+                self._counters["deduplicated"] += 1
+                return job, False
+
+            if self._pending >= self.max_pending:
+                self._counters["rejected"] += 1
+                raise RenderQueueFull(self._retry_after_locked())
+
+            job = RenderJob(key, speculative)
+            self._by_id[job.id] = job
+            self._by_key[key] = job
+            self._counters["submitted"] += 1
+            self._pending += 1
+
+        self._executor.submit(self._run, job, run)
+        return job, True
+
+    def withdraw(self, job: RenderJob):
+        """
+        Tira `job` (que vai ser cancelado) do índice por build: pedidos
+        novos para a build criam outro job em vez de se juntar a ele.
+        """
+        with self._lock:
+            if self._by_key.get(job.key) is job:
+                del self._by_key[job.key]
+
+    def get(self, job_id: str) -> RenderJob | None:
+        with self._lock:
+            return self._by_id.get(job_id)
+
+    def active(self, key: tuple) -> RenderJob | None:
+        with self._lock:
+            job = self._by_key.get(key)
+        return job if job is not None and not job.finished else None
+
+    def idle_seconds(self) -> float:
+        """
+        Há quanto tempo não há job rodando nem na fila (0 se há).
+        """
+        with self._lock:
+            if self._pending:
+                return 0.0
+            return time.monotonic() - self._idle_since
+
+    def stats(self) -> dict:
+        with self._lock:
+            started = self._started
+            finished = (self._counters["completed"] + self._counters["failed"]
+                        + self._counters["cancelled"])
+            return {
+                **self._counters,
+                "running": self._running,
+                "queue_depth": self._pending - self._running,
+                "queue_max": self.max_pending,
+                "workers": self.workers,
+                "wait_ms_avg": round(self._wait_ms_sum / started, 1) if started else 0.0,
+                "wait_ms_max": round(self._wait_ms_max, 1),
+                "run_ms_avg": round(self._run_ms_sum / finished, 1) if finished else 0.0,
+                "tracked": len(self._by_id),
+            }
+
+    def _retry_after_locked(self) -> float:
+        # tempo para a fila andar o bastante para abrir uma vaga
+        finished = (self._counters["completed"] + self._counters["failed"]
+                    + self._counters["cancelled"])
+        run_s = (self._run_ms_sum / finished / 1000) if finished else 1.0
+        queued = self._pending - self._running
+        return max(1.0, run_s * (queued + 1) / max(1, self.workers))
+
+    def _run(self, job: RenderJob, run):
+        job.start()
+        wait_ms = (job.started_at - job.created_at) * 1000
+        with self._lock:
+            self._running += 1
+            self._started += 1
+            self._wait_ms_sum += wait_ms
+            self._wait_ms_max = max(self._wait_ms_max, wait_ms)
+
+        try:
+            result = run(job)
+        except Exception as e:
+            cancelled = isinstance(e, RenderCancelled)
+            if cancelled:
+                logging.info(f"⏹️ Job {job.id} cancelado ({job.build})")
+            else:
+                logging.exception(f"❌ Job {job.id} falhou")
+            with self._lock:
+                self._counters["cancelled" if cancelled else "failed"] += 1
+                self._release_locked(job)
+            job.fail(str(e), cancelled=cancelled)
+            return
+
+        with self._lock:
+            self._counters["completed"] += 1
+            self._release_locked(job)
+        job.finish(result)
+
+    def _release_locked(self, job: RenderJob):
+        if self._by_key.get(job.key) is job:
+            del self._by_key[job.key]
+        self._running -= 1
+        self._pending -= 1
+        if not self._pending:
+            self._idle_since = time.monotonic()
+        self._run_ms_sum += (time.time() - job.started_at) * 1000
+
+    def _prune_locked(self):
+        cutoff = time.time() - self.ttl_seconds
+        for job_id, job in list(self._by_id.items()):
+            if job.finished_at is not None and job.finished_at < cutoff:
+                del self._by_id[job_id]
+
+
+render_jobs = RenderJobRegistry(
+    RENDER_JOB_WORKERS, JOB_TTL_SECONDS, RENDER_QUEUE_MAX)
@@ -0,0 +1,730 @@
+import os
+import uuid
+import queue
+import signal
+import logging
+import threading
+import multiprocessing as mp
+from collections import OrderedDict
+from multiprocessing import shared_memory
+from pathlib import Path
+import numpy as np
+
+from panoconfig360_backend.render import split_faces_cubemap
+from panoconfig360_backend.render import dynamic_stack_with_masks
+from panoconfig360_backend.render.asset_cache import (
+    DECODERS,
+    asset_cache,
+    client_from_assets_root,
+)
+from panoconfig360_backend.render.asset_pack import asset_packs
+from panoconfig360_backend.render.prefix_cache import prefix_cache
+from panoconfig360_backend.render.layer_contrib import (
+    CONTRIB_CACHE_MAX_BYTES,
+    contribution_cache,
+)
+from panoconfig360_backend.render.cubemap_build import (
+    render_cubemap_build,
+    streaming_source,
+    streaming_stats,
+)
+from panoconfig360_backend.render.mask_index import MaskIndex
+from panoconfig360_backend.render.render_jobs import RENDER_JOB_WORKERS, RenderCancelled
+
+# ======================================================
+# 🔧 CONFIGURAÇÃO
+# ======================================================
+MB = 1024 * 1024
+
+# "process": renders em processos dedicados (assets em shared memory)
+# "thread":  render no próprio processo do servidor (modo antigo)
+RENDER_ENGINES = ("process", "thread")
+RENDER_ENGINE = os.environ.get("PANOCONFIG_RENDER_ENGINE", "process")
+
+RENDER_PROCESSES = int(os.environ.get(
+    "PANOCONFIG_RENDER_PROCESSES", str(RENDER_JOB_WORKERS)))
+
+# reciclagem: o worker sai depois de N jobs ou acima deste RSS privado
+WORKER_MAX_JOBS = int(os.environ.get("PANOCONFIG_RENDER_WORKER_MAX_JOBS", "200"))
+WORKER_MAX_RSS_BYTES = int(os.environ.get(
+    "PANOCONFIG_RENDER_WORKER_MAX_RSS_MB", "2048")) * MB
+
+SHARED_ASSETS_MAX_BYTES = int(os.environ.get(
+    "PANOCONFIG_SHARED_ASSETS_MB", "2048")) * MB
+
+# workers que morrem seguidos sem começar nenhum job: a partir daqui os
+# jobs ainda na fila falham em vez de esperar para sempre
+WORKER_MAX_CRASH_STREAK = int(os.environ.get("PANOCONFIG_RENDER_MAX_CRASHES", "3"))
+
+# alinhamento das partes dentro de um bloco de shared memory
+_ALIGN = 64
+
+
+# ======================================================
+# 🧬 SERIALIZAÇÃO DE ASSETS DECODIFICADOS
+# ======================================================
+
+def _asset_parts(value) -> tuple[dict, dict]:
+    if isinstance(value, MaskIndex):
+        return value.to_parts()
+    return {"array": value}, {}
+
+
+def _asset_from_parts(kind: str, arrays: dict, attrs: dict):
+    if kind == "mask_index":
+        return MaskIndex.from_parts(arrays, attrs)
+    array = arrays["array"]
+    array.setflags(write=False)
+    return array
+
+
+def _views(buf, layout: list) -> dict:
+    return {
+        name: np.ndarray(tuple(shape), dtype=np.dtype(dtype), buffer=buf, offset=offset)
+        for name, dtype, shape, offset in layout
+    }
+
+
+# ======================================================
+# 🧠 ASSETS EM SHARED MEMORY (LADO DO SERVIDOR)
+# ======================================================
+
+class SharedAssetStore:
+    """
+    Assets decodificados publicados uma vez em blocos de shared memory e
+    lidos por todos os workers (um bloco por asset). LRU limitado por
+    bytes; um bloco despejado ou invalidado (mtime) sofre unlink, mas a
+    memória só é liberada quando os workers que o mapearam são reciclados.
+    """
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()
+        self._total_bytes = 0
+        self._lock = threading.Lock()
+        self._counters = {"published": 0, "reused": 0, "unlinked": 0}
+
+    def ensure(self, path: Path, kind: str, client_id: str | None) -> dict:
+        """
+        Descritor do asset em shared memory, publicando se preciso.
+        """
+        path = Path(path)
+        mtime_ns = path.stat().st_mtime_ns
+        key = (str(path), kind)
+
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry["descriptor"]["mtime_ns"] == mtime_ns:
+                self._entries.move_to_end(key)
+                self._counters["reused"] += 1
+                return entry["descriptor"]
+
+        arrays, attrs = _asset_parts(DECODERS[kind](path))
+
+        layout, offset = [], 0
+        for name, arr in arrays.items():
+            offset = -(-offset // _ALIGN) * _ALIGN
+            layout.append((name, arr.dtype.str, list(arr.shape), offset))
+            offset += arr.nbytes
+
+        shm = shared_memory.SharedMemory(create=True, size=max(1, offset))
+        for (name, _, _, _), view in zip(layout, _views(shm.buf, layout).values()):
+            view[...] = arrays[name]
+
+        descriptor = {
+            "shm": shm.name,
+            "path": str(path),
+            "kind": kind,
+            "client": client_id,
+            "mtime_ns": mtime_ns,
+            "layout": layout,
+            "attrs": attrs,
+        }
+
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry["descriptor"]["mtime_ns"] == mtime_ns:
+                # outra thread publicou o mesmo asset enquanto decodificávamos:
+                # o bloco dela pode já estar a caminho de um worker
+                shm.close()
+                shm.unlink()
+                self._entries.move_to_end(key)
+                self._counters["reused"] += 1
+                return entry["descriptor"]
+            if entry is not None:
+                self._unlink_locked(key)
+            self._entries[key] = {"shm": shm, "descriptor": descriptor}
+            self._total_bytes += shm.size
+            self._counters["published"] += 1
+
+            while self._total_bytes > self.max_bytes and len(self._entries) > 1:
+                self._unlink_locked(next(iter(self._entries)))
+
+        return descriptor
+
+    def close(self):
+        with self._lock:
+            for key in list(self._entries):
+                self._unlink_locked(key)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                **self._counters,
+                "entries": len(self._entries),
+                "bytes": self._total_bytes,
+                "max_bytes": self.max_bytes,
+            }
+
+    def _unlink_locked(self, key):
+        entry = self._entries.pop(key)
+        self._total_bytes -= entry["shm"].size
+        entry["shm"].close()
+        try:
+            entry["shm"].unlink()
+        except FileNotFoundError:
+            pass
+        self._counters["unlinked"] += 1
+
+
+def job_assets(stack_fn, render_kwargs: dict) -> list:
+    """
+    (path, kind) que o render de uma build lê do asset cache, conforme
+    a engine de composite e o reuso de tiles. Assets servidos pelo pack
+    da cena (asset_pack) ficam de fora: não vão para a memória compartilhada.
+    """
+    if stack_fn not in (dynamic_stack_with_masks.stack_layers_array,
+                        dynamic_stack_with_masks.stack_layers_image_only):
+        return []
+
+    scene_id = render_kwargs["scene_id"]
+    layers = render_kwargs["layers"]
+    assets_root = Path(render_kwargs["assets_root"])
+    engine = dynamic_stack_with_masks.COMPOSITE_ENGINE
+
+    base_path = assets_root / f"base_{scene_id}.png"
+    if not base_path.exists():
+        return []
+
+    steps, _ = dynamic_stack_with_masks._resolve_layer_assets(
+        layers, render_kwargs["selection"], assets_root)
+
+    # o composite em streaming lê regiões das masks densas
+    streaming = streaming_source(stack_fn, scene_id, assets_root) is not None
+    mask_kind = "mask_index" if engine in ("sparse", "fused") and not streaming else "mask"
+    assets = [(base_path, "rgb")]
+    for _, _, material_path, mask_path in steps:
+        assets.append((material_path, "rgb"))
+        assets.append((mask_path, mask_kind))
+
+    # cobertura layer → tiles (reuso) usa o índice de todas as masks da cena
+    if render_kwargs.get("reuse_tiles", True):
+        for layer in layers:
+            mask_path = assets_root / "masks" / layer.get("mask", "")
+            if layer.get("mask") and mask_path.exists():
+                assets.append((mask_path, "mask_index"))
+
+    # o que está no pack da cena cada worker mapeia direto do arquivo
+    # (o page cache já é a cópia compartilhada)
+    return [(path, kind) for path, kind in dict.fromkeys(assets)
+            if not asset_packs.covers(path, kind)]
+
+
+# ======================================================
+# 📈 MÉTRICAS DO RENDER (WORKERS + SERVIDOR)
+# ======================================================
+# Na engine "process" o composite e o encode rodam nos workers: cada um
+# devolve o snapshot das suas métricas junto com o resultado de cada job
+# e o pool soma os dos workers vivos, os contadores dos que já saíram e
+# as do próprio servidor (engine "thread").
+
+def local_render_stats() -> dict:
+    return {
+        "asset_cache": asset_cache.stats(),
+        "prefix_cache": prefix_cache.stats(),
+        "layer_contributions": contribution_cache.stats(),
+        "tile_encode": split_faces_cubemap.encode_stats(),
+        "composite_streaming": streaming_stats(),
+    }
+
+
+# estado (não contador): de um worker que saiu não soma mais
+_GAUGES = {"entries", "shared_entries", "bytes", "max_bytes", "client_quota_bytes",
+           "clients", "packs", "mapped_bytes", "overlap_pairs", "workers"}
+# razões: recalculadas depois da soma
+_DERIVED = {"hit_rate", "parallel_speedup"}
+# tetos e paralelismo: com workers rodando, valem os deles
+_BUDGETS = {"max_bytes", "client_quota_bytes", "workers"}
+
+
+def _counters_only(stats: dict) -> dict:
+    counters = {}
+    for key, value in stats.items():
+        if isinstance(value, dict):
+            if key != "clients":
+                counters[key] = _counters_only(value)
+        elif key not in _GAUGES and key not in _DERIVED and isinstance(value, (int, float)):
+            counters[key] = value
+    return counters
+
+
+def _without_budgets(stats: dict) -> dict:
+    return {key: _without_budgets(value) if isinstance(value, dict) and key != "clients" else value
+            for key, value in stats.items() if key not in _BUDGETS}
+
+
+def _merge_stats(total: dict, stats: dict) -> dict:
+    for key, value in stats.items():
+        if key in _DERIVED:
+            continue
+        if isinstance(value, dict):
+            _merge_stats(total.setdefault(key, {}), value)
+        elif isinstance(value, (int, float)) and not isinstance(value, bool):
+            total[key] = total.get(key, 0) + value
+        else:
+            total[key] = value
+    return total
+
+
+def _with_ratios(stats: dict) -> dict:
+    cache = stats.get("asset_cache")
+    if cache is not None:
+        lookups = cache.get("hits", 0) + cache.get("misses", 0)
+        cache["hit_rate"] = round(cache.get("hits", 0) / lookups, 4) if lookups else 0.0
+    encode = stats.get("tile_encode")
+    if encode is not None:
+        wall = encode.get("wall_ms_sum", 0)
+        encode["parallel_speedup"] = round(encode.get("encode_ms_sum", 0) / wall, 2) if wall else 0.0
+        encode["encode_ms_sum"] = round(encode.get("encode_ms_sum", 0), 1)
+        encode["wall_ms_sum"] = round(wall, 1)
+    return stats
+
+
+# ======================================================
+# 👷 WORKER (PROCESSO DE RENDER)
+# ======================================================
+
+def _worker_rss_bytes() -> int:
+    # memória privada (anônima): os assets em shared memory não contam
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("RssAnon:"):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+
+    import resource
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+def _attach_assets(descriptors: list, attached: dict):
+    for desc in descriptors:
+        if desc["shm"] in attached:
+            continue
+
+        shm = shared_memory.SharedMemory(name=desc["shm"])
+        attached[desc["shm"]] = shm
+
+        value = _asset_from_parts(
+            desc["kind"], _views(shm.buf, desc["layout"]), desc["attrs"])
+        asset_cache.put_shared(
+            desc["path"], desc["kind"], value, desc["mtime_ns"], desc["client"])
+
+
+def _worker_main(tasks, results, cancel_epoch, max_jobs: int, max_rss_bytes: int,
+                 encode_workers: int, contrib_cache_bytes: int):
+    logging.basicConfig(level=logging.INFO, format="%(levelname)s: %(message)s")
+    split_faces_cubemap.configure_tile_workers(encode_workers)
+    contribution_cache.configure(contrib_cache_bytes)
+
+    # Ctrl+C vai para o grupo todo: quem encerra o worker é o pool
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+
+    pid = os.getpid()
+    # blocos mapeados ficam abertos até o worker sair: os arrays do asset
+    # cache apontam para eles
+    attached = {}
+    jobs_done = 0
+    reason = "shutdown"
+
+    logging.info(f"👷 Worker de render {pid} iniciado")
+
+    while True:
+        task = tasks.get()
+        if task is None:
+            break
+
+        job_id = task["job_id"]
+        results.put(("started", job_id, pid))
+
+        def on_progress(stage, done, total, job_id=job_id):
+            results.put(("progress", job_id, stage, done, total))
+
+        def on_preview(level, tiles, job_id=job_id):
+            results.put(("preview", job_id, level, tiles))
+
+        # especulativo: cancelado se o pool avançar o epoch durante o job
+        should_cancel = None
+        if task["speculative"]:
+            epoch = cancel_epoch.value
+            should_cancel = lambda epoch=epoch: cancel_epoch.value != epoch
+
+        try:
+            _attach_assets(task["assets"], attached)
+            meta = render_cubemap_build(
+                task["stack_fn"],
+                on_progress=on_progress,
+                on_preview=on_preview if task["preview"] else None,
+                should_cancel=should_cancel,
+                **task["kwargs"],
+            )
+            outcome = ("done", job_id, meta)
+        except RenderCancelled:
+            outcome = ("cancelled", job_id)
+        except Exception as e:
+            logging.exception(f"❌ Worker {pid}: falha no job {job_id}")
+            outcome = ("error", job_id, f"{type(e).__name__}: {e}")
+
+        # métricas antes do resultado: quem espera o job já as vê somadas
+        results.put(("stats", job_id, pid, local_render_stats()))
+        results.put(outcome)
+
+        jobs_done += 1
+        if jobs_done >= max_jobs:
+            reason = "max_jobs"
+            break
+        if _worker_rss_bytes() > max_rss_bytes:
+            reason = "max_rss"
+            break
+
+    logging.info(f"👋 Worker de render {pid} saindo ({reason}, {jobs_done} jobs)")
+    results.put(("exit", None, pid, reason))
+
+
+# ======================================================
+# 🏭 POOL DE PROCESSOS
+# ======================================================
+
+class _PendingRender:
+    def __init__(self, on_progress, on_preview):
+        self.on_progress = on_progress
+        self.on_preview = on_preview
+        self.pid = None
+        self.meta = None
+        self.error = None
+        self.cancelled = False
+        self.done = threading.Event()
+
+
+class RenderProcessPool:
+    """
+    Workers de vida longa (spawn) que recebem jobs de build por uma fila
+    compartilhada e devolvem o metadata (manifest) da build. Uma thread
+    do servidor despacha progresso/preview/resultado e repõe workers que
+    saem (reciclagem) ou morrem (o job em andamento falha).
+    Jobs especulativos são cancelados (entre etapas do render) por
+    `preempt_speculative`, que avança um epoch compartilhado.
+    As métricas de composite e encode dos workers são somadas em
+    `render_stats`.
+    """
+
+    def __init__(self, processes: int, max_jobs: int, max_rss_bytes: int, store: SharedAssetStore):
+        self.processes = max(1, processes)
+        self.max_jobs = max_jobs
+        self.max_rss_bytes = max_rss_bytes
+        self.store = store
+        self._ctx = mp.get_context("spawn")
+        self._cancel_epoch = self._ctx.RawValue("q", 0)
+        self._tasks = None
+        self._results = None
+        self._workers = {}
+        self._pending = {}
+        self._lock = threading.Lock()
+        self._started = False
+        self._stopping = False
+        self._dispatcher = None
+        self._worker_stats = {}
+        self._retired_stats = {}
+        self._crash_streak = 0
+        self._counters = {
+            "jobs": 0,
+            "failed": 0,
+            "cancelled": 0,
+            "preemptions": 0,
+            "spawned": 0,
+            "recycled_max_jobs": 0,
+            "recycled_max_rss": 0,
+            "crashed": 0,
+        }
+
+    def start(self):
+        with self._lock:
+            if self._started:
+                return
+            self._tasks = self._ctx.Queue()
+            self._results = self._ctx.Queue()
+            for _ in range(self.processes):
+                self._spawn_locked()
+            self._started = True
+
+        self._dispatcher = threading.Thread(
+            target=self._dispatch, name="render-pool-dispatch", daemon=True)
+        self._dispatcher.start()
+        logging.info(f"🏭 Render engine: {self.processes} processos")
+
+    def render(self, stack_fn, on_progress=None, on_preview=None,
+               speculative: bool = False, **render_kwargs) -> dict:
+        """
+        Renderiza uma build num worker; mesma assinatura e retorno de
+        `render_cubemap_build`. Bloqueia até o fim. Um job `speculative`
+        cancelado levanta RenderCancelled.
+        """
+        self.start()
+
+        client_id = client_from_assets_root(render_kwargs["assets_root"])
+        descriptors = [
+            self.store.ensure(path, kind, client_id)
+            for path, kind in job_assets(stack_fn, render_kwargs)
+        ]
+
+        job_id = uuid.uuid4().hex
+        pending = _PendingRender(on_progress, on_preview)
+        with self._lock:
+            self._pending[job_id] = pending
+            self._counters["jobs"] += 1
+
+        self._tasks.put({
+            "job_id": job_id,
+            "stack_fn": stack_fn,
+            "kwargs": render_kwargs,
+            "assets": descriptors,
+            "preview": on_preview is not None,
+            "speculative": speculative,
+        })
+
+        pending.done.wait()
+        with self._lock:
+            self._pending.pop(job_id, None)
+
+        if pending.cancelled:
+            raise RenderCancelled(render_kwargs.get("build"))
+        if pending.error is not None:
+            raise RuntimeError(pending.error)
+        return pending.meta
+
+    def preempt_speculative(self):
+        """
+        Cancela os jobs especulativos em andamento (e os já na fila, que
+        ao começar pegam o epoch novo e só são cancelados num próximo).
+        """
+        with self._lock:
+            self._cancel_epoch.value += 1
+            self._counters["preemptions"] += 1
+
+    def shutdown(self):
+        with self._lock:
+            if not self._started:
+                self.store.close()
+                return
+            self._stopping = True
+            workers = list(self._workers.values())
+
+        for _ in workers:
+            self._tasks.put(None)
+        for proc in workers:
+            proc.join(timeout=10)
+            if proc.is_alive():
+                proc.terminate()
+
+        self.store.close()
+        logging.info("🏭 Render engine encerrado")
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                **self._counters,
+                "processes": self.processes,
+                "alive": sum(1 for p in self._workers.values() if p.is_alive()),
+                "in_flight": len(self._pending),
+                "shared_assets": self.store.stats(),
+            }
+
+    def render_stats(self, local: dict | None = None) -> dict:
+        """
+        Métricas de render somadas: `local` (as do servidor), o último
+        snapshot de cada worker vivo e os contadores dos que já saíram.
+        """
+        with self._lock:
+            snapshots = list(self._worker_stats.values())
+            retired = self._retired_stats
+
+            local = local or {}
+            if snapshots:
+                local = _without_budgets(local)
+            total = _merge_stats({}, local)
+            total = _merge_stats(total, retired)
+            for snapshot in snapshots:
+                total = _merge_stats(total, snapshot)
+        return _with_ratios(total)
+
+    # --------------------------------------------------
+    # internos
+    # --------------------------------------------------
+
+    def _retire_stats_locked(self, pid: int):
+        snapshot = self._worker_stats.pop(pid, None)
+        if snapshot is not None:
+            _merge_stats(self._retired_stats, _counters_only(snapshot))
+
+    def _spawn_locked(self):
+        encode_workers = max(
+            1, split_faces_cubemap.TILE_ENCODE_WORKERS // self.processes)
+        # cada worker monta as suas contribuições (arrays do processo, fora
+        # da shared memory): o teto é dividido para caber em WORKER_MAX_RSS
+        contrib_cache_bytes = CONTRIB_CACHE_MAX_BYTES // self.processes
+        proc = self._ctx.Process(
+            target=_worker_main,
+            args=(self._tasks, self._results, self._cancel_epoch, self.max_jobs,
+                  self.max_rss_bytes, encode_workers, contrib_cache_bytes),
+            name="render-worker",
+            daemon=True,
+        )
+        proc.start()
+        self._workers[proc.pid] = proc
+        self._counters["spawned"] += 1
+
+    def _dispatch(self):
+        while True:
+            try:
+                msg = self._results.get(timeout=1.0)
+            except queue.Empty:
+                self._reap()
+                continue
+            except (EOFError, OSError):
+                return
+
+            kind, job_id = msg[0], msg[1]
+            if kind == "exit":
+                self._on_exit(msg[2], msg[3])
+                continue
+            if kind == "stats":
+                with self._lock:
+                    if msg[2] in self._workers:
+                        self._worker_stats[msg[2]] = msg[3]
+                continue
+
+            with self._lock:
+                pending = self._pending.get(job_id)
+            if pending is None:
+                continue
+
+            try:
+                if kind == "started":
+                    pending.pid = msg[2]
+                    with self._lock:
+                        self._crash_streak = 0
+                elif kind == "progress" and pending.on_progress:
+                    pending.on_progress(*msg[2:])
+                elif kind == "preview" and pending.on_preview:
+                    pending.on_preview(*msg[2:])
+                elif kind == "done":
+                    pending.meta = msg[2]
+                    pending.done.set()
+                elif kind == "error":
+                    self._fail(pending, msg[2])
+                elif kind == "cancelled":
+                    with self._lock:
+                        self._counters["cancelled"] += 1
+                    pending.cancelled = True
+                    pending.done.set()
+            except Exception:
+                logging.exception("❌ Erro ao despachar mensagem do render engine")
+
+    def _fail(self, pending: _PendingRender, error: str):
+        with self._lock:
+            self._counters["failed"] += 1
+        pending.error = error
+        pending.done.set()
+
+    def _on_exit(self, pid: int, reason: str):
+        with self._lock:
+            proc = self._workers.pop(pid, None)
+            # None: `_reap` já viu o processo morto e pôs outro no lugar
+            if proc is not None:
+                self._retire_stats_locked(pid)
+                self._counters[f"recycled_{reason}"] = self._counters.get(
+                    f"recycled_{reason}", 0) + 1
+                if not self._stopping:
+                    self._spawn_locked()
+        if proc is not None:
+            proc.join(timeout=5)
+
+    def _reap(self):
+        # worker que morreu sem avisar (OOM, segfault): falha o job dele
+        with self._lock:
+            if self._stopping:
+                return
+            dead = [pid for pid, p in self._workers.items() if not p.is_alive()]
+            for pid in dead:
+                del self._workers[pid]
+                self._retire_stats_locked(pid)
+                self._counters["crashed"] += 1
+                self._crash_streak += 1
+                self._spawn_locked()
+            lost = [p for p in self._pending.values() if p.pid in dead]
+
+            # workers morrendo antes de pegar qualquer job: os jobs na fila
+            # não teriam quem os execute
+            waiting = []
+            if dead and self._crash_streak >= WORKER_MAX_CRASH_STREAK:
+                waiting = [p for p in self._pending.values()
+                           if p.pid is None and not p.done.is_set()]
+
+        for pid in dead:
+            logging.error(f"💥 Worker de render {pid} morreu")
+        for pending in lost:
+            self._fail(pending, "Worker de render morreu durante o job")
+        if waiting:
+            logging.error(
+                f"💥 {self._crash_streak} workers de render morreram seguidos; "
+                f"falhando {len(waiting)} jobs na fila")
+        for pending in waiting:
+            self._fail(pending, "Workers de render morrendo ao iniciar")
+
+
+render_pool = RenderProcessPool(
+    RENDER_PROCESSES, WORKER_MAX_JOBS, WORKER_MAX_RSS_BYTES,
+    SharedAssetStore(SHARED_ASSETS_MAX_BYTES))
+
+
+# epoch de cancelamento da engine "thread" (no próprio processo)
+_thread_cancel_epoch = 0
+
+
+def preempt_speculative():
+    """
+    Cancela os renders especulativos em andamento na engine configurada.
+    """
+    global _thread_cancel_epoch
+    if RENDER_ENGINE == "process":
+        render_pool.preempt_speculative()
+    else:
+        _thread_cancel_epoch += 1
+
+
+def render_build(stack_fn, speculative: bool = False, **render_kwargs) -> dict:
+    """
+    Ponto de entrada do servidor: roda `render_cubemap_build` no engine
+    configurado (PANOCONFIG_RENDER_ENGINE). Renders `speculative` podem
+    ser cancelados por `preempt_speculative` (levantam RenderCancelled).
+    """
+    if RENDER_ENGINE == "process":
+        return render_pool.render(stack_fn, speculative=speculative, **render_kwargs)
+    if RENDER_ENGINE == "thread":
+        should_cancel = None
+        if speculative:
+            epoch = _thread_cancel_epoch
+            should_cancel = lambda: _thread_cancel_epoch != epoch
+        return render_cubemap_build(stack_fn, should_cancel=should_cancel, **render_kwargs)
+    raise ValueError(f"Engine de render inválida: {RENDER_ENGINE}")
@@ -1,5 +1,5 @@
 from pathlib import Path
-from dynamic_stack_with_masks import stack_layers_image_only
+from panoconfig360_backend.render.dynamic_stack_with_masks import stack_layers_image_only
 
 # -----------------------------------------
 # caminho real do SaaS
@@ -0,0 +1,369 @@
+import os
+import logging
+import threading
+from collections import Counter, OrderedDict
+
+from panoconfig360_backend.render.dynamic_stack import build_string_from_selection
+from panoconfig360_backend.render.cubemap_build import tile_root_key
+from panoconfig360_backend.render.layer_table import compile_layers
+from panoconfig360_backend.render.render_jobs import (
+    render_jobs,
+    RenderQueueFull,
+    RenderCancelled,
+)
+from panoconfig360_backend.render.render_pool import preempt_speculative
+from panoconfig360_backend.render.build_index import build_index
+from panoconfig360_backend.storage.storage_local import exists, get_json, delete_dir
+from panoconfig360_backend.storage.tile_store import (
+    TILE_STORAGE_MODE,
+    forget_manifest,
+    forget_pack,
+)
+from panoconfig360_backend.storage.tile_cache import hot_tiles
+
+# ======================================================
+# 🔧 CONFIGURAÇÃO
+# ======================================================
+MB = 1024 * 1024
+
+SPECULATIVE_ENABLED = os.environ.get("PANOCONFIG_SPECULATIVE", "1") == "1"
+
+# teto de disco das builds especulativas que ainda não receberam clique
+SPECULATIVE_DISK_BYTES = int(os.environ.get(
+    "PANOCONFIG_SPECULATIVE_DISK_MB", "1024")) * MB
+
+# os workers precisam estar ociosos há este tempo para especular
+SPECULATIVE_IDLE_SECONDS = float(os.environ.get(
+    "PANOCONFIG_SPECULATIVE_IDLE_SECONDS", "1.0"))
+
+# vizinhos são gerados a partir das builds atuais das N sessões mais recentes
+SPECULATIVE_RECENT_SESSIONS = 8
+
+SPECULATIVE_POLL_SECONDS = 0.5
+MAX_SESSIONS = 1000
+MAX_TRIED = 10000
+
+
+# ======================================================
+# 🔮 PRÉ-RENDER ESPECULATIVO DE VIZINHOS
+# ======================================================
+
+class Speculator:
+    """
+    Acompanha a seleção atual de cada sessão e, com os workers de render
+    ociosos, renderiza em background as builds vizinhas (uma layer
+    diferente) das builds recentes, na ordem de popularidade dos itens
+    (quantas vezes cada item foi escolhido numa troca de layer).
+
+    Um job especulativo por vez, pelo registro de jobs (um clique na
+    mesma build se junta a ele). Qualquer job interativo novo cancela o
+    especulativo em andamento (`on_submit` → `preempt_speculative`), que
+    antes sai do registro: ninguém mais se junta a um job cancelado.
+    Builds especulativas sem clique ocupam no máximo SPECULATIVE_DISK_BYTES
+    (pode passar em até uma build); acima disso as mais antigas são
+    removidas (modos files e pack; no modo cas os objetos são
+    compartilhados e a especulação só pausa).
+    """
+
+    def __init__(self, max_disk_bytes: int, idle_seconds: float, enabled: bool = True):
+        self.max_disk_bytes = max_disk_bytes
+        self.idle_seconds = idle_seconds
+        self.enabled = enabled
+        self._runner = None
+        self._sessions = OrderedDict()
+        self._popularity = Counter()
+        self._tried = OrderedDict()
+        # builds especulativas publicadas e ainda sem clique: key → bytes
+        self._unclaimed = OrderedDict()
+        self._disk_bytes = 0
+        self._in_flight = None
+        # especulativos terminados cujo tamanho ainda está sendo lido
+        self._finishing = {}
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread = None
+        self._counters = {
+            "clicks": 0,
+            "hits": 0,
+            "joined": 0,
+            "submitted": 0,
+            "completed": 0,
+            "cancelled": 0,
+            "failed": 0,
+            "evicted": 0,
+        }
+
+    # ---------- ciclo de vida ----------
+
+    def start(self, runner):
+        """
+        `runner(job, tile_root, build, render_kwargs)` executa o render e
+        retorna o payload dos tiles (o mesmo dos jobs interativos).
+        """
+        if not self.enabled or self._thread is not None:
+            return
+        self._runner = runner
+        self._stop.clear()
+        self._thread = threading.Thread(
+            target=self._loop, name="speculator", daemon=True)
+        self._thread.start()
+        logging.info("🔮 Pré-render especulativo ativo")
+
+    def stop(self):
+        self._stop.set()
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+            self._thread = None
+
+        with self._lock:
+            in_flight = self._in_flight
+        if in_flight is not None:
+            # cancela e espera o job sair (cancelamento só entre etapas)
+            preempt_speculative()
+            if in_flight["job"] is not None:
+                in_flight["job"].wait(timeout=10)
+
+    # ---------- sinais dos pedidos interativos ----------
+
+    def observe(self, session_id: str, scene_index: int, build: str,
+                render_kwargs: dict, cached: bool):
+        """
+        Registra o clique de uma sessão em `build` (antes do render).
+        """
+        client_id = render_kwargs["client_id"]
+        scene_id = render_kwargs["scene_id"]
+        selection = render_kwargs["selection"]
+        key = (client_id, scene_id, build)
+
+        with self._lock:
+            self._counters["clicks"] += 1
+
+            if cached and key in self._unclaimed:
+                self._disk_bytes -= self._unclaimed.pop(key)
+                self._counters["hits"] += 1
+                logging.info(f"🎯 Build especulativa virou cache hit: {build}")
+            elif cached and key in self._finishing:
+                self._finishing[key]["claimed"] = True
+                self._counters["hits"] += 1
+
+            prev = self._sessions.pop(session_id, None)
+            if prev is not None and prev["key"][:2] == key[:2]:
+                for layer_id, item_id in selection.items():
+                    if prev["selection"].get(layer_id) != item_id:
+                        self._popularity[(client_id, scene_id, layer_id, item_id)] += 1
+
+            self._sessions[session_id] = {
+                "key": key,
+                "scene_index": scene_index,
+                "selection": dict(selection),
+                "render_kwargs": render_kwargs,
+            }
+            while len(self._sessions) > MAX_SESSIONS:
+                self._sessions.popitem(last=False)
+
+        self._wake.set()
+
+    def on_submit(self, job, created: bool) -> bool:
+        """
+        Chamado após `render_jobs.submit` de um pedido interativo. Retorna
+        False se `job` é um especulativo já cancelado (o pedido se juntou
+        a ele antes de sair do registro): o pedido deve submeter de novo.
+        """
+        with self._lock:
+            in_flight = self._in_flight
+            if in_flight is None:
+                return not job.cancelled
+
+            if job.speculative and job.key == in_flight["key"]:
+                if in_flight["preempted"]:
+                    return False
+                # clique numa build em especulação: vira interativa
+                if not in_flight["claimed"]:
+                    in_flight["claimed"] = True
+                    self._counters["joined"] += 1
+                return True
+
+            if not created or in_flight["claimed"]:
+                return True
+
+            # sai do registro antes do cancelamento; se o job ainda não
+            # foi atribuído, `_tick` o retira ao atribuir
+            in_flight["preempted"] = True
+            if in_flight["job"] is not None:
+                render_jobs.withdraw(in_flight["job"])
+
+        preempt_speculative()
+        return True
+
+    def stats(self) -> dict:
+        with self._lock:
+            clicks = self._counters["clicks"]
+            return {
+                **self._counters,
+                "enabled": self.enabled,
+                "hit_rate": round(self._counters["hits"] / clicks, 4) if clicks else 0.0,
+                "in_flight": self._in_flight["key"][2] if self._in_flight else None,
+                "sessions": len(self._sessions),
+                "unclaimed_builds": len(self._unclaimed),
+                "disk_bytes": self._disk_bytes,
+                "max_disk_bytes": self.max_disk_bytes,
+            }
+
+    # ---------- internos ----------
+
+    def _loop(self):
+        while not self._stop.is_set():
+            self._wake.wait(SPECULATIVE_POLL_SECONDS)
+            self._wake.clear()
+            try:
+                self._tick()
+            except Exception:
+                logging.exception("❌ Erro no pré-render especulativo")
+
+    def _tick(self):
+        with self._lock:
+            if self._in_flight is not None:
+                return
+
+        if render_jobs.idle_seconds() < self.idle_seconds:
+            return
+
+        with self._lock:
+            if self._stop.is_set():
+                return
+            if self._disk_bytes >= self.max_disk_bytes and not self._evict_locked():
+                return
+            candidate = self._next_candidate_locked()
+            if candidate is None:
+                return
+            key, build, render_kwargs = candidate
+            self._tried[key] = True
+            while len(self._tried) > MAX_TRIED:
+                self._tried.popitem(last=False)
+            in_flight = {"key": key, "job": None, "claimed": False, "preempted": False}
+            self._in_flight = in_flight
+
+        tile_root = tile_root_key(key[0], key[1], build)
+        kwargs = {**render_kwargs, "speculative": True}
+
+        try:
+            job, created = render_jobs.submit(
+                key,
+                lambda job: self._run(job, in_flight, tile_root, build, kwargs),
+                speculative=True,
+            )
+        except RenderQueueFull:
+            created = False
+
+        with self._lock:
+            if not created:
+                # alguém criou o job antes (corrida com um clique)
+                self._in_flight = None
+                return
+            in_flight["job"] = job
+            self._counters["submitted"] += 1
+            if in_flight["preempted"]:
+                render_jobs.withdraw(job)
+
+        logging.info(f"🔮 Render especulativo: {build}")
+
+    def _run(self, job, in_flight: dict, tile_root: str, build: str, render_kwargs: dict):
+        outcome = "failed"
+        try:
+            result = self._runner(job, tile_root, build, render_kwargs)
+            outcome = "completed"
+            return result
+        except RenderCancelled:
+            outcome = "cancelled"
+            raise
+        finally:
+            key = in_flight["key"]
+            with self._lock:
+                self._counters[outcome] += 1
+                self._in_flight = None
+                track = outcome == "completed" and not in_flight["claimed"]
+                if track:
+                    self._finishing[key] = in_flight
+            if track:
+                self._track(key, in_flight, tile_root)
+            self._wake.set()
+
+    def _track(self, key: tuple, in_flight: dict, tile_root: str):
+        # leitura do metadata fora do lock; um clique nesse meio tempo
+        # marca `claimed` (ver `observe`)
+        meta_key = f"{tile_root}/metadata.json"
+        nbytes = get_json(meta_key).get("tiles_bytes", 0) if exists(meta_key) else None
+
+        with self._lock:
+            self._finishing.pop(key, None)
+            if nbytes is None or in_flight["claimed"]:
+                return
+            self._unclaimed[key] = nbytes
+            self._disk_bytes += nbytes
+
+    def _evict_locked(self) -> bool:
+        """
+        Remove as builds especulativas sem clique mais antigas até caber no
+        teto. Retorna se há espaço.
+        """
+        if TILE_STORAGE_MODE == "cas":
+            return False
+
+        while self._unclaimed and self._disk_bytes >= self.max_disk_bytes:
+            key, nbytes = self._unclaimed.popitem(last=False)
+            self._disk_bytes -= nbytes
+            tile_root = tile_root_key(*key)
+            build_index.discard(*key)
+            hot_tiles.forget_build(*key)
+            if delete_dir(tile_root):
+                forget_manifest(tile_root)
+                forget_pack(tile_root)
+                self._counters["evicted"] += 1
+                logging.info(f"🗑️ Build especulativa removida (teto de disco): {key[2]}")
+
+        return self._disk_bytes < self.max_disk_bytes
+
+    def _next_candidate_locked(self):
+        """
+        Vizinho (uma layer trocada) mais popular das builds atuais das
+        sessões recentes, ainda não publicado nem tentado.
+        """
+        best = None
+        best_score = -1
+
+        recent = list(self._sessions.values())[-SPECULATIVE_RECENT_SESSIONS:]
+        for session in reversed(recent):
+            client_id, scene_id, _ = session["key"]
+            render_kwargs = session["render_kwargs"]
+            for layer in compile_layers(render_kwargs["layers"]).ordered:
+                current = session["selection"].get(layer["id"])
+                for item in layer.get("items", []):
+                    if item["id"] == current:
+                        continue
+
+                    # empate: fica o da sessão mais recente (visto antes)
+                    score = self._popularity[(client_id, scene_id, layer["id"], item["id"])]
+                    if score <= best_score:
+                        continue
+
+                    selection = {**session["selection"], layer["id"]: item["id"]}
+                    build = build_string_from_selection(
+                        session["scene_index"], render_kwargs["layers"], selection)
+                    key = (client_id, scene_id, build)
+
+                    if key in self._tried or render_jobs.active(key) is not None:
+                        continue
+                    if build_index.resolve(client_id, scene_id, build) is not None:
+                        self._tried[key] = True
+                        continue
+
+                    best = (key, build, {**render_kwargs, "selection": selection})
+                    best_score = score
+
+        return best
+
+
+speculator = Speculator(
+    SPECULATIVE_DISK_BYTES, SPECULATIVE_IDLE_SECONDS, SPECULATIVE_ENABLED)
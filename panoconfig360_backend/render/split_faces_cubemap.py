@@ -1,10 +1,16 @@
 # backend/split_faces_cubemap.py
 
 import os
+import time
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 from PIL import Image
 from pathlib import Path
 import numpy as np
 
+from panoconfig360_backend.render.tile_encoding import TileEncoding, DEFAULT_ENCODING
+
 
 # Ordem das faces no strip vertical (de cima para baixo)
 STRIP_FACES = ["px", "nx", "py", "ny", "pz", "nz"]
@@ -19,96 +25,593 @@ MARZIPANO_FACE_MAP = {
     "nz": "b",
 }
 
+# Pool compartilhado de encode (Pillow libera o GIL durante o encode JPEG)
+TILE_ENCODE_WORKERS = int(os.environ.get(
+    "PANOCONFIG_TILE_WORKERS", str(min(8, os.cpu_count() or 1))))
+
+# Menor face da pirâmide de LOD (nível 0 = menor, para o primeiro paint)
+LOD_MIN_FACE_SIZE = int(os.environ.get("PANOCONFIG_LOD_MIN_FACE", "256"))
+
+# Teto de memória de trabalho do tiler em streaming (`stream_cubemap`):
+# tiles em construção + composite de um tile + tiles na fila do encoder
+STREAM_MAX_BYTES = int(os.environ.get("PANOCONFIG_STREAM_MAX_MB", "64")) * 1024 * 1024
+
+_executor = None
+_executor_lock = threading.Lock()
+
+_encode_stats = {
+    "cubemaps": 0,
+    "tiles": 0,
+    "bytes": 0,
+    "encode_ms_sum": 0.0,
+    "wall_ms_sum": 0.0,
+}
+
+
+def get_tile_executor() -> ThreadPoolExecutor:
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=TILE_ENCODE_WORKERS, thread_name_prefix="tile-encode")
+        return _executor
+
+
+def configure_tile_workers(workers: int):
+    """
+    Redimensiona o pool; tarefas já submetidas ao pool antigo terminam nele.
+    """
+    global _executor, TILE_ENCODE_WORKERS
+    with _executor_lock:
+        old, _executor = _executor, None
+        TILE_ENCODE_WORKERS = max(1, int(workers))
+    if old is not None:
+        old.shutdown(wait=False)
+
+
+def _record_encode_stats(results: list, wall_s: float):
+    with _executor_lock:
+        _encode_stats["cubemaps"] += 1
+        _encode_stats["tiles"] += len(results)
+        _encode_stats["bytes"] += sum(r["bytes"] for r in results)
+        _encode_stats["encode_ms_sum"] += sum(r["encode_ms"] for r in results)
+        _encode_stats["wall_ms_sum"] += wall_s * 1000
+
+
+def encode_stats() -> dict:
+    with _executor_lock:
+        stats = dict(_encode_stats)
+        stats["workers"] = TILE_ENCODE_WORKERS
+
+    # > 1 indica paralelismo efetivo: soma dos encodes / tempo de parede
+    stats["parallel_speedup"] = round(
+        stats["encode_ms_sum"] / stats["wall_ms_sum"], 2) if stats["wall_ms_sum"] else 0.0
+    stats["encode_ms_sum"] = round(stats["encode_ms_sum"], 1)
+    stats["wall_ms_sum"] = round(stats["wall_ms_sum"], 1)
+    return stats
+
+
 # Normaliza qualquer entrada para um cubemap horizontal
 
 
-def normalize_to_horizontal_cubemap(img: Image.Image) -> Image.Image:
+def as_cubemap_array(img: Image.Image | np.ndarray) -> np.ndarray:
+    """
+    Composite como array uint8 (H, W, 3). Um array (saída de
+    `stack_layers_array`) passa direto, sem cópia; uma imagem PIL é
+    convertida uma única vez.
+    """
+    if isinstance(img, Image.Image):
+        if img.mode != "RGB":
+            img = img.convert("RGB")
+        img = np.asarray(img)
+    if img.dtype != np.uint8 or img.ndim != 3:
+        raise ValueError("Composite deve ser um array uint8 (H, W, 3)")
+    return img
+
+
+def normalize_to_horizontal_cubemap(img: Image.Image | np.ndarray) -> np.ndarray:
     """
-    Recebe qualquer formato e retorna um cubemap horizontal em memória
+    Recebe qualquer formato e retorna um cubemap horizontal em memória,
+    no buffer do composite (sem cópia). O espelhamento é aplicado por
+    face, como view, em `face_view`.
     """
     # por enquanto: assume que já vem horizontal
-    return img.transpose(Image.FLIP_LEFT_RIGHT)  # espelha horizontalmente
+    return as_cubemap_array(img)
+
+
+def _marzipano_face(face_key: str) -> str:
+    # py/ny trocam de lugar depois da rotação
+    if face_key == "py":
+        return MARZIPANO_FACE_MAP["ny"]
+    if face_key == "ny":
+        return MARZIPANO_FACE_MAP["py"]
+    return MARZIPANO_FACE_MAP[face_key]
+
+
+def face_view(strip: np.ndarray, face_index: int) -> np.ndarray:
+    """
+    Face `face_index` (ordem de STRIP_FACES) do strip horizontal
+    original, espelhada e rotacionada como o tiler a publica. É só uma
+    view (stride negativo / rot90), sem cópia; serve para o composite
+    (H, W, 3) e para masks (H, W).
+    """
+    face_size = strip.shape[0]
+    # espelhar o strip e tirar a face i == tirar a face 5 - i, espelhada
+    left = strip.shape[1] - (face_index + 1) * face_size
+    face = strip[:, left:left + face_size][:, ::-1]
+
+    # numa face quadrada, rotate(±90) do Pillow é a transposição exata
+    # que o rot90 expressa
+    face_key = STRIP_FACES[face_index]
+    if face_key == "py":
+        face = np.rot90(face, 1)
+    elif face_key == "ny":
+        face = np.rot90(face, -1)
+    return face
+
+
+def materialize(view: np.ndarray) -> np.ndarray:
+    """
+    Cópia contígua de uma view espelhada/rotacionada. Canal a canal, o
+    laço interno do NumPy anda num único stride (muito mais rápido que
+    copiar pixels de 3 bytes com stride negativo ou transposto).
+    """
+    out = np.empty(view.shape, dtype=view.dtype)
+    if view.ndim == 2:
+        out[...] = view
+        return out
+    for c in range(view.shape[2]):
+        out[..., c] = view[..., c]
+    return out
+
+
+def reduce_box(arr: np.ndarray, factor: int) -> np.ndarray:
+    """
+    Downsampling por média de blocos factor×factor com arredondamento.
+    No 2x2, o passo da pirâmide, o resultado é bit a bit o do
+    `Image.reduce` do Pillow.
+    """
+    arr = np.ascontiguousarray(arr)
+
+    h, w, channels = arr.shape[0] // factor, arr.shape[1] // factor, arr.shape[2]
+    arr = arr[:h * factor, :w * factor]
+    if factor == 2:
+        # linhas em pares, depois colunas em pares, sempre em memória contígua
+        rows = arr.reshape(h, 2, 2 * w, channels)
+        acc = np.add(rows[:, 0], rows[:, 1], dtype=np.uint16).reshape(h, w, 2, channels)
+        acc = np.add(acc[:, :, 0], acc[:, :, 1])
+        acc += 2
+        acc >>= 2
+        return acc.astype(np.uint8)
+
+    area = factor * factor
+    blocks = arr.reshape(h, factor, w, factor, channels)
+    acc = blocks.sum(axis=(1, 3), dtype=np.uint32)
+    return ((acc + area // 2) // area).astype(np.uint8)
+
 
 # Divide as faces do cubemap e gera os tiles
 
 
+def strip_pixels_to_tiles(rows: np.ndarray, cols: np.ndarray, width: int, tile_size: int, level: int) -> set:
+    """
+    Mapeia pixels (row, col) do strip horizontal original para as chaves
+    (face, lod, x, y) dos tiles que os contêm, aplicando o mesmo espelhamento
+    e as mesmas rotações de `face_view`.
+    """
+    face_size = width // 6
+    mirrored = width - 1 - cols
+    face_idx = mirrored // face_size
+    u = mirrored % face_size
+    v = rows
+
+    tiles = set()
+    for i, face_key in enumerate(STRIP_FACES):
+        sel = face_idx == i
+        if not sel.any():
+            continue
+
+        fu, fv = u[sel], v[sel]
+        if face_key == "py":
+            # rotate(90): (v, u) -> (face_size - 1 - u, v)
+            fv, fu = face_size - 1 - fu, fv
+            marzipano_face = MARZIPANO_FACE_MAP["ny"]
+        elif face_key == "ny":
+            # rotate(-90): (v, u) -> (u, face_size - 1 - v)
+            fv, fu = fu, face_size - 1 - fv
+            marzipano_face = MARZIPANO_FACE_MAP["py"]
+        else:
+            marzipano_face = MARZIPANO_FACE_MAP[face_key]
+
+        keys = np.unique((fv // tile_size) * face_size + (fu // tile_size))
+        for key in keys.tolist():
+            ty, tx = divmod(key, face_size)
+            tiles.add((marzipano_face, level, tx, ty))
+
+    return tiles
+
+
+def all_tile_keys(face_size: int, tile_size: int, level: int) -> set:
+    per_side = face_size // tile_size
+    return {
+        (face, level, x, y)
+        for face in MARZIPANO_FACE_MAP.values()
+        for y in range(per_side)
+        for x in range(per_side)
+    }
+
+
+def pyramid_levels(face_size: int, tile_size: int, min_face_size: int | None = None) -> list:
+    """
+    Níveis da pirâmide, do menor para o maior, no formato do
+    `Marzipano.CubeGeometry`: [{"size", "tileSize"}, ...].
+    O índice na lista é o LOD ({z}) dos tiles. Cada nível tem metade do
+    lado do seguinte; o maior é a própria face do composite.
+    """
+    if min_face_size is None:
+        min_face_size = LOD_MIN_FACE_SIZE
+
+    levels = []
+    size = face_size
+    while True:
+        level_tile = min(tile_size, size)
+        if size % level_tile != 0:
+            break
+        levels.append({"size": size, "tileSize": level_tile})
+        if size % 2 != 0 or size // 2 < min_face_size:
+            break
+        size //= 2
+
+    return levels[::-1]
+
+
+def pyramid_tile_keys(levels: list) -> set:
+    keys = set()
+    for lod, lvl in enumerate(levels):
+        keys |= all_tile_keys(lvl["size"], lvl["tileSize"], lod)
+    return keys
+
+
+def strip_pixels_to_pyramid_tiles(rows: np.ndarray, cols: np.ndarray, width: int, levels: list) -> set:
+    """
+    Como `strip_pixels_to_tiles`, para todos os níveis da pirâmide: o
+    downsampling 2x2 por box faz cada pixel de um nível depender só do
+    bloco correspondente do nível acima, então basta dividir as coordenadas.
+    """
+    face_size = width // 6
+    tiles = set()
+    for lod, lvl in enumerate(levels):
+        scale = face_size // lvl["size"]
+        tiles |= strip_pixels_to_tiles(
+            rows // scale, cols // scale, width // scale, lvl["tileSize"], lod)
+    return tiles
+
+
+def tile_filename(build: str, key: tuple) -> str:
+    face, lod, x, y = key
+    return f"{build}_{face}_{lod}_{x}_{y}.jpg"
+
+
 def split_faces_from_image(
-    cubemap_img: Image.Image,
-    output_base_dir: str,
+    cubemap: np.ndarray,
+    output_base_dir: str | None,
     tile_size: int,
     level: int,
-    build: str
-):
-    output_base_dir = str(output_base_dir)
+    build: str,
+    only_tiles: set | None = None,
+    encoding: TileEncoding | None = None,
+) -> list:
+    futures = _submit_faces(cubemap, output_base_dir,
+                            tile_size, level, build, only_tiles, encoding)
+
+    # ordem de submissão: saída determinística independente do pool
+    return [f.result() for f in futures]
+
+
+def _submit_faces(
+    cubemap: np.ndarray,
+    output_base_dir: str | None,
+    tile_size: int,
+    level: int,
+    build: str,
+    only_tiles: set | None = None,
+    encoding: TileEncoding | None = None,
+) -> list:
+    if output_base_dir is not None:
+        output_base_dir = str(output_base_dir)
+    encoding = encoding or DEFAULT_ENCODING
+    futures = []
 
-    width, height = cubemap_img.size
+    height, width = cubemap.shape[:2]
     face_size = height
 
     if width != face_size * 6:
         raise ValueError("Cubemap horizontal inválido")
 
+    executor = get_tile_executor()
+
     for i, face_key in enumerate(STRIP_FACES):
-        left = i * face_size
-        face_img = cubemap_img.crop((left, 0, left + face_size, face_size))
+        marzipano_face = _marzipano_face(face_key)
+
+        if only_tiles is not None and not any(
+                k[0] == marzipano_face and k[1] == level for k in only_tiles):
+            continue
+
+        # faces e rotações são views do mesmo buffer (só índices)
+        futures += _generate_tiles(executor, face_view(cubemap, i), output_base_dir,
+                                   marzipano_face, tile_size, level, build, only_tiles, encoding)
+
+    return futures
 
-        if face_key == "py":
-            face_img = face_img.rotate(90, expand=False)
-            marzipano_face = MARZIPANO_FACE_MAP["ny"]
-        elif face_key == "ny":
-            face_img = face_img.rotate(-90, expand=False)
-            marzipano_face = MARZIPANO_FACE_MAP["py"]
-        else:
-            marzipano_face = MARZIPANO_FACE_MAP[face_key]
 
-        _generate_tiles(face_img, output_base_dir,
-                        marzipano_face, tile_size, level, build)
+def _encode_tile(face: np.ndarray, box: tuple, out_dir: str | None, filename: str, key: tuple,
+                 encoding: TileEncoding) -> dict:
+    start = time.perf_counter()
+    left, top, right, bottom = box
+    # único ponto em que os pixels são copiados: o tile contíguo do encoder
+    tile = face[top:bottom, left:right]
+    if not tile.flags.c_contiguous:
+        tile = materialize(tile)
+    tile = Image.fromarray(tile)
 
+    data = encoding.encode(tile, key[1])
+    size = len(data)
+    if out_dir is not None:
+        with open(os.path.join(out_dir, filename), "wb") as f:
+            f.write(data)
+        data = None
 
-def _generate_tiles(face_img: Image.Image, out_dir: str, face: str, tile_size: int, lod: int, build: str):
-    width, height = face_img.size
+    elapsed_ms = (time.perf_counter() - start) * 1000
+
+    return {
+        "key": key,
+        "filename": filename,
+        "bytes": size,
+        "encode_ms": round(elapsed_ms, 2),
+        "data": data,
+    }
+
+
+def _generate_tiles(executor: ThreadPoolExecutor, face_view: np.ndarray, out_dir: str | None, face: str,
+                    tile_size: int, lod: int, build: str, only_tiles: set | None = None,
+                    encoding: TileEncoding = DEFAULT_ENCODING) -> list:
+    height, width = face_view.shape[:2]
     if width % tile_size != 0 or height % tile_size != 0:
         raise ValueError("Face não é múltipla do tile_size")
 
     tiles_x = width // tile_size
     tiles_y = height // tile_size
+    futures = []
 
     for y in range(tiles_y):
         for x in range(tiles_x):
-            tile = face_img.crop((
+            key = (face, lod, x, y)
+            if only_tiles is not None and key not in only_tiles:
+                continue
+
+            box = (
                 x * tile_size,
                 y * tile_size,
                 (x + 1) * tile_size,
                 (y + 1) * tile_size
-            ))
+            )
 
-            filename = f"{build}_{face}_{lod}_{x}_{y}.jpg"
-            tile_path = os.path.join(out_dir, filename)
-            tile.save(tile_path, "JPEG", quality=95, subsampling=0)
+            futures.append(executor.submit(
+                _encode_tile, face_view, box, out_dir, tile_filename(build, key), key, encoding))
 
-# Função principal para processar o cubemap
+    return futures
+
+def _track_progress(futures: list, on_tile):
+    total = len(futures)
+    done = [0]
+    lock = threading.Lock()
+
+    def _done(_future):
+        with lock:
+            done[0] += 1
+            count = done[0]
+        on_tile(count, total)
+
+    for f in futures:
+        f.add_done_callback(_done)
 
 
 # Função principal para processar o cubemap
 def process_cubemap(
-    input_image: Image.Image,
-    output_base_dir: Path | str,
+    input_image: Image.Image | np.ndarray,
+    output_base_dir: Path | str | None,
     tile_size=512,
     level=0,
-    build: str = "unknown"
-):
+    build: str = "unknown",
+    only_tiles: set | None = None,
+    levels: list | None = None,
+    on_tile=None,
+    encoding: TileEncoding | None = None,
+) -> list:
     """
     Processa o cubemap completo e gera os tiles com o padrão:
     {BUILD}_{FACE}_{LOD}_{X}_{Y}.jpg
+    Com `levels` (ver `pyramid_levels`), gera a pirâmide inteira numa
+    passada: cada nível é reduzido do nível anterior, não do composite
+    original, e o LOD de cada tile é o índice do nível. Sem `levels`, gera
+    só o nível `level` com a face no tamanho original.
+    Com `only_tiles`, gera só as chaves (face, lod, x, y) informadas.
+    `input_image` é o composite (array uint8 ou imagem PIL); espelho,
+    faces, rotações e tiles são views dele, e só o tile entregue ao
+    encoder é materializado.
+    Os tiles são codificados no pool compartilhado (`get_tile_executor`).
+    Com `output_base_dir=None` os tiles ficam só em memória (campo "data").
+    `encoding` é o preset de encode (padrão: JPEG q95 4:4:4).
+    `on_tile(done, total)` é chamado (da thread do pool) a cada tile pronto.
+    Retorna, do maior nível para o menor e na ordem face/y/x, um registro
+    por tile gerado: {"key", "filename", "bytes", "encode_ms", "data"}.
+    """
+    start = time.perf_counter()
+    cubemap = normalize_to_horizontal_cubemap(input_image)
+
+    face_size = cubemap.shape[0]
+    if levels is None:
+        plan = [(level, face_size, tile_size)]
+    else:
+        plan = [(lod, lvl["size"], lvl["tileSize"])
+                for lod, lvl in enumerate(levels)][::-1]
+
+    if only_tiles is not None:
+        needed = {k[1] for k in only_tiles}
+        lowest = min(needed) if needed else None
+    else:
+        lowest = plan[-1][0]
+
+    futures = []
+    for lod, size, lod_tile in plan:
+        if lowest is None or lod < lowest:
+            break
+
+        if size != cubemap.shape[0]:
+            # downsampling progressivo: o strip inteiro de uma vez; as
+            # bordas das faces caem em múltiplos do fator, sem mistura
+            factor = cubemap.shape[0] // size
+            cubemap = reduce_box(cubemap, factor)
+
+        if only_tiles is None or lod in needed:
+            futures += _submit_faces(
+                cubemap, output_base_dir, lod_tile, lod, build, only_tiles, encoding)
+
+    if on_tile is not None:
+        _track_progress(futures, on_tile)
+
+    # ordem de submissão: saída determinística independente do pool
+    results = [f.result() for f in futures]
+
+    _record_encode_stats(results, time.perf_counter() - start)
+    return results
+
+
+# ======================================================
+# 🌊 TILER EM STREAMING (MEMÓRIA LIMITADA)
+# ======================================================
+
+def _tile_bytes(tile_size: int) -> int:
+    return tile_size * tile_size * 3
+
+
+def stream_working_bytes(levels: list, composite_bytes: int = 0) -> int:
+    """
+    Memória de trabalho fixa de `stream_cubemap`, sem a fila do encoder:
+    um tile em construção por nível (mais o filho reduzido e o acumulador
+    uint16 do reduce) e o composite de um tile do maior nível.
     """
-    img = input_image
-    cubemap_img = normalize_to_horizontal_cubemap(img)
+    building = sum(2 * _tile_bytes(lvl["tileSize"]) for lvl in levels)
+    reducing = 2 * _tile_bytes(levels[-1]["tileSize"])
+    return building + reducing + composite_bytes
+
+
+def stream_cubemap(
+    source,
+    build: str,
+    levels: list,
+    only_tiles: set | None = None,
+    encoding: TileEncoding | None = None,
+    max_bytes: int | None = None,
+):
+    """
+    Gera a pirâmide de tiles sem o composite inteiro em memória.
+    `source.region(face_index, top, left, size)` compõe um quadrado de
+    uma face (já espelhada/rotacionada, ver `face_view`) do maior nível;
+    cada tile dos níveis menores é montado dos filhos reduzidos 2x2,
+    em profundidade, então só existe um tile em construção por nível.
+    O resultado é bit a bit o de `process_cubemap` sobre o composite.
+    Os tiles vão para o encoder assim que ficam prontos; a fila é
+    limitada para a memória de trabalho caber em `max_bytes` (padrão
+    STREAM_MAX_BYTES), independente do tamanho da face.
+    Com `only_tiles`, só as chaves pedidas são codificadas (e só as
+    regiões que elas cobrem são compostas).
+    Gera os registros de `process_cubemap` na ordem em que os encodes
+    terminam.
+    """
+    start = time.perf_counter()
+    encoding = encoding or DEFAULT_ENCODING
+    max_bytes = STREAM_MAX_BYTES if max_bytes is None else max_bytes
+    top = len(levels) - 1
+
+    if levels[-1]["size"] != source.face_size:
+        raise ValueError("Pirâmide não corresponde à face do composite")
+
+    fixed = stream_working_bytes(
+        levels, source.region_bytes(levels[-1]["tileSize"]))
+    # cada tile na fila: os pixels e a cópia do Pillow no encode
+    queued = 2 * _tile_bytes(levels[-1]["tileSize"])
+    if fixed + queued > max_bytes:
+        raise ValueError(
+            f"Teto de memória do streaming ({max_bytes // (1024 * 1024)}MB) abaixo do "
+            f"mínimo para esta pirâmide ({(fixed + queued + 1024 * 1024 - 1) // (1024 * 1024)}MB)")
+    max_queued = (max_bytes - fixed) // queued
+
+    wanted = pyramid_tile_keys(levels) if only_tiles is None else set(only_tiles)
+
+    # a descida passa pelos ancestrais dos tiles pedidos sem compor nada
+    # que nenhum deles cubra
+    on_path = set()
+    for face, lod, x, y in wanted:
+        while (face, lod, x, y) not in on_path:
+            on_path.add((face, lod, x, y))
+            if lod == 0:
+                break
+            per_parent = 2 * levels[lod - 1]["tileSize"] // levels[lod]["tileSize"]
+            lod, x, y = lod - 1, x // per_parent, y // per_parent
+
+    executor = get_tile_executor()
+    pending = deque()
+    results = []
+
+    def drain(limit: int):
+        while len(pending) > limit:
+            tile = pending.popleft().result()
+            results.append(tile)
+            yield tile
+
+    def produce(face_index: int, face: str, lod: int, x: int, y: int, need_pixels: bool):
+        """
+        Pixels do tile (None se ninguém acima precisa deles); gera os
+        registros dos encodes que terminam enquanto isso.
+        """
+        key = (face, lod, x, y)
+        need_pixels = need_pixels or key in wanted
+        if not need_pixels and key not in on_path:
+            return None
+
+        size = levels[lod]["tileSize"]
+        pixels = None
+        if lod == top:
+            if need_pixels:
+                pixels = source.region(face_index, y * size, x * size, size)
+        else:
+            per_side = 2 * size // levels[lod + 1]["tileSize"]
+            part = size // per_side
+            if need_pixels:
+                pixels = np.empty((size, size, 3), dtype=np.uint8)
+            for cy in range(per_side):
+                for cx in range(per_side):
+                    child = yield from produce(
+                        face_index, face, lod + 1, x * per_side + cx, y * per_side + cy, need_pixels)
+                    if pixels is not None:
+                        pixels[cy * part:(cy + 1) * part, cx * part:(cx + 1) * part] = reduce_box(child, 2)
+
+        if key in wanted:
+            yield from drain(max_queued - 1)
+            pending.append(executor.submit(
+                _encode_tile, pixels, (0, 0, size, size), None,
+                tile_filename(build, key), key, encoding))
+        return pixels
+
+    per_side = levels[0]["size"] // levels[0]["tileSize"]
+    for face_index, face_key in enumerate(STRIP_FACES):
+        face = _marzipano_face(face_key)
+        for y in range(per_side):
+            for x in range(per_side):
+                yield from produce(face_index, face, 0, x, y, False)
 
-    split_faces_from_image(
-        cubemap_img,
-        output_base_dir,
-        tile_size,
-        level,
-        build
-    )
+    yield from drain(0)
+    _record_encode_stats(results, time.perf_counter() - start)
 
 # Fim do arquivo backend/split_faces_cubemap.py
@@ -0,0 +1,188 @@
+import io
+import json
+import hashlib
+
+from PIL import Image, features
+
+# ======================================================
+# 🎛️ FORMATOS E PRESETS DE ENCODE DOS TILES
+# ======================================================
+TILE_FORMATS = {
+    "jpeg": {"ext": "jpg", "media_type": "image/jpeg", "pil": "JPEG"},
+    "webp": {"ext": "webp", "media_type": "image/webp", "pil": "WEBP", "feature": "webp"},
+    "avif": {"ext": "avif", "media_type": "image/avif", "pil": "AVIF", "feature": "avif"},
+}
+EXT_FORMATS = {spec["ext"]: fmt for fmt, spec in TILE_FORMATS.items()}
+
+# parâmetros aceitos por formato (repassados ao Pillow)
+FORMAT_PARAMS = {
+    "jpeg": {"quality", "subsampling", "progressive", "optimize"},
+    "webp": {"quality", "method", "lossless"},
+    "avif": {"quality", "speed", "subsampling"},
+}
+JPEG_SUBSAMPLING = {"4:4:4": 0, "4:2:2": 1, "4:2:0": 2}
+
+# Presets embutidos. O cfg do cliente escolhe um em `viewer.tileEncoding`
+# (nome, ou dict sobre um `preset` base) e pode declarar os seus em
+# `viewer.encoderPresets`. Os tiles publicados são sempre JPEG (o
+# formato que todo cliente aceita); `variants` são os formatos
+# negociados por Accept, gerados a partir do JPEG no primeiro pedido.
+# `lods` sobrescreve parâmetros do JPEG por nível ("0" = menor); um
+# `variants` dentro do nível faz o mesmo para cada variante.
+BUILTIN_PRESETS = {
+    # o encode de sempre: baseline JPEG q95 4:4:4, sem variantes
+    "default": {
+        "quality": 95,
+        "subsampling": "4:4:4",
+    },
+    "kiosk": {
+        "quality": 85,
+        "subsampling": "4:2:0",
+        "progressive": True,
+        "optimize": True,
+        "lods": {"0": {"quality": 75}},
+        "variants": {
+            "avif": {"quality": 55, "speed": 6},
+            "webp": {"quality": 80, "method": 4},
+        },
+    },
+}
+DEFAULT_PRESET = "default"
+
+
+def _digest(data) -> str:
+    payload = json.dumps(data, sort_keys=True).encode()
+    return hashlib.blake2b(payload, digest_size=6).hexdigest()
+
+
+def _check_params(fmt: str, params: dict, where: str):
+    unknown = set(params) - FORMAT_PARAMS[fmt]
+    if unknown:
+        raise ValueError(f"Parâmetros de encode inválidos para {fmt} em {where}: {sorted(unknown)}")
+    if fmt == "jpeg" and params.get("subsampling", "4:4:4") not in JPEG_SUBSAMPLING:
+        raise ValueError(f"Subsampling JPEG inválido em {where}: {params['subsampling']}")
+
+
+class TileEncoding:
+    """
+    Preset de encode resolvido. Vai junto com o render (é picklable)
+    para os workers; `fingerprint` identifica o JPEG gerado (builds com
+    fingerprints diferentes não trocam tiles entre si).
+    """
+
+    def __init__(self, name: str, preset: dict):
+        preset = dict(preset)
+        if preset.pop("format", "jpeg") != "jpeg":
+            raise ValueError(
+                f"Preset '{name}': o formato publicado é sempre jpeg "
+                f"(webp/avif entram em `variants`)")
+
+        self.name = name
+        self.lods = {str(k): v for k, v in preset.pop("lods", {}).items()}
+        variants = preset.pop("variants", {})
+        self.params = preset
+        _check_params("jpeg", self.params, name)
+        for lod, override in self.lods.items():
+            _check_params("jpeg", {k: v for k, v in override.items() if k != "variants"}, name)
+
+        # variantes na ordem de preferência do cfg; formato sem suporte no
+        # Pillow desta máquina fica de fora
+        self.variants = {}
+        for fmt, params in variants.items():
+            if fmt not in TILE_FORMATS or fmt == "jpeg":
+                raise ValueError(f"Preset '{name}': variante inválida {fmt}")
+            _check_params(fmt, params, name)
+            if features.check(TILE_FORMATS[fmt]["feature"]):
+                self.variants[fmt] = params
+
+        self.fingerprint = _digest({"params": self.params, "lods": {
+            lod: {k: v for k, v in o.items() if k != "variants"}
+            for lod, o in self.lods.items()}})
+
+    # ---------- parâmetros ----------
+
+    def lod_params(self, lod: int, fmt: str = "jpeg") -> dict:
+        override = self.lods.get(str(lod), {})
+        if fmt == "jpeg":
+            return {**self.params, **{k: v for k, v in override.items() if k != "variants"}}
+        return {**self.variants[fmt], **override.get("variants", {}).get(fmt, {})}
+
+    def variant_id(self, fmt: str, lod: int) -> str:
+        return _digest([fmt, self.lod_params(lod, fmt)])
+
+    # ---------- encode ----------
+
+    def encode(self, img: Image.Image, lod: int, fmt: str = "jpeg") -> bytes:
+        params = dict(self.lod_params(lod, fmt))
+        if fmt == "jpeg":
+            params["subsampling"] = JPEG_SUBSAMPLING[params.get("subsampling", "4:4:4")]
+        buffer = io.BytesIO()
+        img.save(buffer, TILE_FORMATS[fmt]["pil"], **params)
+        return buffer.getvalue()
+
+    def transcode(self, jpeg: bytes, lod: int, fmt: str) -> bytes:
+        """
+        Variante `fmt` a partir dos bytes do tile publicado.
+        """
+        with Image.open(io.BytesIO(jpeg)) as img:
+            img.load()
+            return self.encode(img, lod, fmt)
+
+    # ---------- negociação ----------
+
+    def negotiate(self, accept: str | None) -> str:
+        """
+        Melhor formato aceito pelo cliente (ordem das variantes no
+        preset; `*/*` e `image/*` não contam, só um pedido explícito).
+        """
+        if not accept or not self.variants:
+            return "jpeg"
+
+        accepted = set()
+        for part in accept.split(","):
+            media, *params = [p.strip() for p in part.split(";")]
+            q = 1.0
+            for param in params:
+                if param.startswith("q="):
+                    try:
+                        q = float(param[2:])
+                    except ValueError:
+                        q = 0.0
+            if q > 0:
+                accepted.add(media.lower())
+
+        for fmt in self.variants:
+            if TILE_FORMATS[fmt]["media_type"] in accepted:
+                return fmt
+        return "jpeg"
+
+    def describe(self) -> dict:
+        return {
+            "preset": self.name,
+            "fingerprint": self.fingerprint,
+            "jpeg": self.params,
+            "lods": self.lods,
+            "variants": self.variants,
+        }
+
+
+def resolve_tile_encoding(viewer_cfg: dict) -> TileEncoding:
+    """
+    TileEncoding do cliente a partir da seção `viewer` do cfg.
+    """
+    presets = {**BUILTIN_PRESETS, **viewer_cfg.get("encoderPresets", {})}
+    choice = viewer_cfg.get("tileEncoding", DEFAULT_PRESET)
+
+    if isinstance(choice, str):
+        if choice not in presets:
+            raise ValueError(f"Preset de encode desconhecido: {choice}")
+        return TileEncoding(choice, presets[choice])
+
+    base = choice.get("preset", DEFAULT_PRESET)
+    if base not in presets:
+        raise ValueError(f"Preset de encode desconhecido: {base}")
+    overrides = {k: v for k, v in choice.items() if k != "preset"}
+    return TileEncoding(f"{base}+cfg", {**presets[base], **overrides})
+
+
+DEFAULT_ENCODING = TileEncoding(DEFAULT_PRESET, BUILTIN_PRESETS[DEFAULT_PRESET])
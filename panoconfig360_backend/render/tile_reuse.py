@@ -0,0 +1,149 @@
+import os
+import threading
+from collections import OrderedDict
+from pathlib import Path
+import numpy as np
+
+from panoconfig360_backend.render.asset_cache import load_mask_index
+from panoconfig360_backend.render.split_faces_cubemap import (
+    strip_pixels_to_pyramid_tiles,
+    pyramid_tile_keys,
+)
+from panoconfig360_backend.render.dynamic_stack import (
+    FIXED_LAYERS,
+    SCENE_CHARS,
+    LAYER_CHARS,
+)
+
+# ======================================================
+# 🗺️ MAPA LAYER → TILES (POR CENA)
+# ======================================================
+# (mask_path, mtime_ns, width, níveis) -> frozenset de (face, lod, x, y),
+# LRU: masks trocadas (mtime novo) e cenas sem uso saem por aqui
+COVERAGE_MEMO_MAX_ENTRIES = int(os.environ.get("PANOCONFIG_COVERAGE_MEMO_ENTRIES", "256"))
+
+_coverage_memo = OrderedDict()
+_coverage_lock = threading.Lock()
+
+
+def _levels_key(levels: list) -> tuple:
+    return tuple((lvl["size"], lvl["tileSize"]) for lvl in levels)
+
+
+def mask_tile_coverage(mask_path: Path, client_id: str | None, width: int, levels: list) -> frozenset:
+    """
+    Tiles (face, lod, x, y) que a mask toca, em todos os níveis da
+    pirâmide, depois do espelhamento e das rotações do tiler.
+    """
+    mask_path = Path(mask_path)
+    memo_key = (str(mask_path), mask_path.stat().st_mtime_ns,
+                width, _levels_key(levels))
+
+    with _coverage_lock:
+        cached = _coverage_memo.get(memo_key)
+        if cached is not None:
+            _coverage_memo.move_to_end(memo_key)
+            return cached
+
+    index = load_mask_index(mask_path, client_id)
+    if index.is_empty:
+        tiles = frozenset()
+    else:
+        flat = np.concatenate([index.opaque_idx, index.partial_idx])
+        rows, cols = np.divmod(flat, index.shape[1])
+        tiles = frozenset(strip_pixels_to_pyramid_tiles(
+            rows, cols, width, levels))
+
+    with _coverage_lock:
+        _coverage_memo[memo_key] = tiles
+        while len(_coverage_memo) > COVERAGE_MEMO_MAX_ENTRIES:
+            _coverage_memo.popitem(last=False)
+    return tiles
+
+
+def scene_tile_map(layers: list, assets_root: Path, client_id: str | None,
+                   width: int, levels: list) -> dict:
+    """
+    {layer_id: frozenset(tiles)} para cada layer com mask existente.
+    """
+    tile_map = {}
+    for layer in layers:
+        mask_file = layer.get("mask")
+        if not mask_file:
+            continue
+
+        mask_path = assets_root / "masks" / mask_file
+        if not mask_path.exists():
+            continue
+
+        tile_map[layer["id"]] = mask_tile_coverage(
+            mask_path, client_id, width, levels)
+
+    return tile_map
+
+
+def static_tiles(tile_map: dict, levels: list) -> set:
+    """
+    Tiles que nenhuma mask toca: iguais à base em qualquer build da cena.
+    """
+    touched = set().union(*tile_map.values()) if tile_map else set()
+    return pyramid_tile_keys(levels) - touched
+
+
+# ======================================================
+# ♻️ PLANO DE REUSO ENTRE BUILDS
+# ======================================================
+
+def _slots_are_unique(layers: list) -> bool:
+    orders = [layer.get("build_order", 0) for layer in layers]
+    if len(set(orders)) != len(orders):
+        return False
+    return all(0 <= o < FIXED_LAYERS for o in orders)
+
+
+def _slot(build: str, build_order: int) -> str:
+    start = SCENE_CHARS + LAYER_CHARS * build_order
+    return build[start:start + LAYER_CHARS]
+
+
+def dirty_tiles_against(build: str, donor: str, layers: list, tile_map: dict) -> set | None:
+    """
+    Tiles que mudam entre `donor` e `build`: união dos tiles das layers
+    cujo slot difere. None se as builds não são comparáveis.
+    """
+    if len(build) != len(donor) or build[:SCENE_CHARS] != donor[:SCENE_CHARS]:
+        return None
+
+    dirty = set()
+    for layer in layers:
+        build_order = layer.get("build_order", 0)
+        if _slot(build, build_order) == _slot(donor, build_order):
+            continue
+        dirty |= tile_map.get(layer["id"], frozenset())
+
+    return dirty
+
+
+def plan_tile_reuse(build: str, rendered_builds: list, layers: list, tile_map: dict) -> tuple[str | None, set | None]:
+    """
+    Escolhe, entre as builds já renderizadas, a que exige menos tiles novos.
+    Retorna (donor, tiles a gerar) ou (None, None) se não há doador.
+    """
+    if not _slots_are_unique(layers):
+        return None, None
+
+    best_donor, best_dirty = None, None
+    for donor in rendered_builds:
+        if donor == build:
+            continue
+
+        dirty = dirty_tiles_against(build, donor, layers, tile_map)
+        if dirty is None:
+            continue
+
+        if best_dirty is None or len(dirty) < len(best_dirty):
+            best_donor, best_dirty = donor, dirty
+            if not dirty:
+                break
+
+    return best_donor, best_dirty
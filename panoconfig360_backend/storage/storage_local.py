@@ -1,10 +1,16 @@
 import os
 import json
 import logging
+import shutil
+import time
+import uuid
 from pathlib import Path
 
 ASSETS_ROOT = Path(__file__).resolve().parents[2] / "panoconfig360_cache"
 
+# Staging no mesmo filesystem do cache: commit por rename atômico
+STAGING_PREFIX = ".staging"
+
 logging.info(f"📁 Using local assets root: {ASSETS_ROOT}")
 
 
@@ -23,16 +29,220 @@ def upload_file(file_path: str, key: str, content_type: str = "application/octet
     dest.parent.mkdir(parents=True, exist_ok=True)
     _ = content_type  # Ignorado para armazenamento local, mas mantido para compatibilidade com interface
 
+    tmp = dest.with_name(f".{dest.name}.{uuid.uuid4().hex}.tmp")
+
     try:
-        with open(file_path, "rb") as src, open(dest, "wb") as dst:
-            dst.write(src.read())
+        # copyfile usa sendfile/copy_file_range: sem buffer do arquivo inteiro em Python
+        shutil.copyfile(file_path, tmp)
+        os.replace(tmp, dest)
 
         logging.info(f"💾 Cached locally: {key}")
     except Exception as e:
+        if tmp.exists():
+            tmp.unlink()
         logging.error(f"❌ Failed to cache file {key}: {e}")
         raise
 
 
+def put_bytes(key: str, data: bytes):
+    """
+    Grava `data` em `key` de forma atômica (arquivo temporário + rename).
+    """
+    dest = _resolve_path(key)
+    dest.parent.mkdir(parents=True, exist_ok=True)
+    tmp = dest.with_name(f".{dest.name}.{uuid.uuid4().hex}.tmp")
+
+    try:
+        with open(tmp, "wb") as f:
+            f.write(data)
+        os.replace(tmp, dest)
+    except Exception as e:
+        if tmp.exists():
+            tmp.unlink()
+        logging.error(f"❌ Failed to write {key}: {e}")
+        raise
+
+
+def link_file(src_key: str, dest_key: str):
+    """
+    Publica `src_key` também em `dest_key` sem reescrever os bytes:
+    hardlink quando possível, cópia como fallback.
+    """
+    src = _resolve_path(src_key)
+    dest = _resolve_path(dest_key)
+    if not src.exists():
+        raise FileNotFoundError(f"Asset not found in local cache: {src_key}")
+
+    dest.parent.mkdir(parents=True, exist_ok=True)
+    tmp = dest.with_name(f".{dest.name}.{uuid.uuid4().hex}.tmp")
+
+    # link (ou cópia) num nome temporário e rename: quem lê `dest` vê o
+    # arquivo antigo ou o novo, nunca nenhum
+    try:
+        try:
+            os.link(src, tmp)
+        except OSError:
+            shutil.copyfile(src, tmp)
+        os.replace(tmp, dest)
+    except Exception as e:
+        tmp.unlink(missing_ok=True)
+        logging.error(f"❌ Failed to link {src_key} -> {dest_key}: {e}")
+        raise
+
+
+def list_dirs(key: str) -> list:
+    path = _resolve_path(key)
+    if not path.is_dir():
+        return []
+    return [entry.name for entry in os.scandir(path) if entry.is_dir()]
+
+
+def list_files(key: str) -> list:
+    path = _resolve_path(key)
+    if not path.is_dir():
+        return []
+    return [entry.name for entry in os.scandir(path) if entry.is_file()]
+
+
+def move_file(src_key: str, dest_key: str):
+    src = _resolve_path(src_key)
+    dest = _resolve_path(dest_key)
+    dest.parent.mkdir(parents=True, exist_ok=True)
+    os.replace(src, dest)
+
+
+def delete(key: str):
+    path = _resolve_path(key)
+    if path.exists():
+        path.unlink()
+
+
+def size(key: str) -> int:
+    return _resolve_path(key).stat().st_size
+
+
+def mtime(key: str) -> float:
+    return _resolve_path(key).stat().st_mtime
+
+
+def local_path(key: str) -> Path:
+    return _resolve_path(key)
+
+
+def put_json(key: str, data: dict):
+    dest = _resolve_path(key)
+    dest.parent.mkdir(parents=True, exist_ok=True)
+    tmp = dest.with_name(f".{dest.name}.{uuid.uuid4().hex}.tmp")
+
+    try:
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(data, f)
+        os.replace(tmp, dest)
+    except Exception as e:
+        tmp.unlink(missing_ok=True)
+        logging.error(f"❌ Failed to write JSON {key}: {e}")
+        raise
+
+
+# ======================================================
+# 🚚 STAGING DE DIRETÓRIOS (PUBLICAÇÃO ATÔMICA)
+# ======================================================
+
+def stage_dir() -> str:
+    """
+    Cria um diretório de staging vazio e retorna sua key.
+    """
+    key = f"{STAGING_PREFIX}/{uuid.uuid4().hex}"
+    _resolve_path(key).mkdir(parents=True)
+    return key
+
+
+def discard_dir(key: str):
+    shutil.rmtree(_resolve_path(key), ignore_errors=True)
+
+
+def purge_stale_staging(max_age_seconds: float) -> int:
+    """
+    Remove stagings abandonados (ex.: worker de render morto no meio do
+    job) mais antigos que `max_age_seconds`. Retorna quantos removeu.
+    """
+    root = _resolve_path(STAGING_PREFIX)
+    if not root.is_dir():
+        return 0
+
+    cutoff = time.time() - max_age_seconds
+    removed = 0
+    for entry in root.iterdir():
+        try:
+            if entry.stat().st_mtime < cutoff:
+                shutil.rmtree(entry, ignore_errors=True)
+                removed += 1
+        except FileNotFoundError:
+            continue
+
+    if removed:
+        logging.info(f"🧹 Purged {removed} stale staging dirs")
+    return removed
+
+
+def commit_dir(staging_key: str, dest_key: str) -> bool:
+    """
+    Publica o staging em `dest_key` com um único rename: leitores nunca
+    veem o diretório pela metade. Se `dest_key` já existe (outro render
+    publicou antes), descarta o staging e retorna False.
+    """
+    dest = _resolve_path(dest_key)
+    dest.parent.mkdir(parents=True, exist_ok=True)
+
+    try:
+        os.rename(_resolve_path(staging_key), dest)
+    except OSError:
+        if not dest.exists():
+            raise
+        discard_dir(staging_key)
+        return False
+
+    return True
+
+
+def replace_dir(staging_key: str, dest_key: str):
+    """
+    Substitui `dest_key` (se existir) pelo staging. A troca é feita com
+    dois renames; o diretório antigo é removido depois.
+    """
+    dest = _resolve_path(dest_key)
+    old_key = None
+
+    if dest.exists():
+        old_key = f"{STAGING_PREFIX}/{uuid.uuid4().hex}"
+        os.rename(dest, _resolve_path(old_key))
+
+    dest.parent.mkdir(parents=True, exist_ok=True)
+    os.rename(_resolve_path(staging_key), dest)
+
+    if old_key:
+        discard_dir(old_key)
+
+
+def delete_dir(key: str) -> bool:
+    """
+    Remove um diretório publicado: sai do lugar com um rename (leitores
+    nunca veem metade) e é apagado depois. Retorna False se não existia.
+    """
+    path = _resolve_path(key)
+    old_key = f"{STAGING_PREFIX}/{uuid.uuid4().hex}"
+    old = _resolve_path(old_key)
+    old.parent.mkdir(parents=True, exist_ok=True)
+
+    try:
+        os.rename(path, old)
+    except FileNotFoundError:
+        return False
+
+    discard_dir(old_key)
+    return True
+
+
 def download_file(key: str, dest_path: str):
     src = _resolve_path(key)
     if not src.exists():
@@ -41,8 +251,7 @@ def download_file(key: str, dest_path: str):
     os.makedirs(os.path.dirname(dest_path), exist_ok=True)
 
     try:
-        with open(src, "rb") as fsrc, open(dest_path, "wb") as fdst:
-            fdst.write(fsrc.read())
+        shutil.copyfile(src, dest_path)
 
         logging.info(f"📤 Copied from local cache: {key} -> {dest_path}")
 
@@ -63,3 +272,11 @@ def get_json(key: str) -> dict:
         logging.error(f"❌ Failed to read JSON {key}: {e}")
         raise
     return data
+
+
+def get_bytes(key: str) -> bytes:
+    path = _resolve_path(key)
+    try:
+        return path.read_bytes()
+    except FileNotFoundError:
+        raise FileNotFoundError(f"File not found in local cache: {key}")
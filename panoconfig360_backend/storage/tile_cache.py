@@ -0,0 +1,126 @@
+import os
+import threading
+from collections import OrderedDict
+
+# ======================================================
+# 🔧 CONFIGURAÇÃO
+# ======================================================
+MB = 1024 * 1024
+HOT_TILES_MAX_BYTES = int(os.environ.get("PANOCONFIG_HOT_TILES_MB", "256")) * MB
+
+# tile → ETag conhecido (permite 304 e sendfile sem ler o arquivo)
+ETAG_MEMO_SIZE = 100000
+
+# tiles vistos uma vez: o segundo pedido carrega os bytes na memória
+GHOST_SIZE = 20000
+
+
+# ======================================================
+# 🔥 CACHE DE TILES QUENTES
+# ======================================================
+
+class HotTileCache:
+    """
+    Bytes dos tiles mais pedidos, por ETag (hash do conteúdo): tiles
+    iguais em builds diferentes (hardlink/CAS) ocupam uma cópia só.
+    Um índice tile lógico (client, scene, build, key) → ETag permite
+    responder hit e 304 sem tocar o storage. Builds publicadas são
+    imutáveis; uma build removida é esquecida com `forget_build`.
+    """
+
+    def __init__(self, max_bytes: int, etag_memo_size: int = ETAG_MEMO_SIZE,
+                 ghost_size: int = GHOST_SIZE):
+        self.max_bytes = max_bytes
+        self.etag_memo_size = etag_memo_size
+        self.ghost_size = ghost_size
+        self._etags = OrderedDict()
+        self._blobs = OrderedDict()
+        self._ghost = OrderedDict()
+        self._total_bytes = 0
+        self._lock = threading.Lock()
+        self._counters = {"hits": 0, "misses": 0, "admitted": 0, "evicted": 0}
+
+    def etag(self, tile: tuple) -> str | None:
+        with self._lock:
+            etag = self._etags.get(tile)
+            if etag is not None:
+                self._etags.move_to_end(tile)
+            return etag
+
+    def get(self, tile: tuple) -> tuple[bytes, str] | None:
+        """
+        (bytes, etag) se o tile está quente.
+        """
+        with self._lock:
+            etag = self._etags.get(tile)
+            data = self._blobs.get(etag) if etag is not None else None
+            if data is None:
+                self._counters["misses"] += 1
+                return None
+            self._etags.move_to_end(tile)
+            self._blobs.move_to_end(etag)
+            self._counters["hits"] += 1
+            return data, etag
+
+    def remember(self, tile: tuple, etag: str):
+        with self._lock:
+            self._remember_locked(tile, etag)
+
+    def should_admit(self, tile: tuple) -> bool:
+        """
+        Verdadeiro a partir do segundo pedido do tile (um acesso único
+        não tira outro tile da memória).
+        """
+        with self._lock:
+            if tile in self._ghost:
+                del self._ghost[tile]
+                return True
+            self._ghost[tile] = True
+            while len(self._ghost) > self.ghost_size:
+                self._ghost.popitem(last=False)
+            return False
+
+    def put(self, tile: tuple, data: bytes, etag: str):
+        if len(data) > self.max_bytes:
+            return
+        with self._lock:
+            self._remember_locked(tile, etag)
+            if etag in self._blobs:
+                self._blobs.move_to_end(etag)
+                return
+            self._blobs[etag] = data
+            self._total_bytes += len(data)
+            self._counters["admitted"] += 1
+            while self._total_bytes > self.max_bytes:
+                _, old = self._blobs.popitem(last=False)
+                self._total_bytes -= len(old)
+                self._counters["evicted"] += 1
+
+    def forget_build(self, client_id: str, scene_id: str, build: str):
+        prefix = (client_id, scene_id, build)
+        with self._lock:
+            for tile in [t for t in self._etags if t[:3] == prefix]:
+                del self._etags[tile]
+            for tile in [t for t in self._ghost if t[:3] == prefix]:
+                del self._ghost[tile]
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self._counters["hits"] + self._counters["misses"]
+            return {
+                **self._counters,
+                "hit_rate": round(self._counters["hits"] / lookups, 4) if lookups else 0.0,
+                "blobs": len(self._blobs),
+                "bytes": self._total_bytes,
+                "max_bytes": self.max_bytes,
+                "etags": len(self._etags),
+            }
+
+    def _remember_locked(self, tile: tuple, etag: str):
+        self._etags[tile] = etag
+        self._etags.move_to_end(tile)
+        while len(self._etags) > self.etag_memo_size:
+            self._etags.popitem(last=False)
+
+
+hot_tiles = HotTileCache(HOT_TILES_MAX_BYTES)
@@ -0,0 +1,117 @@
+import mmap
+import struct
+import hashlib
+
+# ======================================================
+# 📦 FORMATO DO PACK
+# ======================================================
+# Um arquivo por build com todos os tiles:
+#
+#   header  magic "PTPK" | versão u16 | n tiles u32 | início dos dados u32
+#           | digest blake2b-128 (índice + dados)
+#   índice  n × (face char | lod u8 | x u16 | y u16 | offset u32 | tamanho u32)
+#   dados   JPEGs concatenados, em ordem (lod, face, x, y)
+#
+# Little-endian; offsets absolutos. Cada LOD fica contíguo, então o
+# bundle de um nível é uma fatia só. O mesmo formato é a resposta da
+# rota de bundle (o front end fatia com DataView).
+PACK_NAME = "tiles.pack"
+PACK_MAGIC = b"PTPK"
+PACK_VERSION = 1
+PACK_MEDIA_TYPE = "application/vnd.panoconfig.tile-pack"
+
+_HEADER = struct.Struct("<4sHII16s")
+_ENTRY = struct.Struct("<cBHHII")
+
+
+def pack_order(key: tuple) -> tuple:
+    face, lod, x, y = key
+    return (lod, face, x, y)
+
+
+def encode_pack(tiles: dict) -> bytes:
+    """
+    Pack com os tiles `{(face, lod, x, y): bytes}`.
+    """
+    keys = sorted(tiles, key=pack_order)
+    data_offset = _HEADER.size + _ENTRY.size * len(keys)
+
+    entries = []
+    offset = data_offset
+    for face, lod, x, y in keys:
+        length = len(tiles[(face, lod, x, y)])
+        entries.append(_ENTRY.pack(face.encode("ascii"), lod, x, y, offset, length))
+        offset += length
+
+    digest = hashlib.blake2b(digest_size=16)
+    for entry in entries:
+        digest.update(entry)
+    for key in keys:
+        digest.update(tiles[key])
+
+    header = _HEADER.pack(PACK_MAGIC, PACK_VERSION, len(keys), data_offset, digest.digest())
+    return b"".join([header, *entries, *(tiles[k] for k in keys)])
+
+
+def pack_digest(buf) -> str:
+    return _HEADER.unpack_from(buf, 0)[4].hex()
+
+
+# ======================================================
+# 📖 LEITURA (MMAP)
+# ======================================================
+
+class TilePack:
+    """
+    Pack aberto sobre um buffer (bytes ou mmap do arquivo publicado).
+    Só o índice é lido na abertura; os tiles saem do mapeamento sob
+    demanda (o page cache do kernel faz o resto).
+    """
+
+    def __init__(self, buf):
+        self._buf = buf
+        view = memoryview(buf)
+        if len(view) < _HEADER.size:
+            raise ValueError("Pack truncado")
+
+        magic, version, count, data_offset, digest = _HEADER.unpack_from(view, 0)
+        if magic != PACK_MAGIC or version != PACK_VERSION:
+            raise ValueError("Pack inválido")
+
+        self.digest = digest.hex()
+        self.size = len(view)
+        self.index = {}
+        self._lod_spans = {}
+        for i in range(count):
+            face, lod, x, y, offset, length = _ENTRY.unpack_from(
+                view, _HEADER.size + i * _ENTRY.size)
+            if offset + length > self.size:
+                raise ValueError("Pack truncado")
+            key = (face.decode("ascii"), lod, x, y)
+            self.index[key] = (offset, length)
+            self._lod_spans.setdefault(lod, []).append(key)
+        view.release()
+
+    @classmethod
+    def open(cls, path) -> "TilePack":
+        with open(path, "rb") as f:
+            buf = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        return cls(buf)
+
+    def __len__(self) -> int:
+        return len(self.index)
+
+    def tile(self, key: tuple) -> bytes | None:
+        entry = self.index.get(key)
+        if entry is None:
+            return None
+        offset, length = entry
+        return self._buf[offset:offset + length]
+
+    def bundle(self, lod: int | None = None) -> bytes:
+        """
+        Pack só com os tiles do nível `lod` (ou uma cópia do pack todo).
+        """
+        if lod is None:
+            return self._buf[:]
+        return encode_pack({key: self.tile(key) for key in self._lod_spans.get(lod, [])})
@@ -0,0 +1,261 @@
+import os
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+
+from panoconfig360_backend.render.split_faces_cubemap import tile_filename
+from panoconfig360_backend.storage.storage_local import (
+    exists,
+    put_bytes,
+    link_file,
+    get_json,
+    put_json,
+    local_path,
+    get_bytes,
+)
+from panoconfig360_backend.storage.tile_pack import PACK_NAME, TilePack, encode_pack
+
+# ======================================================
+# 🔧 CONFIGURAÇÃO
+# ======================================================
+# "files": cada build guarda a própria cópia (ou hardlink) de cada tile.
+# "cas":   tiles gravados uma vez por hash em tile_objects/ e cada build
+#          guarda só um manifest.json {f}_{z}_{x}_{y} -> hash.
+# "pack":  cada build vira um único tiles.pack (índice + JPEGs), lido
+#          por mmap: 2 inodes por build em vez de 24+.
+TILE_STORAGE_MODES = ("files", "cas", "pack")
+TILE_STORAGE_MODE = os.environ.get("PANOCONFIG_TILE_STORAGE", "files")
+
+MANIFEST_NAME = "manifest.json"
+MANIFEST_CACHE_SIZE = 512
+
+# packs mantidos abertos (mmap); o mapeamento fecha quando sai do cache
+PACK_CACHE_SIZE = 256
+
+
+# ======================================================
+# 🧭 CHAVES
+# ======================================================
+
+def tile_hash(data: bytes) -> str:
+    return hashlib.blake2b(data, digest_size=16).hexdigest()
+
+
+def file_hash(path: str) -> str:
+    h = hashlib.blake2b(digest_size=16)
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def object_key(client_id: str, digest: str, ext: str = "jpg") -> str:
+    return f"clients/{client_id}/tile_objects/{digest[:2]}/{digest}.{ext}"
+
+
+def object_digest(storage_key: str) -> str | None:
+    """
+    Hash do conteúdo se `storage_key` é um objeto do CAS, senão None.
+    """
+    if "/tile_objects/" not in storage_key:
+        return None
+    return storage_key.rsplit("/", 1)[-1].split(".", 1)[0]
+
+
+def manifest_entry(key: tuple) -> str:
+    face, lod, x, y = key
+    return f"{face}_{lod}_{x}_{y}"
+
+
+# ======================================================
+# 📜 MANIFESTS (IMUTÁVEIS APÓS PUBLICADOS)
+# ======================================================
+_manifest_cache = OrderedDict()
+_manifest_lock = threading.Lock()
+
+
+def load_manifest(tile_root: str) -> dict | None:
+    key = f"{tile_root}/{MANIFEST_NAME}"
+
+    with _manifest_lock:
+        cached = _manifest_cache.get(key)
+        if cached is not None:
+            _manifest_cache.move_to_end(key)
+            return cached
+
+    if not exists(key):
+        return None
+
+    manifest = get_json(key)
+
+    with _manifest_lock:
+        _manifest_cache[key] = manifest
+        while len(_manifest_cache) > MANIFEST_CACHE_SIZE:
+            _manifest_cache.popitem(last=False)
+
+    return manifest
+
+
+def forget_manifest(tile_root: str):
+    with _manifest_lock:
+        _manifest_cache.pop(f"{tile_root}/{MANIFEST_NAME}", None)
+
+
+# ======================================================
+# 📦 PACKS (IMUTÁVEIS APÓS PUBLICADOS)
+# ======================================================
+_pack_cache = OrderedDict()
+_pack_lock = threading.Lock()
+
+
+def load_pack(tile_root: str) -> TilePack | None:
+    key = f"{tile_root}/{PACK_NAME}"
+
+    with _pack_lock:
+        cached = _pack_cache.get(key)
+        if cached is not None:
+            _pack_cache.move_to_end(key)
+            return cached
+
+    if not exists(key):
+        return None
+
+    pack = TilePack.open(local_path(key))
+
+    with _pack_lock:
+        pack = _pack_cache.setdefault(key, pack)
+        _pack_cache.move_to_end(key)
+        while len(_pack_cache) > PACK_CACHE_SIZE:
+            _pack_cache.popitem(last=False)
+
+    return pack
+
+
+def forget_pack(tile_root: str):
+    with _pack_lock:
+        _pack_cache.pop(f"{tile_root}/{PACK_NAME}", None)
+
+
+# ======================================================
+# 🔎 LEITURA DE TILES
+# ======================================================
+
+def resolve_tile(client_id: str, tile_root: str, build: str, key: tuple) -> str | None:
+    """
+    Chave de storage com os bytes do tile (modos files e cas; tiles de
+    um pack não têm chave própria, ver `read_tile`).
+    """
+    manifest = load_manifest(tile_root)
+    if manifest is not None:
+        digest = manifest.get("tiles", {}).get(manifest_entry(key))
+        if digest is None:
+            return None
+        return object_key(client_id, digest)
+
+    file_key = f"{tile_root}/{tile_filename(build, key)}"
+    return file_key if exists(file_key) else None
+
+
+def read_tile(client_id: str, tile_root: str, build: str, key: tuple) -> bytes | None:
+    """
+    Bytes do tile, em qualquer um dos modos.
+    """
+    tile_key = resolve_tile(client_id, tile_root, build, key)
+    if tile_key is not None:
+        return get_bytes(tile_key)
+
+    pack = load_pack(tile_root)
+    return pack.tile(key) if pack is not None else None
+
+
+# ======================================================
+# ✍️ ESCRITA DE TILES DE UMA BUILD
+# ======================================================
+
+class TileWriter:
+    """
+    Publica os tiles de uma build (ou do diretório compartilhado da cena)
+    no modo de storage configurado. `tile_root` normalmente é um diretório
+    de staging, publicado depois com `commit_dir`/`replace_dir`.
+    """
+
+    def __init__(self, client_id: str, tile_root: str, build: str, mode: str | None = None):
+        self.client_id = client_id
+        self.tile_root = tile_root
+        self.build = build
+        self.mode = mode or TILE_STORAGE_MODE
+        if self.mode not in TILE_STORAGE_MODES:
+            raise ValueError(f"Modo de storage de tiles inválido: {self.mode}")
+        self.entries = {}
+        self.new_objects = 0
+
+    def put_bytes(self, key: tuple, data: bytes):
+        if self.mode == "pack":
+            # gravado inteiro no `close`
+            self.entries[key] = data
+            return
+
+        if self.mode == "files":
+            put_bytes(f"{self.tile_root}/{tile_filename(self.build, key)}", data)
+            self.entries[manifest_entry(key)] = None
+            return
+
+        digest = tile_hash(data)
+        obj_key = object_key(self.client_id, digest)
+        if not exists(obj_key):
+            put_bytes(obj_key, data)
+            self.new_objects += 1
+        self.entries[manifest_entry(key)] = digest
+
+    def put_ref(self, key: tuple, src_root: str, src_build: str):
+        """
+        Reaproveita o tile `key` já publicado em outra build.
+        FileNotFoundError se a origem não tem o tile.
+        """
+        src_key = resolve_tile(self.client_id, src_root, src_build, key)
+        if src_key is None or self.mode == "pack":
+            # origem em pack (ou destino em pack): copia os bytes
+            data = read_tile(self.client_id, src_root, src_build, key)
+            if data is None:
+                raise FileNotFoundError(f"Tile ausente em {src_root}: {key}")
+            self.put_bytes(key, data)
+            return
+
+        if self.mode == "files":
+            link_file(src_key, f"{self.tile_root}/{tile_filename(self.build, key)}")
+            self.entries[manifest_entry(key)] = None
+            return
+
+        if src_key.startswith(f"clients/{self.client_id}/tile_objects/"):
+            digest = os.path.splitext(os.path.basename(src_key))[0]
+        else:
+            # origem em modo "files": entra no CAS sem recodificar
+            digest = file_hash(str(local_path(src_key)))
+            obj_key = object_key(self.client_id, digest)
+            if not exists(obj_key):
+                link_file(src_key, obj_key)
+                self.new_objects += 1
+        self.entries[manifest_entry(key)] = digest
+
+    def close(self) -> int:
+        """
+        Grava o manifest (modo cas) ou o pack. Retorna a quantidade de
+        tiles publicados.
+        """
+        if self.mode == "pack" and self.entries:
+            put_bytes(f"{self.tile_root}/{PACK_NAME}", encode_pack(self.entries))
+            forget_pack(self.tile_root)
+            logging.info(f"📦 Pack {self.tile_root}: {len(self.entries)} tiles")
+
+        if self.mode == "cas":
+            put_json(f"{self.tile_root}/{MANIFEST_NAME}", {
+                "build": self.build,
+                "tiles": dict(sorted(self.entries.items())),
+            })
+            forget_manifest(self.tile_root)
+            logging.info(
+                f"🧬 Manifest {self.tile_root}: {len(self.entries)} tiles, "
+                f"{self.new_objects} objetos novos")
+
+        return len(self.entries)
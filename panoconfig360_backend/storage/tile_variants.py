@@ -0,0 +1,88 @@
+import time
+import logging
+import threading
+
+from panoconfig360_backend.storage.storage_local import exists, put_bytes, get_bytes
+
+
+# ======================================================
+# 🧭 CHAVES
+# ======================================================
+
+def variant_key(client_id: str, digest: str, ext: str, variant_id: str) -> str:
+    """
+    Variante endereçada pelo conteúdo do JPEG de origem e pelos
+    parâmetros do encode: imutável e compartilhada entre builds.
+    """
+    return f"clients/{client_id}/tile_variants/{ext}/{digest[:2]}/{digest}_{variant_id}.{ext}"
+
+
+# ======================================================
+# 🖼️ VARIANTES DE FORMATO (WEBP/AVIF) SOB DEMANDA
+# ======================================================
+
+class TileVariants:
+    """
+    Gera a variante de um tile no primeiro pedido (a partir do JPEG
+    publicado) e grava no storage; os pedidos seguintes leem de lá.
+    Pedidos simultâneos da mesma variante esperam um único encode.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._in_flight = {}
+        self._counters = {"stored": 0, "encoded": 0, "encode_ms": 0.0}
+
+    def get(self, client_id: str, digest: str, jpeg: bytes, encoding, fmt: str,
+            ext: str, lod: int) -> tuple[bytes, str]:
+        """
+        (bytes, etag) da variante `fmt` do tile com conteúdo `jpeg`
+        (hash `digest`), pelo preset `encoding`.
+        """
+        variant_id = encoding.variant_id(fmt, lod)
+        key = variant_key(client_id, digest, ext, variant_id)
+        etag = f'"{digest}-{variant_id}"'
+
+        with self._lock:
+            pending = self._in_flight.get(key)
+            owner = pending is None
+            if owner:
+                pending = self._in_flight[key] = threading.Event()
+
+        if not owner:
+            pending.wait()
+
+        try:
+            if exists(key):
+                with self._lock:
+                    self._counters["stored"] += 1
+                return get_bytes(key), etag
+
+            start = time.perf_counter()
+            data = encoding.transcode(jpeg, lod, fmt)
+            elapsed_ms = (time.perf_counter() - start) * 1000
+            put_bytes(key, data)
+            with self._lock:
+                self._counters["encoded"] += 1
+                self._counters["encode_ms"] += elapsed_ms
+            logging.info(
+                f"🖼️ Variante {fmt} gerada: {len(jpeg)} → {len(data)} bytes "
+                f"em {elapsed_ms:.1f}ms")
+            return data, etag
+        finally:
+            if owner:
+                with self._lock:
+                    del self._in_flight[key]
+                pending.set()
+
+    def stats(self) -> dict:
+        with self._lock:
+            encoded = self._counters["encoded"]
+            return {
+                "stored": self._counters["stored"],
+                "encoded": encoded,
+                "avg_encode_ms": round(self._counters["encode_ms"] / encoded, 2) if encoded else 0.0,
+            }
+
+
+tile_variants = TileVariants()
@@ -0,0 +1,14 @@
+import pytest
+
+from panoconfig360_backend.storage import storage_local
+
+
+@pytest.fixture
+def storage_root(tmp_path, monkeypatch):
+    """
+    Storage local apontado para um diretório temporário.
+    """
+    root = tmp_path / "panoconfig360_cache"
+    root.mkdir()
+    monkeypatch.setattr(storage_local, "ASSETS_ROOT", root)
+    return root
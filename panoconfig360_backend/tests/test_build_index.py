@@ -0,0 +1,110 @@
+import threading
+
+import pytest
+
+from panoconfig360_backend.render.build_index import BuildIndex
+from panoconfig360_backend.render.cubemap_build import tile_root_key
+from panoconfig360_backend.storage.storage_local import delete_dir, put_json
+
+CLIENT = "test-client"
+SCENE = "kitchen"
+LEVELS = [{"size": 256, "tileSize": 256}, {"size": 512, "tileSize": 256}]
+
+
+def publish(build: str):
+    put_json(f"{tile_root_key(CLIENT, SCENE, build)}/metadata.json", {"levels": LEVELS})
+
+
+def new_index(mode: str = "exact") -> BuildIndex:
+    return BuildIndex(mode, capacity=1000, fp_rate=0.01)
+
+
+# ======================================================
+# 💾 SNAPSHOT
+# ======================================================
+
+@pytest.mark.parametrize("mode", ["exact", "bloom"])
+def test_snapshot_round_trip(storage_root, mode):
+    publish("b1")
+    publish("b2")
+
+    index = new_index(mode)
+    index.load()
+    assert index.loaded_from == "scan"
+
+    reloaded = new_index(mode)
+    reloaded.load()
+    assert reloaded.loaded_from == "snapshot"
+    assert reloaded.lookup(CLIENT, SCENE, "b1") == LEVELS
+    assert reloaded.lookup(CLIENT, SCENE, "b3") is None
+
+
+def test_build_removed_while_stopped_is_not_a_hit(storage_root):
+    publish("b1")
+    publish("b2")
+    new_index().load()
+
+    delete_dir(tile_root_key(CLIENT, SCENE, "b1"))
+
+    index = new_index()
+    index.load()
+    assert index.lookup(CLIENT, SCENE, "b1") is None
+    assert index.lookup(CLIENT, SCENE, "b2") == LEVELS
+    assert index.stats()["refreshed_scenes"] == 1
+
+
+def test_snapshot_of_other_mode_is_rescanned(storage_root):
+    publish("b1")
+    new_index("exact").load()
+
+    index = new_index("bloom")
+    index.load()
+    assert index.loaded_from == "scan"
+    assert index.lookup(CLIENT, SCENE, "b1") == LEVELS
+
+
+# ======================================================
+# 🌸 CONSULTAS
+# ======================================================
+
+def test_bloom_hit_is_confirmed_in_storage(storage_root):
+    index = new_index("bloom")
+    publish("b1")
+    index.add(CLIENT, SCENE, "b1", LEVELS)
+    assert index.lookup(CLIENT, SCENE, "b1") == LEVELS
+
+    # sem remoção no Bloom filter: o exists descarta a build apagada
+    delete_dir(tile_root_key(CLIENT, SCENE, "b1"))
+    index.discard(CLIENT, SCENE, "b1")
+    assert index.lookup(CLIENT, SCENE, "b1") is None
+    assert index.stats()["false_positives"] == 1
+
+
+def test_resolve_indexes_build_published_elsewhere(storage_root):
+    index = new_index()
+    index.load()
+    publish("baked")
+
+    assert index.lookup(CLIENT, SCENE, "baked") is None
+    assert index.resolve(CLIENT, SCENE, "baked") == LEVELS
+    assert index.lookup(CLIENT, SCENE, "baked") == LEVELS
+    assert index.stats()["healed"] == 1
+
+
+def test_concurrent_adds_and_lookups(storage_root):
+    index = new_index()
+    builds = [f"b{i}" for i in range(200)]
+
+    def add(chunk):
+        for build in chunk:
+            index.add(CLIENT, SCENE, build, LEVELS)
+            assert index.lookup(CLIENT, SCENE, build) == LEVELS
+
+    threads = [threading.Thread(target=add, args=(builds[i::4],)) for i in range(4)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    assert index.stats()["builds"] == len(builds)
+    assert index.stats()["level_sets"] == 1
@@ -0,0 +1,67 @@
+import itertools
+
+import numpy as np
+import pytest
+from PIL import Image
+
+from panoconfig360_backend.benchmarks.synthetic import make_scene
+from panoconfig360_backend.render.dynamic_stack_with_masks import stack_layers_array
+from panoconfig360_backend.render.layer_contrib import contribution_cache
+
+CLIENT = "test-client"
+
+
+# ======================================================
+# 🧪 FIXTURES
+# ======================================================
+
+@pytest.fixture(params=[0.05, 0.45], ids=["sparse-masks", "overlapping-masks"])
+def scene(request, tmp_path):
+    """
+    Cena sintética pequena (faces de 64px); com 45% de cobertura as masks
+    se sobrepõem e a engine fused volta a compor em ordem.
+    """
+    scene_id, layers, _, assets_root = make_scene(
+        tmp_path, cube_size=64, layers=3, items_per_layer=2,
+        coverage=request.param, client_id=CLIENT, seed=7)
+    return scene_id, layers, assets_root
+
+
+def selections(layers: list):
+    choices = [[(layer["id"], item["id"]) for item in layer["items"]] for layer in layers]
+    return [dict(combo) for combo in itertools.product(*choices)]
+
+
+# ======================================================
+# 🎨 EQUIVALÊNCIA DAS ENGINES DE COMPOSITE
+# ======================================================
+
+def test_float32_within_one_of_uint8(scene):
+    scene_id, layers, assets_root = scene
+    for selection in selections(layers):
+        ref = stack_layers_array(scene_id, layers, selection, assets_root, engine="uint8")
+        out = stack_layers_array(scene_id, layers, selection, assets_root, engine="float32")
+        assert out.shape == ref.shape
+        assert np.abs(out.astype(np.int16) - ref.astype(np.int16)).max() <= 1, selection
+
+
+@pytest.mark.parametrize("engine", ["sparse", "fused"])
+def test_integer_engines_match_uint8(scene, engine):
+    scene_id, layers, assets_root = scene
+    for selection in selections(layers):
+        ref = stack_layers_array(scene_id, layers, selection, assets_root, engine="uint8")
+        out = stack_layers_array(scene_id, layers, selection, assets_root, engine=engine)
+        assert np.array_equal(out, ref), selection
+
+
+def test_fused_falls_back_only_on_overlapping_masks(scene):
+    scene_id, layers, assets_root = scene
+    masks = [np.asarray(Image.open(assets_root / "masks" / layer["mask"])) > 0
+             for layer in layers]
+    overlap = any((a & b).any() for a, b in itertools.combinations(masks, 2))
+
+    before = contribution_cache.stats()["ordered_fallbacks"]
+    stack_layers_array(scene_id, layers, selections(layers)[0], assets_root, engine="fused")
+    fallbacks = contribution_cache.stats()["ordered_fallbacks"] - before
+
+    assert fallbacks == int(overlap)
@@ -0,0 +1,77 @@
+import pytest
+from fastapi.testclient import TestClient
+
+from panoconfig360_backend.api import server
+from panoconfig360_backend.api.rate_limit import RenderAdmission, TokenBuckets
+from panoconfig360_backend.render.render_jobs import RenderJobRegistry, RenderQueueFull
+
+# cliente e cena versionados no repo; a build não existe, então é um render novo
+RENDER_REQUEST = {
+    "client": "monte-negro",
+    "scene": "kitchen",
+    "selection": {"backsplash": "diamond-black", "island": "naica", "countertop": "matterhorn"},
+}
+
+
+# ======================================================
+# 🪣 TOKEN BUCKETS
+# ======================================================
+
+def test_bucket_refills_at_rate():
+    buckets = TokenBuckets(rate=2, burst=2)
+    buckets.take("c", now=0.0)
+    buckets.take("c", now=0.0)
+
+    assert buckets.wait_time("c", now=0.0) == pytest.approx(0.5)
+    assert buckets.wait_time("c", now=0.5) == 0.0
+
+
+def test_admission_takes_client_and_origin_together():
+    admission = RenderAdmission(client_rate=1, client_burst=1, origin_rate=1, origin_burst=5)
+    assert admission.admit("c", "o") == 0.0
+
+    assert admission.admit("c", "o") > 0
+    # o cliente recusado não gastou o token da origem
+    assert admission.admit("other", "o") == 0.0
+    assert admission.stats()["throttled_client"] == 1
+
+    admission.refund("c", "o")
+    assert admission.admit("c", "o") == 0.0
+
+
+def test_full_queue_rejects_new_jobs():
+    registry = RenderJobRegistry(workers=1, ttl_seconds=60, max_pending=0)
+    with pytest.raises(RenderQueueFull) as err:
+        registry.submit(("c", "s", "b"), lambda job: {})
+    assert err.value.retry_after >= 1
+    assert registry.stats()["rejected"] == 1
+
+
+# ======================================================
+# 🚦 /api/render: 429 E 503
+# ======================================================
+
+def test_render_throttled_client_gets_429(monkeypatch):
+    admission = RenderAdmission(client_rate=1, client_burst=1, origin_rate=100, origin_burst=100)
+    admission.admit("monte-negro", "o")
+    monkeypatch.setattr(server, "render_admission", admission)
+
+    response = TestClient(server.app).post("/api/render", json=RENDER_REQUEST)
+
+    assert response.status_code == 429
+    assert int(response.headers["Retry-After"]) >= 1
+
+
+def test_render_full_queue_gets_503_and_refunds(monkeypatch):
+    admission = RenderAdmission(client_rate=1, client_burst=1, origin_rate=100, origin_burst=100)
+    monkeypatch.setattr(server, "render_admission", admission)
+    monkeypatch.setattr(server, "render_jobs", RenderJobRegistry(
+        workers=1, ttl_seconds=60, max_pending=0))
+
+    response = TestClient(server.app).post("/api/render", json=RENDER_REQUEST)
+
+    assert response.status_code == 503
+    assert "Retry-After" in response.headers
+    # render recusado pela fila não consome o token do cliente
+    assert admission.stats()["admitted"] == 0
+    assert admission.admit("monte-negro", "o") == 0.0
@@ -0,0 +1,148 @@
+import threading
+
+import pytest
+
+from panoconfig360_backend.render.render_jobs import RenderJobRegistry
+
+KEY = ("test-client", "kitchen", "b1")
+
+
+@pytest.fixture
+def registry():
+    return RenderJobRegistry(workers=2, ttl_seconds=60, max_pending=4)
+
+
+# ======================================================
+# 🧵 SINGLE-FLIGHT
+# ======================================================
+
+def test_concurrent_submits_of_same_build_share_one_job(registry):
+    gate = threading.Event()
+    runs = []
+
+    def run(job):
+        runs.append(job.id)
+        gate.wait(5)
+        return {"build": job.build}
+
+    barrier = threading.Barrier(8)
+    results = []
+
+    def submit():
+        barrier.wait()
+        results.append(registry.submit(KEY, run))
+
+    threads = [threading.Thread(target=submit) for _ in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    gate.set()
+
+    jobs = {job.id for job, _ in results}
+    assert len(jobs) == 1
+    assert sum(created for _, created in results) == 1
+
+    job = results[0][0]
+    assert job.wait(5)
+    assert job.result == {"build": "b1"}
+    assert runs == [job.id]
+    assert registry.stats()["deduplicated"] == 7
+
+
+def test_finished_job_leaves_build_index(registry):
+    job, _ = registry.submit(KEY, lambda job: {})
+    assert job.wait(5)
+
+    assert registry.active(KEY) is None
+    assert registry.get(job.id) is job
+
+    again, created = registry.submit(KEY, lambda job: {})
+    assert created and again is not job
+    assert again.wait(5)
+
+
+def test_failed_job_is_retried_by_next_submit(registry):
+    def boom(job):
+        raise RuntimeError("render falhou")
+
+    job, _ = registry.submit(KEY, boom)
+    assert job.wait(5)
+    assert job.status == "failed" and not job.cancelled
+
+    retry, created = registry.submit(KEY, lambda job: {})
+    assert created
+    assert retry.wait(5) and retry.status == "ready"
+
+
+# ======================================================
+# 📡 PROGRESSO E EVENTOS (SSE)
+# ======================================================
+
+def test_progress_and_preview_bump_version(registry):
+    gate = threading.Event()
+    previewed = threading.Event()
+
+    def run(job):
+        job.progress("composite", 1, 2)
+        job.set_preview({"levels": []}, {("f", 0, 0, 0): b"jpg"})
+        previewed.set()
+        gate.wait(5)
+        job.progress("tile", 6, 6)
+        return {"levels": [1]}
+
+    job, _ = registry.submit(KEY, run)
+    assert previewed.wait(5)
+    snap = job.snapshot()
+    assert snap["status"] == "running" and snap["stage"] == "composite"
+    assert snap["stages"]["composite"] == {"done": 1, "total": 2}
+    assert job.preview_tile(("f", 0, 0, 0)) == b"jpg"
+
+    gate.set()
+    assert job.wait(5)
+    final = job.snapshot()
+    assert final["version"] > snap["version"]
+    assert final["status"] == "ready" and final["tiles"] == {"levels": [1]}
+    # preview em memória só até a build ser publicada
+    assert job.preview_tile(("f", 0, 0, 0)) is None
+
+
+def sse_events(body: str) -> list:
+    return [line.split(": ", 1)[1] for line in body.splitlines()
+            if line.startswith("event: ")]
+
+
+def test_job_events_stream_preview_then_ready(monkeypatch):
+    from fastapi.testclient import TestClient
+    from panoconfig360_backend.api import server
+
+    monkeypatch.setattr(server, "JOB_EVENTS_POLL_SECONDS", 0.01)
+    gate = threading.Event()
+    previewed = threading.Event()
+
+    def run(job):
+        job.progress("composite", 1, 1)
+        job.set_preview({"levels": []}, {})
+        previewed.set()
+        gate.wait(5)
+        return {"levels": []}
+
+    job, _ = server.render_jobs.submit(("test-client", "kitchen", "sse"), run)
+    assert previewed.wait(5)
+
+    # libera o render assim que o stream leu o estado com preview
+    snapshot = job.snapshot
+
+    def snapshot_then_release():
+        snap = snapshot()
+        gate.set()
+        return snap
+
+    job.snapshot = snapshot_then_release
+
+    client = TestClient(server.app)
+    body = client.get(f"/api/jobs/{job.id}/events").text
+    assert sse_events(body)[0] == "preview"
+    assert sse_events(body)[-1] == "ready"
+
+    assert client.get("/api/jobs/unknown/events").status_code == 404
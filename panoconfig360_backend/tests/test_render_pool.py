@@ -0,0 +1,129 @@
+import itertools
+
+import pytest
+
+from panoconfig360_backend.render import render_pool
+from panoconfig360_backend.render.render_pool import (
+    RenderProcessPool,
+    SharedAssetStore,
+    _PendingRender,
+)
+
+
+class FakeWorker:
+    """
+    Processo de render simulado: o pool só usa pid, is_alive e join.
+    """
+
+    _pids = itertools.count(1000)
+
+    def __init__(self):
+        self.pid = next(self._pids)
+        self.alive = True
+
+    def is_alive(self) -> bool:
+        return self.alive
+
+    def join(self, timeout=None):
+        pass
+
+
+@pytest.fixture
+def pool():
+    """
+    Pool com dois workers simulados; repor um worker cria outro FakeWorker.
+    """
+    pool = RenderProcessPool(2, max_jobs=10, max_rss_bytes=1, store=SharedAssetStore(0))
+
+    def spawn_locked():
+        worker = FakeWorker()
+        pool._workers[worker.pid] = worker
+        pool._counters["spawned"] += 1
+
+    pool._spawn_locked = spawn_locked
+    for _ in range(pool.processes):
+        spawn_locked()
+    return pool
+
+
+def worker_stats(jobs: int, entries: int) -> dict:
+    return {"asset_cache": {"hits": jobs, "misses": 1, "entries": entries, "hit_rate": 0.5}}
+
+
+# ======================================================
+# ♻️ RECICLAGEM
+# ======================================================
+
+def test_recycled_worker_is_replaced_and_keeps_its_counters(pool):
+    pid, other = list(pool._workers)
+    pool._worker_stats[pid] = worker_stats(jobs=3, entries=7)
+    pool._worker_stats[other] = worker_stats(jobs=2, entries=5)
+
+    pool._on_exit(pid, "max_jobs")
+
+    assert pid not in pool._workers
+    assert len(pool._workers) == 2
+    assert pool.stats()["recycled_max_jobs"] == 1
+    assert pool.stats()["spawned"] == 3
+
+    cache = pool.render_stats()["asset_cache"]
+    # contadores do worker que saiu continuam somados; estado (entries) não
+    assert cache["hits"] == 5 and cache["misses"] == 2
+    assert cache["entries"] == 5
+    assert cache["hit_rate"] == round(5 / 7, 4)
+
+
+def test_exit_of_reaped_worker_does_not_spawn_twice(pool):
+    pid = next(iter(pool._workers))
+    pool._workers[pid].alive = False
+
+    pool._reap()
+    pool._on_exit(pid, "max_rss")
+
+    assert len(pool._workers) == 2
+    assert pool.stats()["crashed"] == 1
+    assert pool.stats()["recycled_max_rss"] == 0
+
+
+def test_no_respawn_while_stopping(pool):
+    pid = next(iter(pool._workers))
+    pool._stopping = True
+
+    pool._on_exit(pid, "max_jobs")
+
+    assert len(pool._workers) == 1
+
+
+# ======================================================
+# 💥 WORKERS QUE MORREM
+# ======================================================
+
+def test_crashed_worker_fails_its_job(pool):
+    pid = next(iter(pool._workers))
+    running = _PendingRender(None, None)
+    running.pid = pid
+    queued = _PendingRender(None, None)
+    pool._pending = {"running": running, "queued": queued}
+
+    pool._workers[pid].alive = False
+    pool._reap()
+
+    assert running.done.is_set() and running.error
+    # o job na fila ainda tem quem o execute
+    assert not queued.done.is_set()
+    assert len(pool._workers) == 2
+
+
+def test_crash_streak_fails_queued_jobs(pool, monkeypatch):
+    monkeypatch.setattr(render_pool, "WORKER_MAX_CRASH_STREAK", 2)
+    queued = _PendingRender(None, None)
+    pool._pending = {"queued": queued}
+
+    for _ in range(2):
+        assert not queued.done.is_set()
+        next(iter(pool._workers.values())).alive = False
+        pool._reap()
+
+    assert queued.done.is_set()
+    assert queued.error == "Workers de render morrendo ao iniciar"
+    assert pool.stats()["failed"] == 1
@@ -0,0 +1,52 @@
+from panoconfig360_backend.render.cubemap_build import (
+    SHARED_BUILD,
+    _ensure_shared_static,
+    scene_root_key,
+)
+from panoconfig360_backend.storage.storage_local import list_dirs
+from panoconfig360_backend.storage.tile_store import read_tile
+
+CLIENT = "test-client"
+SCENE = "kitchen"
+KEYS = {("f", 0, 0, 0), ("b", 0, 0, 0)}
+
+
+def fake_renderer(payload: bytes):
+    def render_tiles(build, keys):
+        for key in sorted(keys):
+            yield {"key": key, "data": payload + build.encode()}
+    return render_tiles
+
+
+def test_new_fingerprint_publishes_new_generation(storage_root):
+    old_root, keys = _ensure_shared_static(
+        fake_renderer(b"old-"), CLIENT, SCENE, KEYS, "fp-1")
+    assert keys == KEYS
+    # aquece os caches do tile_store, como um worker que já serviu a geração
+    assert read_tile(CLIENT, old_root, SHARED_BUILD, ("f", 0, 0, 0)) == b"old-static"
+
+    new_root, _ = _ensure_shared_static(
+        fake_renderer(b"new-"), CLIENT, SCENE, KEYS, "fp-2")
+
+    assert new_root != old_root
+    assert read_tile(CLIENT, new_root, SHARED_BUILD, ("f", 0, 0, 0)) == b"new-static"
+    assert list_dirs(scene_root_key(CLIENT, SCENE)) == [new_root.rsplit("/", 1)[1]]
+
+
+def test_same_fingerprint_is_not_rendered_again(storage_root):
+    root, _ = _ensure_shared_static(fake_renderer(b"x-"), CLIENT, SCENE, KEYS, "fp")
+
+    def boom(build, keys):
+        raise AssertionError("geração já publicada")
+
+    assert _ensure_shared_static(boom, CLIENT, SCENE, KEYS, "fp") == (root, KEYS)
+
+
+def test_legacy_shared_dir_is_dropped(storage_root):
+    legacy = storage_root / scene_root_key(CLIENT, SCENE) / "shared"
+    legacy.mkdir(parents=True)
+    (legacy / "metadata.json").write_text("{}")
+
+    _ensure_shared_static(fake_renderer(b"x-"), CLIENT, SCENE, KEYS, "fp")
+
+    assert not legacy.exists()
@@ -0,0 +1,143 @@
+import threading
+
+import pytest
+
+from panoconfig360_backend.benchmarks.synthetic import make_scene
+from panoconfig360_backend.render import speculative
+from panoconfig360_backend.render.cubemap_build import tile_root_key
+from panoconfig360_backend.render.render_jobs import RenderCancelled, RenderJobRegistry
+from panoconfig360_backend.render.speculative import MB, Speculator
+from panoconfig360_backend.storage.storage_local import exists, put_json
+
+CLIENT = "test-client"
+
+
+# ======================================================
+# 🧪 FIXTURES
+# ======================================================
+
+@pytest.fixture
+def registry(monkeypatch):
+    registry = RenderJobRegistry(workers=2, ttl_seconds=60, max_pending=4)
+    monkeypatch.setattr(speculative, "render_jobs", registry)
+    return registry
+
+
+@pytest.fixture
+def preempted(monkeypatch):
+    """
+    Sinal de cancelamento no lugar do epoch da engine de render.
+    """
+    event = threading.Event()
+    monkeypatch.setattr(speculative, "preempt_speculative", event.set)
+    return event
+
+
+@pytest.fixture
+def speculator(storage_root, tmp_path, registry, preempted):
+    """
+    Speculator com uma sessão observada e um render especulativo em
+    andamento, parado até ser cancelado.
+    """
+    scene_id, layers, selection, assets_root = make_scene(
+        tmp_path, cube_size=16, layers=2, items_per_layer=2,
+        coverage=0.1, client_id=CLIENT, seed=3)
+    spec = Speculator(max_disk_bytes=10 * MB, idle_seconds=0)
+
+    def runner(job, tile_root, build, render_kwargs):
+        preempted.wait(5)
+        raise RenderCancelled()
+
+    spec._runner = runner
+    spec.observe("session", 0, "b0", {
+        "client_id": CLIENT,
+        "scene_id": scene_id,
+        "layers": layers,
+        "selection": selection,
+        "assets_root": assets_root,
+    }, cached=False)
+    spec._tick()
+    assert spec.stats()["submitted"] == 1
+    return spec
+
+
+def in_flight_job(spec):
+    return spec._in_flight["job"]
+
+
+# ======================================================
+# ⏹️ PRIORIDADE DOS PEDIDOS INTERATIVOS
+# ======================================================
+
+def test_interactive_submit_cancels_speculative_job(speculator, registry, preempted):
+    spec_job = in_flight_job(speculator)
+    assert spec_job.speculative
+
+    job, created = registry.submit((CLIENT, "other", "b1"), lambda job: {})
+    assert speculator.on_submit(job, created)
+
+    assert preempted.is_set()
+    # fora do registro: ninguém mais se junta ao especulativo cancelado
+    assert registry.active(spec_job.key) is None
+    assert spec_job.wait(5)
+    assert spec_job.cancelled
+    assert speculator.stats()["cancelled"] == 1
+
+
+def test_joining_a_preempted_job_resubmits(speculator, registry, preempted, monkeypatch):
+    spec_job = in_flight_job(speculator)
+    # cancelamento pedido, mas o job ainda não saiu
+    monkeypatch.setattr(speculative, "preempt_speculative", lambda: None)
+
+    job, created = registry.submit((CLIENT, "other", "b1"), lambda job: {})
+    speculator.on_submit(job, created)
+
+    assert not speculator.on_submit(spec_job, False)
+    preempted.set()
+
+
+def test_click_on_speculative_build_claims_it(speculator, registry, preempted):
+    spec_job = in_flight_job(speculator)
+
+    job, created = registry.submit(spec_job.key, lambda job: {})
+    assert job is spec_job and not created
+    assert speculator.on_submit(job, created)
+
+    # reivindicado: outro pedido interativo não o cancela mais
+    other, created = registry.submit((CLIENT, "other", "b1"), lambda job: {})
+    assert speculator.on_submit(other, created)
+    assert not preempted.is_set()
+    assert speculator.stats()["joined"] == 1
+    preempted.set()
+
+
+# ======================================================
+# 💽 TETO DE DISCO
+# ======================================================
+
+def test_disk_cap_evicts_oldest_unclaimed_build(storage_root, monkeypatch):
+    monkeypatch.setattr(speculative, "TILE_STORAGE_MODE", "files")
+    spec = Speculator(max_disk_bytes=3 * MB, idle_seconds=0)
+
+    keys = [(CLIENT, "s", f"b{i}") for i in range(3)]
+    for key in keys:
+        tile_root = tile_root_key(*key)
+        put_json(f"{tile_root}/metadata.json", {"tiles_bytes": MB})
+        spec._track(key, {"claimed": False}, tile_root)
+
+    # o clique transforma a build em cache hit: sai da conta
+    spec.observe("s1", 0, "b1", {
+        "client_id": CLIENT, "scene_id": "s", "selection": {}}, cached=True)
+
+    with spec._lock:
+        assert spec._evict_locked()
+    assert exists(f"{tile_root_key(*keys[0])}/metadata.json")
+    assert spec.stats()["disk_bytes"] == 2 * MB
+
+    spec.max_disk_bytes = 2 * MB
+    with spec._lock:
+        assert spec._evict_locked()
+    assert not exists(f"{tile_root_key(*keys[0])}/metadata.json")
+    assert exists(f"{tile_root_key(*keys[1])}/metadata.json")
+    assert exists(f"{tile_root_key(*keys[2])}/metadata.json")
+    assert spec.stats()["evicted"] == 1
@@ -0,0 +1,39 @@
+import pytest
+
+from panoconfig360_backend.storage.storage_local import (
+    get_bytes,
+    get_json,
+    link_file,
+    put_bytes,
+    put_json,
+)
+
+
+def _tmp_files(root):
+    return [p for p in root.rglob("*.tmp")]
+
+
+def test_put_json_failure_leaves_no_tmp(storage_root):
+    put_json("a/meta.json", {"v": 1})
+    with pytest.raises(TypeError):
+        put_json("a/meta.json", {"v": object()})
+
+    assert get_json("a/meta.json") == {"v": 1}
+    assert _tmp_files(storage_root) == []
+
+
+def test_link_file_replaces_dest_atomically(storage_root):
+    put_bytes("src/a.jpg", b"new")
+    put_bytes("dest/a.jpg", b"old")
+
+    link_file("src/a.jpg", "dest/a.jpg")
+
+    assert get_bytes("dest/a.jpg") == b"new"
+    assert _tmp_files(storage_root) == []
+
+
+def test_link_file_missing_src_keeps_dest(storage_root):
+    put_bytes("dest/a.jpg", b"old")
+    with pytest.raises(FileNotFoundError):
+        link_file("src/missing.jpg", "dest/a.jpg")
+    assert get_bytes("dest/a.jpg") == b"old"
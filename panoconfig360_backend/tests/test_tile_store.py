@@ -0,0 +1,87 @@
+import pytest
+
+from panoconfig360_backend.storage.tile_pack import TilePack, encode_pack
+from panoconfig360_backend.storage.tile_store import (
+    TILE_STORAGE_MODES,
+    TileWriter,
+    read_tile,
+)
+
+CLIENT = "test-client"
+
+TILES = {
+    ("f", 0, 0, 0): b"\xff\xd8front",
+    ("b", 0, 0, 0): b"\xff\xd8back",
+    ("u", 1, 1, 0): b"\xff\xd8up",
+}
+
+def write_build(mode: str, build: str) -> str:
+    tile_root = f"clients/{CLIENT}/cubemap/s/tiles/{mode}-{build}"
+    writer = TileWriter(CLIENT, tile_root, build, mode=mode)
+    for key, data in TILES.items():
+        writer.put_bytes(key, data)
+    assert writer.close() == len(TILES)
+    return tile_root
+
+
+# ======================================================
+# 💾 ROUND TRIP DOS TILES NOS MODOS DE STORAGE
+# ======================================================
+
+@pytest.mark.parametrize("mode", TILE_STORAGE_MODES)
+def test_tile_writer_round_trip(storage_root, mode):
+    tile_root = write_build(mode, "a")
+
+    for key, data in TILES.items():
+        assert read_tile(CLIENT, tile_root, "a", key) == data
+    assert read_tile(CLIENT, tile_root, "a", ("d", 0, 0, 0)) is None
+
+
+@pytest.mark.parametrize("mode", TILE_STORAGE_MODES)
+def test_tile_writer_reuses_published_tiles(storage_root, mode):
+    src_root = write_build(mode, "src")
+
+    dest_root = f"clients/{CLIENT}/cubemap/s/tiles/{mode}-dest"
+    writer = TileWriter(CLIENT, dest_root, "dest", mode=mode)
+    for key in TILES:
+        writer.put_ref(key, src_root, "src")
+    with pytest.raises(FileNotFoundError):
+        writer.put_ref(("d", 0, 0, 0), src_root, "src")
+    writer.close()
+
+    for key, data in TILES.items():
+        assert read_tile(CLIENT, dest_root, "dest", key) == data
+
+
+def test_cas_stores_identical_tiles_once(storage_root):
+    write_build("cas", "a")
+
+    writer = TileWriter(CLIENT, f"clients/{CLIENT}/cubemap/s/tiles/cas-b", "b", mode="cas")
+    for key, data in TILES.items():
+        writer.put_bytes(key, data)
+    writer.close()
+
+    assert writer.new_objects == 0
+
+
+def test_unknown_mode_is_rejected(storage_root):
+    with pytest.raises(ValueError):
+        TileWriter(CLIENT, "clients/x/tiles/a", "a", mode="zip")
+
+
+# ======================================================
+# 📦 PACK E BUNDLE
+# ======================================================
+
+def test_pack_bundle_holds_one_lod():
+    pack = TilePack(encode_pack(TILES))
+    assert len(pack) == len(TILES)
+
+    lod1 = TilePack(pack.bundle(1))
+    assert {k: lod1.tile(k) for k in lod1.index} == {("u", 1, 1, 0): b"\xff\xd8up"}
+    assert pack.bundle() == encode_pack(TILES)
+
+
+def test_truncated_pack_is_rejected():
+    with pytest.raises(ValueError):
+        TilePack(encode_pack(TILES)[:-1])
@@ -0,0 +1,265 @@
+"""
+Pré-renderiza todas as combinações de seleção das cenas de um cliente,
+para o kiosk nunca cair num render a frio. Retomável: builds já
+publicadas (metadata.json) são puladas e o progresso fica num checkpoint
+em clients/{client}/bake/{scene}.json.
+
+    python -m panoconfig360_backend.tools.bake --client monte-negro
+    python -m panoconfig360_backend.tools.bake --client monte-negro --scene kitchen --workers 4
+    python -m panoconfig360_backend.tools.bake --client monte-negro --dry-run
+"""
+import os
+import sys
+import time
+import json
+import argparse
+import itertools
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+
+from panoconfig360_backend.render.dynamic_stack import (
+    load_config,
+    build_string_from_selection,
+)
+from panoconfig360_backend.render.dynamic_stack_with_masks import stack_layers_array
+from panoconfig360_backend.render.scene_context import resolve_scene_context
+from panoconfig360_backend.render.cubemap_build import rendered_builds
+from panoconfig360_backend.render.tile_encoding import resolve_tile_encoding
+from panoconfig360_backend.render.render_pool import (
+    RenderProcessPool,
+    SharedAssetStore,
+    WORKER_MAX_JOBS,
+    WORKER_MAX_RSS_BYTES,
+    SHARED_ASSETS_MAX_BYTES,
+)
+from panoconfig360_backend.storage.storage_local import (
+    ASSETS_ROOT,
+    exists,
+    get_json,
+    put_json,
+)
+
+CHECKPOINT_EVERY = 10
+PROGRESS_EVERY_SECONDS = 5.0
+
+
+# ======================================================
+# 🔢 COMBINAÇÕES
+# ======================================================
+
+def load_project(client_id: str) -> dict:
+    config_path = ASSETS_ROOT / "clients" / client_id / f"{client_id}_cfg.json"
+    project, scenes, _ = load_config(config_path)
+    project["scenes"] = scenes
+    project["client_id"] = client_id
+    return project
+
+
+def enumerate_builds(scene_index: int, layers: list) -> dict:
+    """
+    {build: selection} de todas as combinações de itens das layers.
+    O produto varia a última layer mais rápido: builds vizinhas diferem em
+    poucas layers, o que favorece o reuso de tiles entre elas.
+    """
+    ordered = sorted(layers, key=lambda l: l.get("build_order", 0))
+    choices = [[(l["id"], it["id"]) for it in l.get("items", [])] for l in ordered]
+
+    builds = {}
+    for combo in itertools.product(*choices):
+        selection = dict(combo)
+        build = build_string_from_selection(scene_index, layers, selection)
+        builds.setdefault(build, selection)
+    return builds
+
+
+# ======================================================
+# 💾 CHECKPOINT
+# ======================================================
+
+def checkpoint_key(client_id: str, scene_id: str) -> str:
+    return f"clients/{client_id}/bake/{scene_id}.json"
+
+
+def load_checkpoint(client_id: str, scene_id: str) -> dict:
+    key = checkpoint_key(client_id, scene_id)
+    if exists(key):
+        return get_json(key)
+    return {"done": [], "failed": {}}
+
+
+# ======================================================
+# 🍞 BAKE DE UMA CENA
+# ======================================================
+
+def _fmt_eta(seconds: float) -> str:
+    seconds = int(seconds)
+    return f"{seconds // 3600:02d}:{seconds % 3600 // 60:02d}:{seconds % 60:02d}"
+
+
+def bake_scene(pool: RenderProcessPool, project: dict, scene_id: str, workers: int,
+               retry_failed: bool = True, limit: int | None = None, dry_run: bool = False,
+               stop: threading.Event | None = None) -> dict:
+    client_id = project["client_id"]
+    ctx = resolve_scene_context(project, scene_id)
+    viewer_cfg = project.get("viewer", {})
+    tile_encoding = resolve_tile_encoding(viewer_cfg)
+
+    builds = enumerate_builds(ctx["scene_index"], ctx["layers"])
+    checkpoint = load_checkpoint(client_id, scene_id)
+    published = set(rendered_builds(client_id, scene_id))
+
+    failed = checkpoint.get("failed", {})
+    todo = [
+        b for b in builds
+        if b not in published and (retry_failed or b not in failed)
+    ]
+    if limit is not None:
+        todo = todo[:limit]
+
+    logging.info(
+        f"🍞 {client_id}/{scene_id}: {len(builds)} combinações, "
+        f"{len(published)} já publicadas, {len(todo)} a renderizar")
+
+    summary = {"scene": scene_id, "total": len(builds),
+               "skipped": len(builds) - len(todo), "rendered": 0, "failed": 0}
+    if dry_run or not todo:
+        return summary
+
+    done = set(checkpoint.get("done", [])) | published
+
+    def save_checkpoint():
+        put_json(checkpoint_key(client_id, scene_id), {
+            "client": client_id,
+            "scene": scene_id,
+            "total": len(builds),
+            "done": sorted(done),
+            "failed": failed,
+            "updated_at": int(time.time()),
+        })
+
+    def render(build):
+        return pool.render(
+            stack_layers_array,
+            client_id=client_id,
+            scene_id=scene_id,
+            layers=ctx["layers"],
+            selection=builds[build],
+            assets_root=ctx["assets_root"],
+            build=build,
+            tile_size=viewer_cfg.get("tileSize", 512),
+            lod_min_size=viewer_cfg.get("lodMinSize"),
+            reuse_tiles=True,
+            tile_encoding=tile_encoding,
+        )
+
+    start = time.monotonic()
+    last_report = start
+    finished = 0
+    pending = iter(todo)
+    in_flight = {}
+
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="bake") as executor:
+        def fill():
+            while len(in_flight) < workers and not (stop and stop.is_set()):
+                build = next(pending, None)
+                if build is None:
+                    return
+                in_flight[executor.submit(render, build)] = build
+
+        fill()
+        while in_flight:
+            try:
+                completed, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+            except KeyboardInterrupt:
+                # para de enfileirar e termina as builds em andamento
+                if stop is not None:
+                    stop.set()
+                logging.warning(
+                    f"⏹️ Interrompido — terminando {len(in_flight)} builds em andamento")
+                continue
+
+            for future in completed:
+                build = in_flight.pop(future)
+                finished += 1
+                try:
+                    future.result()
+                    done.add(build)
+                    failed.pop(build, None)
+                    summary["rendered"] += 1
+                except Exception as e:
+                    failed[build] = str(e)
+                    summary["failed"] += 1
+                    logging.error(f"❌ {build}: {e}")
+
+            if finished % CHECKPOINT_EVERY == 0:
+                save_checkpoint()
+
+            now = time.monotonic()
+            if now - last_report >= PROGRESS_EVERY_SECONDS or finished == len(todo):
+                elapsed = now - start
+                rate = finished / elapsed if elapsed else 0.0
+                remaining = len(todo) - finished
+                eta = _fmt_eta(remaining / rate) if rate else "--:--:--"
+                logging.info(
+                    f"⏱️ {scene_id}: {finished}/{len(todo)} "
+                    f"({rate:.2f} builds/s, ETA {eta}, falhas {summary['failed']})")
+                last_report = now
+
+            fill()
+
+    save_checkpoint()
+    summary["elapsed_s"] = round(time.monotonic() - start, 1)
+
+    if stop is not None and stop.is_set():
+        raise KeyboardInterrupt
+    return summary
+
+
+# ======================================================
+# 🚀 CLI
+# ======================================================
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--client", required=True)
+    parser.add_argument("--scene", action="append",
+                        help="cena a renderizar (repetível); padrão: todas")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1,
+                        help="processos de render em paralelo")
+    parser.add_argument("--limit", type=int, help="máximo de builds por cena")
+    parser.add_argument("--skip-failed", action="store_true",
+                        help="não tenta de novo builds que falharam antes")
+    parser.add_argument("--dry-run", action="store_true")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(levelname)s: %(message)s", force=True)
+
+    project = load_project(args.client)
+    scene_ids = args.scene or list(project["scenes"])
+
+    workers = max(1, args.workers)
+    pool = RenderProcessPool(
+        workers, WORKER_MAX_JOBS, WORKER_MAX_RSS_BYTES,
+        SharedAssetStore(SHARED_ASSETS_MAX_BYTES))
+    stop = threading.Event()
+
+    summaries = []
+    try:
+        for scene_id in scene_ids:
+            summaries.append(bake_scene(
+                pool, project, scene_id, workers,
+                retry_failed=not args.skip_failed, limit=args.limit,
+                dry_run=args.dry_run, stop=stop))
+    except KeyboardInterrupt:
+        # checkpoint e builds publicadas ficam; a próxima execução retoma
+        logging.warning("⏹️ Bake interrompido — rode de novo para retomar")
+        sys.exit(130)
+    finally:
+        pool.shutdown()
+        for summary in summaries:
+            print(json.dumps(summary))
+
+
+if __name__ == "__main__":
+    main()
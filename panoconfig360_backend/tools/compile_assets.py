@@ -0,0 +1,284 @@
+"""
+Valida o cfg de um cliente contra os assets das cenas e compila, por
+cena, o pack de assets crus (base, materiais e masks em uint8) que o
+compositor mapeia com np.memmap (ver render/asset_pack.py).
+
+Confere que cada `file` de item e cada `mask` de layer existe e tem as
+dimensões da base (com --resize, redimensiona no pack o que divergir) e
+grava o checksum de cada asset. Um pack em dia não é reescrito.
+
+    python -m panoconfig360_backend.tools.compile_assets --client monte-negro
+    python -m panoconfig360_backend.tools.compile_assets --client monte-negro --scene kitchen --resize
+    python -m panoconfig360_backend.tools.compile_assets --client monte-negro --check
+    python -m panoconfig360_backend.tools.compile_assets --client monte-negro --verify
+"""
+import sys
+import json
+import time
+import argparse
+import logging
+from pathlib import Path
+
+import numpy as np
+from PIL import Image
+
+from panoconfig360_backend.render.asset_pack import (
+    PACK_NAME,
+    AssetPack,
+    AssetPackWriter,
+    file_checksum,
+)
+from panoconfig360_backend.render.dynamic_stack_with_masks import (
+    FIXED_LAYERS,
+    get_actual_base,
+    get_build_chars,
+)
+from panoconfig360_backend.render.scene_context import resolve_scene_context
+from panoconfig360_backend.tools.bake import load_project
+
+MB = 1024 * 1024
+
+
+# ======================================================
+# 🔎 VALIDAÇÃO DO CFG CONTRA OS ASSETS
+# ======================================================
+
+def _image_size(path: Path) -> tuple[int, int]:
+    # só o cabeçalho: nada é decodificado
+    with Image.open(path) as img:
+        return img.size
+
+
+def validate_scene(project: dict, scene_id: str, allow_resize: bool = False) -> dict:
+    """
+    Assets da cena [(nome relativo, kind, path, redimensionar)] e os
+    problemas encontrados (`errors` impedem o pack, `warnings` não).
+    """
+    ctx = resolve_scene_context(project, scene_id)
+    root = Path(ctx["assets_root"])
+    report = {"scene": scene_id, "root": root, "assets": [], "errors": [], "warnings": []}
+    errors, warnings = report["errors"], report["warnings"]
+
+    base_name = f"base_{scene_id}.png"
+    base_path = root / base_name
+    if not base_path.exists():
+        errors.append(f"base ausente: {base_path}")
+        return report
+
+    base_size = _image_size(base_path)
+    if base_size[0] != base_size[1] * 6:
+        errors.append(f"base não é um cubemap horizontal (6:1): {base_size[0]}x{base_size[1]}")
+    report["size"] = base_size
+    report["assets"].append((base_name, "rgb", base_path, False))
+
+    def check_asset(name: str, kind: str, what: str):
+        path = root / name
+        if not path.exists():
+            errors.append(f"{what}: arquivo ausente {name}")
+            return
+        size = _image_size(path)
+        resize = size != base_size
+        if resize and not allow_resize:
+            errors.append(
+                f"{what}: {name} tem {size[0]}x{size[1]}, a base tem "
+                f"{base_size[0]}x{base_size[1]} (use --resize)")
+            return
+        if resize:
+            warnings.append(f"{what}: {name} redimensionado de {size[0]}x{size[1]} no pack")
+        report["assets"].append((name, kind, path, resize))
+
+    max_index = get_actual_base() ** get_build_chars()
+    orders = {}
+    seen = set()
+
+    for layer in ctx["layers"]:
+        layer_id = layer.get("id")
+        order = layer.get("build_order", 0)
+        if not 0 <= order < FIXED_LAYERS:
+            errors.append(f"layer {layer_id}: build_order {order} fora de [0, {FIXED_LAYERS})")
+        elif order in orders:
+            warnings.append(
+                f"layer {layer_id}: build_order {order} repetido ({orders[order]}); "
+                f"a build string não distingue as duas")
+        orders.setdefault(order, layer_id)
+
+        mask = layer.get("mask")
+        if not mask:
+            warnings.append(f"layer {layer_id}: sem mask (ignorada pelo compositor)")
+        elif f"masks/{mask}" not in seen:
+            seen.add(f"masks/{mask}")
+            check_asset(f"masks/{mask}", "mask", f"layer {layer_id}")
+
+        ids, indexes = set(), set()
+        for item in layer.get("items", []):
+            item_id = item.get("id")
+            index = item.get("index", 0)
+            if item_id in ids:
+                errors.append(f"layer {layer_id}: item {item_id} repetido")
+            if index in indexes:
+                errors.append(f"layer {layer_id}: index {index} repetido (item {item_id})")
+            if not 0 <= index < max_index:
+                errors.append(f"layer {layer_id}: index {index} de {item_id} fora de [0, {max_index})")
+            ids.add(item_id)
+            indexes.add(index)
+
+            # file null: o item mostra a própria base
+            file = item.get("file")
+            if file and f"materials/{file}" not in seen:
+                seen.add(f"materials/{file}")
+                check_asset(f"materials/{file}", "rgb", f"layer {layer_id}/{item_id}")
+
+    return report
+
+
+# ======================================================
+# 📦 COMPILAÇÃO DO PACK
+# ======================================================
+
+def _source_info(path: Path) -> dict:
+    stat = path.stat()
+    return {"mtime_ns": stat.st_mtime_ns, "size": stat.st_size}
+
+
+def pack_is_current(report: dict) -> bool:
+    """
+    Pack existente com exatamente os assets da cena, nenhum PNG
+    alterado desde a compilação e o mesmo tamanho de base.
+    """
+    pack_path = report["root"] / PACK_NAME
+    if not pack_path.exists():
+        return False
+    try:
+        pack = AssetPack(pack_path)
+    except (ValueError, OSError, KeyError):
+        return False
+
+    if pack.index.get("size") != list(report["size"]):
+        return False
+    if set(pack.entries) != {name for name, _, _, _ in report["assets"]}:
+        return False
+    for name, kind, path, _ in report["assets"]:
+        entry = pack.entries[name]
+        source = _source_info(path)
+        if entry["kind"] != kind or any(entry["source"][k] != v for k, v in source.items()):
+            return False
+    return True
+
+
+def _load_asset(path: Path, kind: str, size: tuple | None) -> np.ndarray:
+    with Image.open(path) as img:
+        img = img.convert("RGB" if kind == "rgb" else "L")
+        if size is not None:
+            img = img.resize(size, Image.Resampling.LANCZOS)
+        return np.asarray(img, dtype=np.uint8)
+
+
+def compile_scene(client_id: str, report: dict) -> dict:
+    start = time.monotonic()
+    writer = AssetPackWriter(report["root"] / PACK_NAME, {
+        "client": client_id,
+        "scene": report["scene"],
+        "size": list(report["size"]),
+    })
+    try:
+        for name, kind, path, resize in report["assets"]:
+            source = {**_source_info(path), "checksum": file_checksum(path)}
+            if resize:
+                source["resized_from"] = list(_image_size(path))
+            array = _load_asset(path, kind, report["size"] if resize else None)
+            writer.add(name, kind, array, source)
+            del array
+        index = writer.close()
+    except BaseException:
+        writer.discard()
+        raise
+
+    pack_bytes = (report["root"] / PACK_NAME).stat().st_size
+    logging.info(
+        f"📦 {client_id}/{report['scene']}: {len(index['assets'])} assets, "
+        f"{pack_bytes / MB:.1f}MB em {time.monotonic() - start:.2f}s")
+    return {"assets": len(index["assets"]), "bytes": pack_bytes}
+
+
+def verify_scene(report: dict) -> list:
+    """
+    Problemas do pack da cena: pixels que não batem com o checksum,
+    PNGs alterados desde a compilação e assets faltando no pack.
+    """
+    pack_path = report["root"] / PACK_NAME
+    if not pack_path.exists():
+        return [f"pack ausente: {pack_path}"]
+    try:
+        pack = AssetPack(pack_path)
+    except (ValueError, OSError, KeyError) as e:
+        return [str(e)]
+
+    problems = []
+    for name, entry in pack.entries.items():
+        if not pack.verify(name):
+            problems.append(f"{name}: pixels não batem com o checksum do pack")
+        path = report["root"] / name
+        if not path.exists():
+            problems.append(f"{name}: PNG de origem não existe mais")
+        elif file_checksum(path) != entry["source"]["checksum"]:
+            problems.append(f"{name}: PNG mudou desde a compilação")
+    for name, _, _, _ in report["assets"]:
+        if name not in pack.entries:
+            problems.append(f"{name}: usado pelo cfg e ausente do pack")
+    return problems
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--client", required=True)
+    parser.add_argument("--scene", action="append",
+                        help="cena a compilar (repetível); padrão: todas")
+    parser.add_argument("--resize", action="store_true",
+                        help="redimensiona no pack assets com dimensões diferentes da base")
+    parser.add_argument("--check", action="store_true",
+                        help="só valida o cfg contra os assets, sem gravar o pack")
+    parser.add_argument("--verify", action="store_true",
+                        help="confere os checksums dos packs existentes")
+    parser.add_argument("--force", action="store_true",
+                        help="recompila mesmo com o pack em dia")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(levelname)s: %(message)s", force=True)
+
+    project = load_project(args.client)
+    failed = False
+
+    for scene_id in args.scene or list(project["scenes"]):
+        report = validate_scene(project, scene_id, allow_resize=args.resize)
+        for warning in report["warnings"]:
+            logging.warning(f"⚠️ {scene_id}: {warning}")
+        for error in report["errors"]:
+            logging.error(f"❌ {scene_id}: {error}")
+
+        summary = {"scene": scene_id, "assets": len(report["assets"]),
+                   "errors": len(report["errors"]), "warnings": len(report["warnings"])}
+
+        if report["errors"]:
+            failed = True
+        elif args.verify:
+            problems = verify_scene(report)
+            for problem in problems:
+                logging.error(f"❌ {scene_id}: {problem}")
+            summary["verified"] = not problems
+            failed |= bool(problems)
+        elif args.check:
+            pass
+        elif not args.force and pack_is_current(report):
+            logging.info(f"✅ {args.client}/{scene_id}: pack em dia")
+            summary["pack"] = "current"
+        else:
+            summary["pack"] = compile_scene(args.client, report)
+
+        print(json.dumps(summary))
+
+    if failed:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
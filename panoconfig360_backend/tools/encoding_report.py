@@ -0,0 +1,178 @@
+"""
+Compara os presets de encode dos tiles: bytes por build e tempo de
+encode (JPEG publicado e cada variante negociada), sobre o mesmo
+composite de algumas builds reais de cada cena.
+
+    python -m panoconfig360_backend.tools.encoding_report --client monte-negro
+    python -m panoconfig360_backend.tools.encoding_report --client monte-negro --scene kitchen --builds 5
+    python -m panoconfig360_backend.tools.encoding_report --client monte-negro --preset default --preset kiosk --json report.json
+"""
+import json
+import time
+import argparse
+import logging
+
+from panoconfig360_backend.render.dynamic_stack_with_masks import stack_layers_array
+from panoconfig360_backend.render.scene_context import resolve_scene_context
+from panoconfig360_backend.render.split_faces_cubemap import process_cubemap, pyramid_levels
+from panoconfig360_backend.render.tile_encoding import (
+    BUILTIN_PRESETS,
+    TileEncoding,
+    resolve_tile_encoding,
+)
+from panoconfig360_backend.tools.bake import load_project, enumerate_builds
+
+
+# ======================================================
+# 🎛️ PRESETS
+# ======================================================
+
+def client_presets(viewer_cfg: dict) -> dict:
+    """
+    {nome: TileEncoding} dos presets embutidos, dos declarados no cfg e
+    do escolhido pelo cliente (marcado com `*`).
+    """
+    presets = {**BUILTIN_PRESETS, **viewer_cfg.get("encoderPresets", {})}
+    current = resolve_tile_encoding(viewer_cfg)
+
+    encodings = {}
+    for name, preset in presets.items():
+        if name == current.name:
+            encodings[f"{name}*"] = current
+        else:
+            encodings[name] = TileEncoding(name, preset)
+    if current.name not in presets:
+        encodings[f"{current.name}*"] = current
+    return encodings
+
+
+def sample_builds(builds: dict, count: int) -> list:
+    """
+    `count` builds espalhadas pela enumeração (não só as primeiras, que
+    diferem apenas na última layer).
+    """
+    names = list(builds)
+    if count >= len(names):
+        return names
+    step = len(names) / count
+    return [names[int(i * step)] for i in range(count)]
+
+
+# ======================================================
+# 📏 MEDIÇÃO
+# ======================================================
+
+def measure(images: list, levels: list, encoding: TileEncoding) -> dict:
+    """
+    Bytes e tempo médios por build do JPEG e de cada variante.
+    """
+    totals = {"jpeg": {"bytes": 0, "encode_ms": 0.0}}
+    totals.update({fmt: {"bytes": 0, "encode_ms": 0.0} for fmt in encoding.variants})
+    tiles = 0
+
+    for img in images:
+        written = process_cubemap(img, None, build="report", levels=levels, encoding=encoding)
+        tiles += len(written)
+        for tile in written:
+            totals["jpeg"]["bytes"] += tile["bytes"]
+            totals["jpeg"]["encode_ms"] += tile["encode_ms"]
+            for fmt in encoding.variants:
+                start = time.perf_counter()
+                data = encoding.transcode(tile["data"], tile["key"][1], fmt)
+                totals[fmt]["encode_ms"] += (time.perf_counter() - start) * 1000
+                totals[fmt]["bytes"] += len(data)
+
+    n = max(1, len(images))
+    return {
+        "tiles_per_build": tiles // n,
+        "formats": {
+            fmt: {
+                "bytes_per_build": t["bytes"] // n,
+                "encode_ms_per_build": round(t["encode_ms"] / n, 1),
+            }
+            for fmt, t in totals.items()
+        },
+    }
+
+
+def report_scene(project: dict, scene_id: str, encodings: dict, count: int) -> dict:
+    ctx = resolve_scene_context(project, scene_id)
+    viewer_cfg = project.get("viewer", {})
+    builds = enumerate_builds(ctx["scene_index"], ctx["layers"])
+    sample = sample_builds(builds, count)
+
+    logging.info(f"🧪 {scene_id}: compondo {len(sample)} builds de {len(builds)}")
+    images = [
+        stack_layers_array(
+            scene_id=scene_id,
+            layers=ctx["layers"],
+            selection=builds[build],
+            assets_root=ctx["assets_root"],
+            build=build,
+        )
+        for build in sample
+    ]
+    levels = pyramid_levels(
+        images[0].shape[0], viewer_cfg.get("tileSize", 512), viewer_cfg.get("lodMinSize"))
+
+    results = {}
+    for name, encoding in encodings.items():
+        logging.info(f"🎛️ {scene_id}: preset {name}")
+        results[name] = measure(images, levels, encoding)
+
+    return {"scene": scene_id, "builds": sample, "presets": results}
+
+
+def print_table(report: dict):
+    baseline = None
+    print(f"\n{report['scene']} ({len(report['builds'])} builds)")
+    print(f"  {'preset':<16} {'formato':<6} {'KB/build':>10} {'vs 1ª':>8} {'ms/build':>10}")
+    for name, result in report["presets"].items():
+        for fmt, row in result["formats"].items():
+            if baseline is None:
+                baseline = row["bytes_per_build"]
+            ratio = row["bytes_per_build"] / baseline if baseline else 0
+            print(f"  {name:<16} {fmt:<6} {row['bytes_per_build'] / 1024:>10.1f} "
+                  f"{ratio:>7.0%} {row['encode_ms_per_build']:>10.1f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--client", required=True)
+    parser.add_argument("--scene", action="append",
+                        help="cena a medir (repetível); padrão: todas")
+    parser.add_argument("--preset", action="append",
+                        help="preset a comparar (repetível); padrão: todos")
+    parser.add_argument("--builds", type=int, default=3,
+                        help="builds por cena no teste")
+    parser.add_argument("--json", help="grava o relatório completo neste arquivo")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(levelname)s: %(message)s", force=True)
+
+    project = load_project(args.client)
+    encodings = client_presets(project.get("viewer", {}))
+    if args.preset:
+        unknown = [p for p in args.preset if p not in encodings and f"{p}*" not in encodings]
+        if unknown:
+            parser.error(f"presets desconhecidos: {unknown} (disponíveis: {list(encodings)})")
+        encodings = {
+            name: enc for name, enc in encodings.items()
+            if name in args.preset or name.rstrip("*") in args.preset
+        }
+
+    reports = [
+        report_scene(project, scene_id, encodings, max(1, args.builds))
+        for scene_id in args.scene or list(project["scenes"])
+    ]
+
+    for report in reports:
+        print_table(report)
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump({"client": args.client, "scenes": reports}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,169 @@
+"""
+Migra builds do modo "files" para o storage content-addressed ("cas")
+e mostra estatísticas de deduplicação.
+
+    python -m panoconfig360_backend.tools.migrate_tiles_cas migrate --client monte-negro
+    python -m panoconfig360_backend.tools.migrate_tiles_cas migrate --dry-run
+    python -m panoconfig360_backend.tools.migrate_tiles_cas stats --client monte-negro
+"""
+import re
+import json
+import argparse
+import logging
+
+from panoconfig360_backend.render.cubemap_build import SHARED_BUILD, SHARED_DIR_PREFIX
+from panoconfig360_backend.storage.storage_local import (
+    exists,
+    list_dirs,
+    list_files,
+    link_file,
+    delete,
+    size,
+    get_json,
+    put_json,
+    local_path,
+)
+from panoconfig360_backend.storage.tile_store import (
+    MANIFEST_NAME,
+    object_key,
+    file_hash,
+    load_manifest,
+    forget_manifest,
+)
+
+TILE_FILE_RE = re.compile(r"^([0-9a-z]+)_([fbudlr])_(\d+)_(\d+)_(\d+)\.jpg$")
+
+
+def iter_tile_roots(client_id: str):
+    """
+    (tile_root, build) de cada build com metadata e do diretório
+    compartilhado de cada cena.
+    """
+    cubemap_root = f"clients/{client_id}/cubemap"
+    for scene_id in sorted(list_dirs(cubemap_root)):
+        scene_root = f"{cubemap_root}/{scene_id}"
+
+        for name in sorted(list_dirs(scene_root)):
+            if name != "shared" and not name.startswith(SHARED_DIR_PREFIX):
+                continue
+            if exists(f"{scene_root}/{name}/metadata.json"):
+                yield f"{scene_root}/{name}", SHARED_BUILD
+
+        for build in sorted(list_dirs(f"{scene_root}/tiles")):
+            tile_root = f"{scene_root}/tiles/{build}"
+            if exists(f"{tile_root}/metadata.json"):
+                yield tile_root, build
+
+
+def migrate_tile_root(client_id: str, tile_root: str, build: str, dry_run: bool = False) -> dict:
+    if exists(f"{tile_root}/{MANIFEST_NAME}"):
+        return {"tiles": 0, "new_objects": 0, "skipped": True}
+
+    entries = {}
+    new_objects = 0
+    tile_files = []
+
+    for filename in sorted(list_files(tile_root)):
+        match = TILE_FILE_RE.match(filename)
+        if not match or match.group(1) != build:
+            continue
+
+        tile_key = f"{tile_root}/{filename}"
+        digest = file_hash(str(local_path(tile_key)))
+        obj_key = object_key(client_id, digest)
+
+        if not exists(obj_key):
+            new_objects += 1
+            if not dry_run:
+                link_file(tile_key, obj_key)
+
+        _, face, lod, x, y = match.groups()
+        entries[f"{face}_{lod}_{x}_{y}"] = digest
+        tile_files.append(tile_key)
+
+    if dry_run or not entries:
+        return {"tiles": len(entries), "new_objects": new_objects, "skipped": False}
+
+    # manifest primeiro: a partir dele os arquivos soltos são redundantes
+    put_json(f"{tile_root}/{MANIFEST_NAME}", {"build": build, "tiles": entries})
+    forget_manifest(tile_root)
+
+    for tile_key in tile_files:
+        delete(tile_key)
+
+    meta_key = f"{tile_root}/metadata.json"
+    meta = get_json(meta_key)
+    if "fingerprint" not in meta:
+        meta["storage"] = "cas"
+        put_json(meta_key, meta)
+
+    return {"tiles": len(entries), "new_objects": new_objects, "skipped": False}
+
+
+def dedup_stats(client_id: str) -> dict:
+    refs = 0
+    logical_bytes = 0
+    objects = {}
+    files_builds = 0
+    cas_builds = 0
+
+    for tile_root, _ in iter_tile_roots(client_id):
+        manifest = load_manifest(tile_root)
+        if manifest is None:
+            files_builds += 1
+            continue
+
+        cas_builds += 1
+        for digest in manifest.get("tiles", {}).values():
+            if digest not in objects:
+                obj_key = object_key(client_id, digest)
+                objects[digest] = size(obj_key) if exists(obj_key) else 0
+            refs += 1
+            logical_bytes += objects[digest]
+
+    physical_bytes = sum(objects.values())
+    return {
+        "client": client_id,
+        "cas_builds": cas_builds,
+        "files_builds": files_builds,
+        "tile_refs": refs,
+        "unique_objects": len(objects),
+        "logical_bytes": logical_bytes,
+        "physical_bytes": physical_bytes,
+        "dedup_ratio": round(logical_bytes / physical_bytes, 3) if physical_bytes else 0.0,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("command", choices=["migrate", "stats"])
+    parser.add_argument("--client", help="migra/analisa só este cliente")
+    parser.add_argument("--dry-run", action="store_true")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(levelname)s: %(message)s", force=True)
+
+    clients = [args.client] if args.client else sorted(list_dirs("clients"))
+
+    if args.command == "migrate":
+        for client_id in clients:
+            totals = {"roots": 0, "tiles": 0, "new_objects": 0}
+            for tile_root, build in iter_tile_roots(client_id):
+                result = migrate_tile_root(
+                    client_id, tile_root, build, dry_run=args.dry_run)
+                if result["skipped"]:
+                    continue
+                totals["roots"] += 1
+                totals["tiles"] += result["tiles"]
+                totals["new_objects"] += result["new_objects"]
+                logging.info(
+                    f"🧬 {tile_root}: {result['tiles']} tiles, {result['new_objects']} objetos novos")
+
+            logging.info(f"✅ {client_id}: {totals}")
+
+    for client_id in clients:
+        print(json.dumps(dedup_stats(client_id)))
+
+
+if __name__ == "__main__":
+    main()
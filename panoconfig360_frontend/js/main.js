@@ -112,11 +112,19 @@ async function loadCurrentScene() {
   currentAbortController = new AbortController();
 
   try {
+    const signal = currentAbortController.signal;
+
     const result = await renderService.renderCubemap(
       configLoader.clientId,
       configurator.sceneId,
       configurator.currentSelection,
-      currentAbortController.signal,
+      signal,
+      {
+        // preview em baixa resolução enquanto o resto dos tiles é gerado
+        onPreview: (tiles) => {
+          if (!signal.aborted) viewerManager.loadScene(tiles);
+        },
+      },
     );
 
     if (!result?.tiles) return;
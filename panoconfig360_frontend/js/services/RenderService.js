@@ -1,25 +1,89 @@
 export class RenderService {
   constructor(baseUrl = "") {
     this._baseUrl = baseUrl;
+    // identifica a aba: o backend pré-renderiza os vizinhos da seleção atual
+    this._sessionId =
+      crypto.randomUUID?.() ?? `${Date.now()}-${Math.random().toString(36).slice(2)}`;
   }
 
-  async renderCubemap(clientId, sceneId, selection, signal) {
+  // Render em modo job: cache hit responde na hora; em cache miss o
+  // backend devolve um job e o progresso chega por SSE.
+  // handlers: { onPreview(tiles), onProgress(snapshot) }
+  async renderCubemap(clientId, sceneId, selection, signal, handlers = {}) {
     const response = await fetch(`${this._baseUrl}/api/render`, {
       method: "POST",
       headers: { "Content-Type": "application/json" },
-      body: JSON.stringify({ client: clientId, scene: sceneId, selection }),
+      body: JSON.stringify({
+        client: clientId,
+        scene: sceneId,
+        selection,
+        session: this._sessionId,
+        async: true,
+      }),
       signal,
     });
 
     if (!response.ok) {
-      if (response.status === 429) {
-        throw new Error("Muitas requisições — aguarde um instante.");
+      if (response.status === 429 || response.status === 503) {
+        const retryAfter = response.headers.get("Retry-After");
+        throw new Error(
+          retryAfter
+            ? `Servidor ocupado — tente novamente em ${retryAfter}s.`
+            : "Muitas requisições — aguarde um instante.",
+        );
       }
 
       const err = await response.json();
       throw new Error(err.detail || "Erro render");
     }
 
-    return await response.json();
+    const result = await response.json();
+    if (!result.job) return result;
+
+    const job = await this._waitForJob(result.events, signal, handlers);
+    return { status: "generated", build: job.build, tiles: job.tiles };
+  }
+
+  _waitForJob(eventsUrl, signal, { onPreview, onProgress } = {}) {
+    return new Promise((resolve, reject) => {
+      const source = new EventSource(`${this._baseUrl}${eventsUrl}`);
+
+      const close = () => {
+        source.close();
+        signal?.removeEventListener("abort", onAbort);
+      };
+
+      const onAbort = () => {
+        close();
+        reject(new DOMException("Aborted", "AbortError"));
+      };
+      signal?.addEventListener("abort", onAbort);
+
+      source.addEventListener("progress", (e) => {
+        onProgress?.(JSON.parse(e.data));
+      });
+
+      source.addEventListener("preview", (e) => {
+        const job = JSON.parse(e.data);
+        onProgress?.(job);
+        onPreview?.(job.preview);
+      });
+
+      source.addEventListener("ready", (e) => {
+        close();
+        resolve(JSON.parse(e.data));
+      });
+
+      source.addEventListener("failed", (e) => {
+        close();
+        reject(new Error(JSON.parse(e.data).error || "Erro render"));
+      });
+
+      source.onerror = () => {
+        // o servidor fecha o stream ao terminar; erro antes disso é falha
+        close();
+        reject(new Error("Conexão de progresso perdida"));
+      };
+    });
   }
 }
@@ -0,0 +1,61 @@
+/**
+ * TileBundle — tiles de uma build vindos numa única resposta
+ * (`tiles.bundleUrl`, formato em panoconfig360_backend/storage/tile_pack.py).
+ * Cada tile vira um blob URL fatiado do mesmo ArrayBuffer.
+ */
+
+const PACK_MAGIC = "PTPK";
+const PACK_VERSION = 1;
+const HEADER_SIZE = 30; // magic | versão u16 | n u32 | início dos dados u32 | digest 16
+const ENTRY_SIZE = 14; // face char | lod u8 | x u16 | y u16 | offset u32 | tamanho u32
+
+export class TileBundle {
+  constructor(buffer) {
+    const view = new DataView(buffer);
+    const magic = String.fromCharCode(...new Uint8Array(buffer, 0, 4));
+    if (magic !== PACK_MAGIC || view.getUint16(4, true) !== PACK_VERSION) {
+      throw new Error("Bundle de tiles inválido");
+    }
+
+    const count = view.getUint32(6, true);
+    this._urls = new Map();
+
+    for (let i = 0; i < count; i++) {
+      const at = HEADER_SIZE + i * ENTRY_SIZE;
+      const face = String.fromCharCode(view.getUint8(at));
+      const z = view.getUint8(at + 1);
+      const x = view.getUint16(at + 2, true);
+      const y = view.getUint16(at + 4, true);
+      const offset = view.getUint32(at + 6, true);
+      const length = view.getUint32(at + 10, true);
+
+      const blob = new Blob([new Uint8Array(buffer, offset, length)], {
+        type: "image/jpeg",
+      });
+      this._urls.set(`${face}/${z}/${x}/${y}`, URL.createObjectURL(blob));
+    }
+  }
+
+  // lod: nível da pirâmide (sem lod → build inteira)
+  static async fetch(bundleUrl, lod = null, signal) {
+    const url = lod === null ? bundleUrl : `${bundleUrl}?lod=${lod}`;
+    const response = await fetch(url, { signal });
+    if (!response.ok) {
+      throw new Error(`Bundle de tiles indisponível (${response.status})`);
+    }
+    return new TileBundle(await response.arrayBuffer());
+  }
+
+  get size() {
+    return this._urls.size;
+  }
+
+  getUrl(face, z, x, y) {
+    return this._urls.get(`${face}/${z}/${x}/${y}`) ?? null;
+  }
+
+  release() {
+    for (const url of this._urls.values()) URL.revokeObjectURL(url);
+    this._urls.clear();
+  }
+}
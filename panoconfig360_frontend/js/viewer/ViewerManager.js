@@ -1,5 +1,6 @@
 import { CreateCameraController, CAMERA_POIS } from "./CameraController.js";
 import { TilePattern } from "../utils/TilePattern.js";
+import { TileBundle } from "../utils/TileBundle.js";
 
 export class ViewerManager {
   constructor(containerId, viewerConfig = {}) {
@@ -7,10 +8,11 @@ export class ViewerManager {
     this._viewerConfig = viewerConfig;
     this._viewer = null;
     this._view = null;
-    this._geometry = null;
+    this._geometries = new Map();
     this._cameraController = null;
     this._currentScene = null;
     this._currentBuild = null;
+    this._currentBundles = null;
   }
 
   initialize() {
@@ -36,13 +38,70 @@ export class ViewerManager {
       fov: this._viewerConfig.defaultFov || Math.PI / 2,
     });
 
+    this._cameraController = CreateCameraController(this._view);
+
+    return this._viewer;
+  }
+
+  // Geometria a partir dos níveis anunciados pelo backend (tiles.levels);
+  // o nível 0 é o menor e fica fixado para o primeiro paint.
+  // Sem levels: nível único do config (builds antigas)
+  _getGeometry(tiles) {
     const { tileSize = 512, cubeSize = 1024 } = this._viewerConfig;
+    const levels = tiles.levels?.length
+      ? tiles.levels
+      : [{ size: cubeSize, tileSize }];
+    const key = levels.map((l) => `${l.size}/${l.tileSize}`).join(",");
+
+    let geometry = this._geometries.get(key);
+    if (!geometry) {
+      geometry = new Marzipano.CubeGeometry(levels);
+      this._geometries.set(key, geometry);
+    }
+    return geometry;
+  }
 
-    this._geometry = new Marzipano.CubeGeometry([{ size: cubeSize, tileSize }]);
+  // Primeiros níveis (viewer.bundleLevels, padrão 2) em um bundle por
+  // nível: 1 request em vez de 6, 24... Espera só o nível 0; os outros
+  // entram quando chegam. Tiles fora dos bundles seguem pela URL normal.
+  async _fetchBundles(tiles, holder) {
+    const count = Math.min(
+      tiles.levels?.length ?? 0,
+      this._viewerConfig.bundleLevels ?? 2,
+    );
+    if (!tiles.bundleUrl || count === 0) return;
+
+    const requests = [];
+    for (let lod = 0; lod < count; lod++) {
+      requests.push(
+        TileBundle.fetch(tiles.bundleUrl, lod)
+          .then((bundle) => {
+            if (holder.released) bundle.release();
+            else holder.bundles.push(bundle);
+          })
+          .catch((err) => console.warn("⚠️ Bundle de tiles:", err.message)),
+      );
+    }
+    await requests[0];
+  }
 
-    this._cameraController = CreateCameraController(this._view);
+  _createSource(tiles, holder) {
+    return new Marzipano.ImageUrlSource((tile) => {
+      for (const bundle of holder.bundles) {
+        const url = bundle.getUrl(tile.face, tile.z, tile.x, tile.y);
+        if (url) return { url };
+      }
+      return {
+        url: TilePattern.getUrl(tiles, tile.face, tile.z, tile.x, tile.y),
+      };
+    });
+  }
 
-    return this._viewer;
+  _releaseBundles(holder) {
+    if (!holder) return;
+    holder.released = true;
+    holder.bundles.forEach((bundle) => bundle.release());
+    holder.bundles = [];
   }
 
   async loadScene(tiles) {
@@ -51,24 +110,28 @@ export class ViewerManager {
     const token = Symbol("scene");
     this._activeToken = token;
 
-    const pattern = TilePattern.getMarzipanoPattern(tiles);
-    const source = Marzipano.ImageUrlSource.fromString(pattern);
+    const bundles = { bundles: [], released: false };
+    await this._fetchBundles(tiles, bundles);
+
+    // se outra troca começou → aborta
+    if (this._activeToken !== token) {
+      this._releaseBundles(bundles);
+      return;
+    }
 
     const newScene = this._viewer.createScene({
-      source,
-      geometry: this._geometry,
+      source: this._createSource(tiles, bundles),
+      geometry: this._getGeometry(tiles),
       view: this._view,
       pinFirstLevel: true,
     });
 
-    // se outra troca começou → aborta
-    if (this._activeToken !== token) return;
-
     // 🔴 primeira cena: sem fade
     if (!this._currentScene) {
       newScene.switchTo({ transitionDuration: 0 });
       this._currentScene = newScene;
       this._currentBuild = tiles.build;
+      this._currentBundles = bundles;
       return;
     }
 
@@ -78,14 +141,17 @@ export class ViewerManager {
     });
 
     const oldScene = this._currentScene;
+    const oldBundles = this._currentBundles;
     this._currentScene = newScene;
     this._currentBuild = tiles.build;
+    this._currentBundles = bundles;
 
     // destruir antiga depois do fade
     setTimeout(() => {
       try {
         oldScene.destroy();
       } catch {}
+      this._releaseBundles(oldBundles);
     }, 350);
   }
 
@@ -94,6 +160,8 @@ export class ViewerManager {
   }
 
   destroy() {
+    this._releaseBundles(this._currentBundles);
+    this._currentBundles = null;
     this._viewer?.destroy();
     this._viewer = null;
   }